@@ -24,4 +24,5 @@ except ImportError:
     __version__ = "0.0.0"
     __version_info__ = (0, 0, 0)  # type: ignore
 
+from .engine import Engine
 from .main import main
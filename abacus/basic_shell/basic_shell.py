@@ -17,9 +17,15 @@
 
 import ast
 import code
+import sys
 
+from contextlib import contextmanager
+from time import perf_counter
 from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
+from .. import namespace
+from ..cache import CacheEntry, CodeCache
+from ..context import current_context
 from ..shell import CodeType, ShellBase
 
 
@@ -27,19 +33,29 @@ class BasicShell(ShellBase):
     """Basic shell that does basic input cleanup and managing, made for testing
     and for other shells to be based on top of it"""
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, *, lazy: Optional[bool] = None):
+        super().__init__(lazy=lazy)
 
         self._ns = {}
-        self._str_transformers = []
         self._ast_transformers = []
         self._event_callbacks = {}
         self.interpreter = code.InteractiveInterpreter(self.user_ns)
 
+        # compiled cells so repeated input is not transformed again
+        self.code_cache = CodeCache()
+
+        # source of the last cell after string transformations
+        self._transformed: Optional[str] = None
+
         self.load()
 
     @property
     def user_ns(self) -> Dict[str, Any]:
+        # sessions of the engine run code in their own namespace
+        context = current_context(self)
+        if context is not None:
+            return context.ns
+
         return self._ns
 
     @property
@@ -52,17 +68,26 @@ class BasicShell(ShellBase):
 
     @property
     def str_transformers(self) -> List[Callable]:
-        return self._str_transformers
+        return self.str_pipeline.transformers
 
     @staticmethod
     def shell_type() -> str:
         return "basic"
 
     # NOTE: ShellBase.run can only be used with a string
-    def run(self, code: Union[str, ast.Module, ast.Expression, CodeType]):
+    def run(
+        self,
+        code: Union[str, ast.Module, ast.Expression, CodeType],
+        *,
+        timeout: Optional[float] = None,
+    ):
         """Evaluates the code inside the namespace after ast and string
         transformations and then triggers `post_execute` event
 
+        If `timeout` or `self.timeout` is set the code is ran in a separate
+        process which is killed if it takes longer than that, unless it uses
+        the shell (`abacus`) as changes to it would be lost
+
         Do note that not all transformations can be done on all types of input:
             `str`: All transformations are performed
             `ast.Module` or `ast.Expression`: Only AST transformation will be performed
@@ -70,25 +95,129 @@ class BasicShell(ShellBase):
 
         # TODO: rework this whole thing, it's a mess
 
-        if isinstance(code, str):
-            code = self.str_transform(code.strip().splitlines(keepends=True))
+        profiler = self.profiler
 
-            code = ast.parse("".join(code), filename="<input>", mode="exec")
+        journal = self.journal if isinstance(code, str) else None
+        if journal is not None:
+            before = namespace.snapshot(self.user_ns)
+            start = perf_counter()
 
-        if isinstance(code, ast.AST):
-            self.ast_transform(code)
+        if isinstance(code, str):
+            stmt, module = self._compile_str(code)
+        else:
+            if isinstance(code, ast.AST):
+                with profiler.stage("ast_transform"):
+                    self.ast_transform(code)
+
+            with profiler.stage("compile"):
+                stmt, module = self.compile_ast(code)
+
+        def execute():
+            if module is not None:
+                with profiler.stage("exec"):
+                    self.interpreter.runcode(module)
+
+            # TODO: experiment with manually printing instead of single eval,
+            # that way i can control how everything is printed and for
+            # example single value inside an array can be extracted
+            with profiler.stage("exec_single"), self._display_stage():
+                self.interpreter.runcode(stmt)
+
+        if timeout is None:
+            timeout = self.timeout
+
+        # NOTE: changes to the shell would be lost with the process
+        if timeout is None or self._uses_shell(stmt, module):
+            execute()
+        else:
+            from ..timeout import EvaluationTimeout
+
+            try:
+                self.run_limited(execute, timeout)
+            except EvaluationTimeout as ex:
+                print(f"{type(ex).__name__}: {ex}", file=sys.stderr)
+
+        # NOTE: before `post_execute` so the cells are ran as part of this one
+        if self.reactive is not None and isinstance(code, str):
+            self._react(code, self._transformed)
+
+        with profiler.stage("post_execute"):
+            self.trigger_event(self.EVENT_POST_EXECUTE)
+
+        profiler.count("cells")
+
+        # NOTE: the cell may have started or replayed the journal
+        if journal is not None and journal is self.journal:
+            self._journal_cell(
+                code, self._transformed, perf_counter() - start, before
+            )
+
+    def _compile_str(self, code: str) -> Tuple[CodeType, Optional[CodeType]]:
+        """Transforms and compiles the code, if the same code was already
+        compiled and the namespace still looks the same then cached result is
+        used instead"""
+
+        profiler = self.profiler
+        transformer = self.transformer
+
+        key = (
+            code,
+            tuple(map(id, self.str_transformers)),
+            tuple(map(id, self.ast_transformers)),
+        )
 
-        (stmt, module) = self.compile_ast(code)
+        if transformer is not None:
+            entry = self.code_cache.get(key, transformer.check)
+            if entry is not None:
+                transformer.restore(entry.symbols, entry.integers, entry.names)
+                self._transformed = entry.source
+                return entry.stmt, entry.module
+
+        with profiler.stage("str_transform"):
+            lines = self.str_transform(code.strip().splitlines(keepends=True))
+
+        self._transformed = "".join(lines)
+
+        with profiler.stage("parse"):
+            node = ast.parse("".join(lines), filename="<input>", mode="exec")
+
+        with profiler.stage("ast_transform"):
+            self.ast_transform(node)
+
+        with profiler.stage("compile"):
+            stmt, module = self.compile_ast(node)
+
+        if transformer is not None:
+            self.code_cache.put(
+                key,
+                CacheEntry(
+                    deps=tuple(transformer.lookups.items()),
+                    symbols=tuple(transformer.symbols),
+                    integers=tuple(transformer.integers),
+                    stmt=stmt,
+                    module=module,
+                    source=self._transformed,
+                    names=transformer.names,
+                ),
+            )
 
-        if module is not None:
-            self.interpreter.runcode(module)
+        return stmt, module
 
-        # TODO: experiment with manually printing instead of single eval, that
-        # way i can control how everything is printed and for example single
-        # value inside an array can be extracted
-        self.interpreter.runcode(stmt)
+    @contextmanager
+    def _display_stage(self):
+        """Times `sys.displayhook` as stage `display` while profiling, as that
+        is where the result gets printed"""
 
-        self.trigger_event(self.EVENT_POST_EXECUTE)
+        if not self.profiler.enabled:
+            yield
+            return
+
+        displayhook = sys.displayhook
+        sys.displayhook = self.profiler.wrap("display", displayhook)
+        try:
+            yield
+        finally:
+            sys.displayhook = displayhook
 
     def compile_ast(
         self, node: ast.Module
@@ -107,6 +236,7 @@ class BasicShell(ShellBase):
 
         module = None
         if len(node.body) >= 1:
+            ast.fix_missing_locations(node)
             module = compile(node, filename="<input>", mode="exec")
 
         return stmt, module
@@ -127,8 +257,4 @@ class BasicShell(ShellBase):
 
         WARNING: the input `code` may be modified in the process"""
 
-        i: Callable[[str], str]
-        for i in self.str_transformers:
-            code = i(code)
-
-        return code
+        return self.str_pipeline(code)
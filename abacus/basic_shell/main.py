@@ -27,12 +27,16 @@ def main_basic(*, pyinstaller=False):
     while True:
         try:
             x = input(":: ")
+        except (KeyboardInterrupt, EOFError):
+            break
 
-            if not x:
-                break
+        if not x:
+            break
 
+        try:
             shell.run(x)
         except KeyboardInterrupt:
-            break
+            # NOTE: only cancels the cell, the session keeps going
+            print("KeyboardInterrupt")
         except Exception as ex:
             print("Error:", ex)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Evaluates large number of independent formulas in parallel"""
+
+import argparse
+import signal
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import (
+    Any,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    Optional,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+from .parallel import cpu_count, submit_ordered
+from .tokenizer import recover_statements
+
+# engine of the worker process
+_engine = None
+
+
+class BatchResult(NamedTuple):
+    index: int
+
+    # line number where the unit starts
+    lineno: int
+
+    source: str
+    value: Any = None
+
+    # formatted exception if the unit failed
+    error: Optional[str] = None
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _raise_timeout(*args):
+    raise _Timeout()
+
+
+def _init_worker():
+    global _engine
+
+    from .engine import Engine
+
+    _engine = Engine()
+
+
+def _evaluate(
+    index: int,
+    lineno: int,
+    source: str,
+    timeout: Optional[float],
+    error: Optional[str] = None,
+) -> BatchResult:
+    if error is not None:
+        return BatchResult(index, lineno, source, error=error)
+
+    # NOTE: timeout is done using a timer signal which works only on POSIX,
+    # workers run it on the main thread so it's safe to use
+    use_timer = timeout is not None and hasattr(signal, "setitimer")
+    if use_timer:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    try:
+        value = _engine.run(source)  # type: ignore
+    except _Timeout:
+        return BatchResult(
+            index, lineno, source, error=f"Timeout after {timeout}s"
+        )
+    except Exception as ex:
+        return BatchResult(index, lineno, source, error=_format_error(ex))
+    finally:
+        if use_timer:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    return BatchResult(index, lineno, source, value)
+
+
+def _format_error(ex: BaseException) -> str:
+    return f"{type(ex).__name__}: {ex}"
+
+
+def evaluate_batch(
+    units: Iterable[Union[Tuple[int, str], Tuple[int, str, Optional[str]]]],
+    *,
+    workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> Iterator[BatchResult]:
+    """Evaluates each unit in a pool of worker processes, units are tuples of
+    line number and source code, optionally followed by a syntax error which
+    is reported instead of evaluating it
+
+    Workers are started with a loaded `Engine` and each keeps its namespace
+    between units, so units are expected to be independent of each other
+
+    Results are yielded in order of the units as soon as they are done, units
+    that take longer than `timeout` seconds are stopped and reported as
+    errors (POSIX only)"""
+
+    if workers is None:
+        workers = cpu_count()
+
+    items = (
+        (index, unit[0], unit[1], timeout, *unit[2:])
+        for index, unit in enumerate(units)
+    )
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker) as executor:
+        futures = submit_ordered(executor, _evaluate, items, window=8 * workers)
+
+        for (index, lineno, source, *_), future in futures:
+            try:
+                yield future.result()
+            except Exception as ex:
+                # the result could not be sent back or the worker died
+                yield BatchResult(
+                    index, lineno, source, error=_format_error(ex)
+                )
+
+
+def evaluate_file(file: TextIO, **kwargs) -> Iterator[BatchResult]:
+    """Splits the file into top level statements and evaluates them using
+    `evaluate_batch`, the file is read lazily
+
+    Statement that cannot be split (like an unclosed bracket) is reported as
+    an error of its first line and the rest of the file is still evaluated"""
+
+    return evaluate_batch(recover_statements(file.readline), **kwargs)
+
+
+def main_batch(argv=None):
+    """Starting point of `abacus batch`"""
+
+    parser = argparse.ArgumentParser(
+        prog="abacus batch",
+        description="Evaluates each top level statement of the file in "
+        "parallel and prints one result per statement in order",
+    )
+    parser.add_argument(
+        "file",
+        type=argparse.FileType("r"),
+        help="file to evaluate, - for stdin",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "-t",
+        "--timeout",
+        type=float,
+        default=None,
+        help="time limit in seconds for each statement",
+    )
+    args = parser.parse_args(argv)
+
+    failed = False
+    with args.file:
+        for result in evaluate_file(
+            args.file, workers=args.jobs, timeout=args.timeout
+        ):
+            if result.error is not None:
+                failed = True
+                print(f"Error (line {result.lineno}): {result.error}")
+            elif result.value is None:
+                print()
+            else:
+                print(result.value)
+
+    return 1 if failed else 0
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Contains benchmarks, run them using `python -m abacus.bench [name ...]`"""
+
+import timeit
+
+from typing import Callable
+
+
+def measure(fn: Callable[[], object], *, repeat: int = 5) -> float:
+    """Returns the best time of single call of `fn` in seconds"""
+
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+
+    return min(timer.repeat(repeat=repeat, number=number)) / number
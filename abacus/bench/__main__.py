@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import importlib
+import pkgutil
+import sys
+
+from . import __path__ as _path
+
+# run all benchmarks or just the ones passed as arguments
+names = sys.argv[1:] or [
+    i.name[len("bench_") :]
+    for i in pkgutil.iter_modules(_path)
+    if i.name.startswith("bench_")
+]
+
+for name in names:
+    print(f":: {name}")
+    importlib.import_module(f"{__package__}.bench_{name}").main()
+    print()
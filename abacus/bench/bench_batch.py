@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Measures throughput of `evaluate_batch` with different number of workers"""
+
+from time import perf_counter
+
+from ..batch import evaluate_batch
+from ..parallel import cpu_count
+
+UNITS = [
+    (i + 1, f"sympy.expand((x + {i})**4 * (y - {i % 7})**3)")
+    for i in range(2000)
+]
+
+
+def main():
+    print(f"{'workers':>8} {'time':>10} {'units/s':>10}")
+
+    workers = 1
+    while workers <= cpu_count():
+        start = perf_counter()
+        for result in evaluate_batch(UNITS, workers=workers):
+            assert result.error is None, result.error
+        elapsed = perf_counter() - start
+
+        print(f"{workers:>8} {elapsed:>9.2f}s {len(UNITS) / elapsed:>10.0f}")
+
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
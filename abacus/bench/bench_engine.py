@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Measures per expression overhead of `Engine`"""
+
+from time import perf_counter
+
+from ..engine import Engine
+from . import measure
+
+
+def main():
+    engine = Engine()
+    engine.run("a = 3")
+
+    print(f"{'expression':<24} {'time':>10}")
+    for expr in ["1", "1 + 2", "a * 3", "2x + 3y**2", "solve(x - a, x)"]:
+        print(f"{expr:<24} {measure(lambda: engine.run(expr)) * 1e6:>8.2f}us")
+
+    # distinct expressions so every one of them is transformed and compiled
+    exprs = [f"{i} * a + {i}" for i in range(200)]
+    engine.code_cache.clear()
+
+    start = perf_counter()
+    engine.evaluate_many(exprs)
+    elapsed = perf_counter() - start
+    print(f"{'evaluate_many (cold)':<24} {elapsed / len(exprs) * 1e6:>8.2f}us")
+
+    elapsed = measure(lambda: engine.evaluate_many(exprs))
+    print(
+        f"{'evaluate_many (cached)':<24} {elapsed / len(exprs) * 1e6:>8.2f}us"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Compares evaluating an expression over many points using `subs` and
+`numeric`"""
+
+from time import perf_counter
+
+import sympy
+
+from ..numeric import HAS_NUMPY, numeric
+
+POINTS = 2000
+
+
+def main():
+    x = sympy.Symbol("x")
+    expr = sympy.sin(x) ** 2 + sympy.exp(-x) * x**3
+    points = [i / POINTS for i in range(POINTS)]
+
+    start = perf_counter()
+    expected = [float(expr.subs(x, i)) for i in points]
+    subs = perf_counter() - start
+    print(f"{'subs':<20} {subs * 1000:>8.1f}ms")
+
+    variants = [("numeric (math)", False)]
+    if HAS_NUMPY:
+        variants.append(("numeric (numpy)", True))
+
+    for name, vectorized in variants:
+        start = perf_counter()
+        result = numeric(expr, x, vectorized=vectorized)(points)
+        elapsed = perf_counter() - start
+
+        assert all(abs(a - b) < 1e-9 for a, b in zip(result, expected))
+        print(f"{name:<20} {elapsed * 1000:>8.1f}ms {subs / elapsed:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Compares calling string transformers one by one to `TransformerPipeline`
+which tokenizes the input only once"""
+
+from tokenize import TokenInfo
+from typing import List
+
+from ..shell import StringTransformer, TransformerPipeline
+from . import measure
+
+SOURCE = "\n".join(
+    f"x{i} = {i} * (a + b) ** 2 - c / d  # comment {i}" for i in range(200)
+)
+
+
+class Identity(StringTransformer):
+    """Token transformer that changes nothing but still returns the tokens"""
+
+    def transform_tokens(self, tokens: List[TokenInfo]) -> List[TokenInfo]:
+        return tokens
+
+
+def main():
+    lines = SOURCE.splitlines(keepends=True)
+
+    print(
+        f"{'transformers':>12} {'chained':>12} {'pipeline':>12} {'speedup':>8}"
+    )
+    for n in [1, 2, 4, 8]:
+        transformers = [Identity() for _ in range(n)]
+        pipeline = TransformerPipeline(transformers)
+
+        def chained():
+            result = lines
+            for i in transformers:
+                result = i(result)
+
+            return result
+
+        assert chained() == pipeline(lines)
+
+        chained_time = measure(chained)
+        pipeline_time = measure(lambda: pipeline(lines))
+
+        print(
+            f"{n:>12} {chained_time * 1e3:>10.2f}ms"
+            f" {pipeline_time * 1e3:>10.2f}ms"
+            f" {chained_time / pipeline_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Compares latency of `simplify` and `race_simplify` on expressions where
+different strategies are the fastest"""
+
+from time import perf_counter
+
+import sympy
+
+from ..race import race_simplify
+
+DEADLINE = 2.0
+
+
+def main():
+    x, y = sympy.symbols("x y")
+    exprs = [
+        sympy.sin(x) ** 2 + sympy.cos(x) ** 2,
+        (x**2 - 1) / (x - 1) + y / (y**2 + 2 * y + 1),
+        1 / (sympy.sqrt(2) + sympy.sqrt(3)),
+        sympy.expand((x + y) ** 12) / (x + y) ** 10,
+    ]
+
+    print(f"{'':<4} {'simplify':>10} {'race':>10} {'ops':>9}")
+
+    for i, expr in enumerate(exprs):
+        start = perf_counter()
+        expected = sympy.simplify(expr)
+        plain = perf_counter() - start
+
+        start = perf_counter()
+        result = race_simplify(expr, deadline=DEADLINE)
+        race = perf_counter() - start
+
+        ops = f"{sympy.count_ops(expected)}/{sympy.count_ops(result)}"
+        print(f"{i:<4} {plain * 1000:>8.1f}ms {race * 1000:>8.1f}ms {ops:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Load test of `abacus serve`, several clients send requests at once and
+latency of each is measured on the client side"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+
+from time import perf_counter
+
+from ..server import Client, serve
+
+CLIENTS = 8
+REQUESTS = 50
+
+EXPRS = [
+    "expand((x + y)**5)",
+    "a = 2x + 3x",
+    "a**2 - 1",
+    "factor(x**4 - 1)",
+    "sympy.diff(sympy.sin(x) * x**2, x)",
+]
+
+
+def percentile(values, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def client(path: str, index: int, latencies):
+    conn = await Client.connect(path)
+    session = f"bench-{index}"
+
+    for i in range(REQUESTS):
+        start = perf_counter()
+        response = await conn.request(
+            code=EXPRS[i % len(EXPRS)], session=session
+        )
+        latencies.append(perf_counter() - start)
+
+        assert response["error"] is None, response
+
+    await conn.close()
+
+
+async def run(path: str):
+    server = asyncio.create_task(serve(path=path))
+    while not os.path.exists(path):
+        await asyncio.sleep(0.05)
+
+    latencies = []
+    start = perf_counter()
+    await asyncio.gather(*(client(path, i, latencies) for i in range(CLIENTS)))
+    elapsed = perf_counter() - start
+
+    server.cancel()
+    try:
+        await server
+    except asyncio.CancelledError:
+        pass
+
+    return latencies, elapsed
+
+
+def main():
+    # what each request would cost without the server
+    start = perf_counter()
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "from abacus.basic_shell.basic_shell import BasicShell; "
+            "BasicShell()",
+        ],
+        check=True,
+    )
+    cold = perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        latencies, elapsed = asyncio.run(
+            run(os.path.join(directory, "abacus.sock"))
+        )
+
+    print(f"{'cold shell':<12} {cold * 1000:>8.1f}ms")
+    print(f"{'p50':<12} {percentile(latencies, 0.5) * 1000:>8.1f}ms")
+    print(f"{'p99':<12} {percentile(latencies, 0.99) * 1000:>8.1f}ms")
+    print(f"{'throughput':<12} {len(latencies) / elapsed:>8.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
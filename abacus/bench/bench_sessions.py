@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Throughput of evaluating in a thread pool, sessions of one engine are
+compared to a single engine shared behind a lock"""
+
+import sys
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from ..engine import Engine
+
+TASKS = 32
+EXPRS = [
+    "a = expand((x + y)**8)",
+    "factor(a)",
+    "b = (x**2 - 1) / (x - 1)",
+    "sympy.cancel(b)",
+    "sympy.diff(sympy.sin(x) * x**3, x, 2)",
+]
+
+
+def main():
+    engine = Engine()
+    lock = threading.Lock()
+
+    def locked(i: int):
+        for expr in EXPRS:
+            with lock:
+                engine.run(expr)
+
+    def session(i: int):
+        session = engine.session()
+        for expr in EXPRS:
+            session.run(expr)
+
+    # NOTE: so the first run does not pay for sympy caches
+    locked(0)
+    session(0)
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"GIL {'enabled' if gil else 'disabled'}")
+    print(f"{'threads':<8} {'locked':>10} {'sessions':>10}")
+
+    for threads in (1, 2, 4, 8):
+        rates = []
+        for fn in (locked, session):
+            with ThreadPoolExecutor(threads) as executor:
+                start = perf_counter()
+                list(executor.map(fn, range(TASKS)))
+                elapsed = perf_counter() - start
+
+            rates.append(TASKS * len(EXPRS) / elapsed)
+
+        print(f"{threads:<8} {rates[0]:>8.0f}/s {rates[1]:>8.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Time to restore a saved session with thousands of expressions, compared to
+plain pickle which evaluates each expression again"""
+
+import pickle
+import sys
+import tempfile
+
+from pathlib import Path
+from time import perf_counter
+
+from ..engine import Engine
+
+EXPRESSIONS = 3000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else EXPRESSIONS
+
+    engine = Engine()
+    engine.run(
+        f"exprs = [expand((x + i*y + z)**3) / (x - i) + sin(i*x) * exp(y) for i in range({count})]"
+    )
+
+    exprs = engine.user_ns.pop("exprs")
+    engine.push({f"e{i}": expr for i, expr in enumerate(exprs)})
+
+    from sympy.core.cache import clear_cache
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "session.pickle"
+
+        start = perf_counter()
+        engine.save_session(path)
+        saved = perf_counter() - start
+
+        # NOTE: so nothing is reused from the sympy cache
+        clear_cache()
+
+        start = perf_counter()
+        info = Engine().load_session(path)
+        loaded = perf_counter() - start
+
+        data = pickle.dumps(exprs, protocol=pickle.HIGHEST_PROTOCOL)
+        clear_cache()
+
+        start = perf_counter()
+        pickle.loads(data)
+        plain = perf_counter() - start
+
+        print(f"{len(info.names)} names, {path.stat().st_size} bytes")
+
+    print(f"{'save':<14} {saved * 1000:>8.0f}ms")
+    print(f"{'load':<14} {loaded * 1000:>8.0f}ms")
+    print(f"{'plain pickle':<14} {plain * 1000:>8.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
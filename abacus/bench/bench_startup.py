@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Measures time to first prompt of the shells, with and without lazy imports"""
+
+import os
+import subprocess
+import sys
+
+from time import perf_counter
+from typing import Optional, Tuple
+
+REPEAT = 5
+SHELLS = ["abacus.basic", "abacus.ipython"]
+# NOTE: the welcome message contains "::" as well
+PROMPT = b"\n:: "
+
+
+def _read_until(fd: int, needle: bytes, output: bytes = b"") -> bytes:
+    while needle not in output:
+        chunk = os.read(fd, 4096)
+        if not chunk:
+            raise EOFError(output.decode(errors="replace"))
+
+        output += chunk
+
+    return output
+
+
+def startup(module: str, lazy: bool) -> Tuple[float, float]:
+    """Returns seconds until the first prompt is shown and until the result of
+    the first input is shown"""
+
+    env = dict(os.environ, ABACUS_LAZY="1" if lazy else "0")
+    start = perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", module],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        env=env,
+    )
+
+    try:
+        fd = proc.stdout.fileno()
+
+        output = _read_until(fd, PROMPT)
+        prompt = perf_counter() - start
+
+        proc.stdin.write(b"2 + 2\n")
+        proc.stdin.flush()
+        _read_until(fd, b"4\n", output.partition(PROMPT)[2])
+        result = perf_counter() - start
+    finally:
+        proc.kill()
+        proc.wait()
+        proc.stdin.close()
+        proc.stdout.close()
+
+    return prompt, result
+
+
+def _best(module: str, lazy: bool) -> Optional[Tuple[float, float]]:
+    try:
+        times = [startup(module, lazy) for _ in range(REPEAT)]
+    except EOFError:
+        # shell exited before showing the prompt, probably not installed
+        return None
+
+    return min(i[0] for i in times), min(i[1] for i in times)
+
+
+def main():
+    print(f"{'shell':<16} {'lazy':>5} {'prompt':>10} {'result':>10}")
+
+    for module in SHELLS:
+        for lazy in (False, True):
+            times = _best(module, lazy)
+            if times is None:
+                print(f"{module:<16} {lazy!s:>5} {'failed':>10}")
+                continue
+
+            prompt, result = times
+            print(
+                f"{module:<16} {lazy!s:>5} {prompt * 1000:>8.0f}ms"
+                f" {result * 1000:>8.0f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import hashlib
+import marshal
+import os
+import threading
+
+from collections import OrderedDict
+from pathlib import Path
+from types import CodeType
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Hashable,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+
+class CacheEntry(NamedTuple):
+    """Compiled cell with everything needed to check if it is still valid"""
+
+    # (name, kind) pairs the transformation depended on
+    deps: Tuple[Tuple[str, Any], ...]
+
+    # symbols created during the transformation
+    symbols: Tuple[str, ...]
+
+    # pooled integers bound during the transformation
+    integers: Tuple[int, ...]
+
+    stmt: CodeType
+    module: Optional[CodeType]
+
+    # source after string transformations
+    source: Optional[str] = None
+
+    # global names loaded and stored, if known
+    names: Optional[Tuple[FrozenSet[str], FrozenSet[str]]] = None
+
+
+class CodeCache:
+    """LRU cache of compiled cells
+
+    Each entry carries namespace shape it was compiled with (`deps`), on lookup
+    the entry is only used if `validate(deps)` is true so a name changing from
+    callable to non-callable for example recompiles the cell"""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+
+        # NOTE: sessions of an engine share the cache across threads
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(
+        self,
+        key: Hashable,
+        validate: Callable[[Tuple[Tuple[str, Any], ...]], bool],
+    ) -> Optional[CacheEntry]:
+        """Returns cached entry if it exists and it's still valid"""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not validate(entry.deps):
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        return entry
+
+    def put(self, key: Hashable, entry: CacheEntry):
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+
+
+class DiskCache:
+    """Compiled files stored on disk, similar to `.pyc` files
+
+    There is one cache file per `name` and an entry is used only if it was
+    stored with the same `key`, so changed source just overwrites the old
+    entry, `deps` are validated the same as in `CodeCache`"""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, name: str) -> Path:
+        digest = hashlib.sha256(name.encode()).hexdigest()[:32]
+
+        return self.directory / f"{digest}.bin"
+
+    def get(
+        self,
+        name: str,
+        key: bytes,
+        validate: Callable[[Tuple[Tuple[str, Any], ...]], bool],
+    ) -> Optional[CacheEntry]:
+        """Returns cached entry if it exists and it's still valid, any error
+        while reading it is treated as a miss"""
+
+        try:
+            stored_key, fields = marshal.loads(self.path(name).read_bytes())
+            entry = CacheEntry(*fields)
+        except (OSError, EOFError, ValueError, TypeError):
+            entry = None
+        else:
+            if stored_key != key or not validate(entry.deps):
+                entry = None
+
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return entry
+
+    def put(self, name: str, key: bytes, entry: CacheEntry):
+        """Stores the entry, errors are ignored as the cache is optional"""
+
+        path = self.path(name)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp.write_bytes(marshal.dumps((key, tuple(entry))))
+
+            # NOTE: replaced atomically so other processes never read half
+            # written file
+            os.replace(tmp, path)
+        except (OSError, ValueError):
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
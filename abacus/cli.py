@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Non-interactive use of abacus, like in shell pipelines"""
+
+import argparse
+import json
+import sys
+
+from io import StringIO
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, TextIO, Tuple
+
+from .engine import Engine
+from .tokenizer import recover_statements
+
+# arguments that mean abacus is not used interactively
+CLI_ARGS = (
+    "-e",
+    "--eval",
+    "-f",
+    "--file",
+    "--json",
+    "-u",
+    "--unbuffered",
+    "--session",
+)
+
+
+def wants_cli(argv: List[str], stdin: TextIO = sys.stdin) -> bool:
+    """Checks if arguments are meant for the CLI, or if there are none and
+    input is not interactive"""
+
+    if not argv:
+        return not stdin.isatty()
+
+    return any(i.split("=", 1)[0] in CLI_ARGS for i in argv)
+
+
+def _inputs(
+    sources: List[Tuple[str, str]], stdin: TextIO
+) -> Iterator[Tuple[int, str, Optional[str]]]:
+    """Yields line number, source and syntax error of each statement of all
+    inputs in order, files are read lazily
+
+    A statement that cannot be split, like an unclosed bracket, is reported
+    as an error of its first line and the rest is evaluated as usual"""
+
+    for kind, value in sources:
+        if kind == "expr":
+            yield from recover_statements(StringIO(value).readline)
+        elif value == "-":
+            yield from recover_statements(stdin.readline)
+        else:
+            with open(value, "r") as file:
+                yield from recover_statements(file.readline)
+
+
+def format_result(
+    lineno: int,
+    source: str,
+    value: Any = None,
+    error: Optional[str] = None,
+    *,
+    as_json=False,
+) -> str:
+    """Formats result of a single statement as a single line"""
+
+    if as_json:
+        return json.dumps(
+            {
+                "line": lineno,
+                "input": source.rstrip("\n"),
+                "result": None if value is None else str(value),
+                "error": error,
+            }
+        )
+
+    if error is not None:
+        return f"Error (line {lineno}): {error}"
+    elif value is None:
+        return ""
+
+    return str(value)
+
+
+def main_cli(argv=None, *, stdin: TextIO = None, stdout: TextIO = None) -> int:
+    """Evaluates expressions from arguments, files or stdin one after another
+    in the same namespace, printing one line per top level statement"""
+
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+
+    parser = argparse.ArgumentParser(
+        prog="abacus",
+        description="Evaluates statements in order and prints one result per "
+        "statement, reads stdin if there is no -e or -f",
+    )
+    parser.add_argument(
+        "-e",
+        "--eval",
+        dest="sources",
+        action="append",
+        type=lambda x: ("expr", x),
+        metavar="EXPR",
+        help="evaluate EXPR, can be repeated",
+    )
+    parser.add_argument(
+        "-f",
+        "--file",
+        dest="sources",
+        action="append",
+        type=lambda x: ("file", x),
+        metavar="FILE",
+        help="evaluate each statement of FILE, - for stdin, can be repeated",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="print results as JSON Lines",
+    )
+    parser.add_argument(
+        "-u",
+        "--unbuffered",
+        action="store_true",
+        help="flush after each result",
+    )
+    parser.add_argument(
+        "--session",
+        metavar="PATH",
+        help="restore names from PATH if it exists and save them back on exit",
+    )
+    args = parser.parse_args(argv)
+
+    sources = args.sources or [("file", "-")]
+
+    # NOTE: the namespace is loaded once for the whole stream, long streams
+    # tend to repeat same expressions so the code cache is made bigger
+    engine = Engine()
+    engine.code_cache.maxsize = 4096
+
+    session = None if args.session is None else Path(args.session)
+    if session is not None and session.exists():
+        try:
+            engine.load_session(session)
+        except (OSError, ValueError) as ex:
+            parser.exit(2, f"abacus: {ex}\n")
+
+    failed = False
+    statements = _inputs(sources, stdin)
+    while True:
+        try:
+            lineno, source, error = next(statements)
+        except StopIteration:
+            break
+        except OSError as ex:
+            parser.exit(2, f"abacus: {ex}\n")
+
+        value = None
+        if error is not None:
+            failed = True
+        else:
+            try:
+                value = engine.run(source)
+            except Exception as ex:
+                failed = True
+                error = f"{type(ex).__name__}: {ex}"
+
+        stdout.write(
+            format_result(lineno, source, value, error, as_json=args.json)
+        )
+        stdout.write("\n")
+
+        if args.unbuffered:
+            stdout.flush()
+
+    if session is not None:
+        engine.save_session(session)
+
+    return 1 if failed else 0
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Per execution state, so one loaded shell can run code in several
+namespaces at the same time"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional
+
+if TYPE_CHECKING:
+    from .shell import ShellBase
+
+_current: "ContextVar[Optional[ExecutionContext]]" = ContextVar(
+    "abacus_context", default=None
+)
+
+
+class ExecutionContext:
+    """Namespace and per cell state used while running code of a session
+
+    While it's active `user_ns` of the shell is `ns` and transformers keep
+    their state of the cell in `state`, it's stored in a context variable so
+    each thread or asyncio task has its own"""
+
+    def __init__(self, shell: "ShellBase", ns: Dict[str, Any]):
+        self.shell = shell
+        self.ns = ns
+
+        # per cell state of each transformer
+        self.state: Dict[Any, Any] = {}
+
+    @contextmanager
+    def activate(self) -> Iterator["ExecutionContext"]:
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+
+def current_context(shell: "ShellBase") -> Optional[ExecutionContext]:
+    """Returns active context of the shell, `None` if there is none"""
+
+    context = _current.get()
+    if context is not None and context.shell is shell:
+        return context
+
+    return None
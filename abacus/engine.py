@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Headless version of abacus meant to be embedded into other programs"""
+
+import ast
+import sys
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .basic_shell.basic_shell import BasicShell
+from .context import ExecutionContext
+from .shell import CodeType
+
+
+class Engine(BasicShell):
+    """Shell that returns results as values instead of printing them
+
+    The namespace is loaded once and shared by all evaluations, compiled
+    expressions are cached so evaluating same expression again is cheap
+
+    >>> engine = Engine()
+    >>> engine.run("2x + 3x")
+    5*x
+    >>> engine.evaluate_many(["a = 2", "a**10"])
+    [None, 1024]"""
+
+    # NOTE: results should not depend on who is running it
+    load_user_init = False
+
+    @staticmethod
+    def shell_type() -> str:
+        return "engine"
+
+    def init_printing(self, **kwargs):
+        # NOTE: setting up printing replaces the displayhook, the engine does
+        # not print so don't affect the program using it
+        def init(sympy):
+            displayhook = sys.displayhook
+            try:
+                sympy.init_printing(**kwargs)
+            finally:
+                sys.displayhook = displayhook
+
+        self.when_imported("sympy", init)
+
+    def display(self, value: Any):
+        pass
+
+    def run(  # type: ignore[override]
+        self, code: str, *, timeout: Optional[float] = None
+    ) -> Any:
+        """Evaluates the code after all transformations and returns value of
+        the last statement if it's an expression, `None` otherwise
+
+        If `timeout` or `self.timeout` is set the code is ran in a separate
+        process, `abacus.timeout.EvaluationTimeout` is raised if it takes
+        longer than that and the value has to be picklable, code using the
+        shell (`abacus`) is always ran in this process
+
+        Exceptions are raised to the caller, `post_execute` event is triggered
+        either way"""
+
+        stmt, module = self._compile_str(code)
+
+        def execute():
+            if module is not None:
+                exec(module, self.user_ns)
+
+            return eval(stmt, self.user_ns)
+
+        if timeout is None:
+            timeout = self.timeout
+
+        try:
+            # NOTE: changes to the shell would be lost with the process
+            if timeout is None or self._uses_shell(stmt, module):
+                return execute()
+
+            return self.run_limited(execute, timeout)
+        finally:
+            self.trigger_event(self.EVENT_POST_EXECUTE)
+
+    def session(self) -> "Session":
+        """Returns new session with its own copy of the namespace as it is
+        now, see `Session`"""
+
+        return Session(self, dict(self._ns))
+
+    def evaluate_many(
+        self, exprs: Iterable[str], *, return_exceptions: bool = False
+    ) -> List[Any]:
+        """Runs each expression in order and returns list of the results
+
+        If `return_exceptions` is true exceptions are returned in place of the
+        result instead of being raised"""
+
+        if not return_exceptions:
+            return [self.run(i) for i in exprs]
+
+        results = []
+        for i in exprs:
+            try:
+                results.append(self.run(i))
+            except Exception as ex:
+                results.append(ex)
+
+        return results
+
+    def compile_ast(
+        self, node: ast.Module
+    ) -> Tuple[CodeType, Optional[CodeType]]:
+        """Same as `BasicShell.compile_ast` except the last statement is
+        compiled so `eval` returns its value instead of printing it"""
+
+        stmt = node.body.pop(-1)
+
+        if isinstance(stmt, ast.Expr):
+            stmt = ast.Expression(body=stmt.value)
+            mode = "eval"
+        else:
+            # NOTE: eval on code compiled in exec mode returns None
+            stmt = ast.Module(body=[stmt], type_ignores=[])
+            mode = "exec"
+
+        ast.fix_missing_locations(stmt)
+        stmt = compile(stmt, filename="<input>", mode=mode)
+
+        module = None
+        if len(node.body) >= 1:
+            ast.fix_missing_locations(node)
+            module = compile(node, filename="<input>", mode="exec")
+
+        return stmt, module
+
+
+class Session:
+    """Namespace of its own evaluated by a shared `Engine`
+
+    Sessions share everything that is loaded, like sympy, the transformers and
+    compiled code, so they are cheap to create and different sessions can be
+    used from different threads at the same time
+
+    >>> session = engine.session()
+    >>> session.run("a = 2")
+    >>> session.run("a x")
+    2*x"""
+
+    def __init__(self, engine: Engine, ns: Dict[str, Any]):
+        self.engine = engine
+        self.user_ns = ns
+
+    def _context(self) -> ExecutionContext:
+        # NOTE: new context each time so state of a cell is never shared
+        return ExecutionContext(self.engine, self.user_ns)
+
+    def run(self, code: str, *, timeout: Optional[float] = None) -> Any:
+        """Same as `Engine.run` but in namespace of the session"""
+
+        with self._context().activate():
+            return self.engine.run(code, timeout=timeout)
+
+    def evaluate_many(
+        self, exprs: Iterable[str], *, return_exceptions: bool = False
+    ) -> List[Any]:
+        """Same as `Engine.evaluate_many` but in namespace of the session"""
+
+        with self._context().activate():
+            return self.engine.evaluate_many(
+                exprs, return_exceptions=return_exceptions
+            )
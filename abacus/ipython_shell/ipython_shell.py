@@ -16,18 +16,27 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import ast
+import pickle
+import re
+import sys
 
-from typing import Any, Callable, Dict, List
+from time import monotonic, perf_counter
+from types import CodeType
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
+from .. import namespace
 from ..shell import ShellBase
 from . import aliases, prompt
 
+# names ipython binds to the input and output history
+_HISTORY_NAME = re.compile(r"_+|_i+|_\d+|_i\d+|_ih|_oh|_dh|In|Out")
+
 
 # TODO: override ipythonshell class to better get debug stuff and maybe directly
 # transform stuff?
 class IPythonShell(ShellBase):
-    def __init__(self, /, ipy):
-        super().__init__()
+    def __init__(self, /, ipy, *, lazy: Optional[bool] = None):
+        super().__init__(lazy=lazy)
 
         self.ipython = ipy
 
@@ -39,6 +48,51 @@ class IPythonShell(ShellBase):
         self.ipython.extension_manager.load_extension(prompt.__name__)
         self.ipython.extension_manager.load_extension(aliases.__name__)
 
+        self._install_profiler()
+        self._install_timeout()
+        self._install_cell_source()
+        self._install_journal()
+        self._install_reactive()
+
+        self.ipython.register_magic_function(
+            self._table_magic, magic_kind="line", magic_name="table"
+        )
+        self.ipython.register_magic_function(
+            self._memo_magic, magic_kind="line", magic_name="abacus_memo"
+        )
+        self.ipython.register_magic_function(
+            self._timeout_magic, magic_kind="line_cell", magic_name="timeout"
+        )
+        self.ipython.register_magic_function(
+            self._bg_magic, magic_kind="line_cell", magic_name="bg"
+        )
+        self.ipython.register_magic_function(
+            self._jobs_magic, magic_kind="line", magic_name="jobs"
+        )
+        self.ipython.register_magic_function(
+            self._journal_magic, magic_kind="line", magic_name="journal"
+        )
+        self.ipython.register_magic_function(
+            self._reactive_magic, magic_kind="line", magic_name="reactive"
+        )
+        self.ipython.register_magic_function(
+            self._save_session_magic,
+            magic_kind="line",
+            magic_name="save_session",
+        )
+        self.ipython.register_magic_function(
+            self._load_session_magic,
+            magic_kind="line",
+            magic_name="load_session",
+        )
+
+        # finished background jobs are merged before each cell
+        self.register_event("pre_run_cell", lambda *args: self.check_jobs())
+
+        # NOTE: all abacus string transformers are ran through the pipeline
+        # so the cell is tokenized only once
+        self.ipython.input_transformers_post.append(self.str_pipeline)
+
         self.load()
 
     @property
@@ -55,7 +109,7 @@ class IPythonShell(ShellBase):
 
     @property
     def str_transformers(self) -> List[Callable]:
-        return self.ipython.input_transformers_post
+        return self.str_pipeline.transformers
 
     @staticmethod
     def shell_type() -> str:
@@ -68,3 +122,460 @@ class IPythonShell(ShellBase):
 
     def run(self, code: str):
         self.ipython.run_cell(code)
+
+    def push_hidden(self, name: str, value: Any):
+        # NOTE: hidden from %who and the like
+        self.ipython.user_ns[name] = value
+        self.ipython.user_ns_hidden[name] = value
+
+    def _save_name(self, name: str) -> bool:
+        return (
+            super()._save_name(name)
+            and name not in self.ipython.user_ns_hidden
+            and _HISTORY_NAME.fullmatch(name) is None
+        )
+
+    def _install_profiler(self):
+        """Wraps IPython cell stages so they are timed while profiling"""
+
+        ipy = self.ipython
+        profiler = self.profiler
+
+        ipy.transform_cell = profiler.wrap("transform_cell", ipy.transform_cell)
+        ipy.compile.ast_parse = profiler.wrap("parse", ipy.compile.ast_parse)
+        ipy.transform_ast = profiler.wrap("ast_transform", ipy.transform_ast)
+        ipy.display_formatter.format = profiler.wrap(
+            "display", ipy.display_formatter.format
+        )
+
+        # the whole cell is timed using events
+        start = None
+
+        def pre_run_cell(*args):
+            nonlocal start
+            start = perf_counter()
+
+        def post_run_cell(*args):
+            nonlocal start
+            if profiler.enabled and start is not None:
+                profiler.add("run_cell", perf_counter() - start)
+                profiler.count("cells")
+
+            start = None
+
+        self.register_event("pre_run_cell", pre_run_cell)
+        self.register_event("post_run_cell", post_run_cell)
+
+        ipy.register_magic_function(
+            self._profile_magic, magic_kind="line", magic_name="abacus_profile"
+        )
+
+    def _install_cell_source(self):
+        """Keeps raw and transformed source of the current cell in `_cell`"""
+
+        ipy = self.ipython
+        self._cell: Optional[Tuple[str, str]] = None
+
+        transform_cell = ipy.transform_cell
+
+        def source_transform_cell(raw_cell: str) -> str:
+            result = transform_cell(raw_cell)
+            self._cell = (raw_cell, result)
+
+            return result
+
+        ipy.transform_cell = source_transform_cell
+
+        def post_run_cell(*args):
+            self._cell = None
+
+        self.register_event("post_run_cell", post_run_cell)
+
+    def _install_journal(self):
+        """Appends each cell to the journal while journaling, see
+        `start_journal`"""
+
+        journal = before = start = None
+
+        def pre_run_cell(*args):
+            nonlocal journal, before, start
+            journal = self.journal
+            if journal is not None:
+                before = namespace.snapshot(self.user_ns)
+                start = perf_counter()
+
+        def post_run_cell(*args):
+            nonlocal journal, before
+
+            # NOTE: cells that started or replayed the journal are skipped
+            cell = self._cell
+            if (
+                journal is not None
+                and journal is self.journal
+                and cell is not None
+            ):
+                self._journal_cell(
+                    cell[0], cell[1], perf_counter() - start, before
+                )
+
+            journal = before = None
+
+        self.register_event("pre_run_cell", pre_run_cell)
+
+        # NOTE: before the source of the cell is cleared
+        self.event_callbacks.setdefault("post_run_cell", []).insert(
+            0, post_run_cell
+        )
+
+    def _install_reactive(self):
+        """Runs cells that depend on names changed by the cell in reactive
+        mode, see `enable_reactive`"""
+
+        def react(*args):
+            if self.reactive is not None and self._cell is not None:
+                self._react(*self._cell)
+
+        # NOTE: before the transformer forgets what the cell was
+        self.event_callbacks.setdefault(self.EVENT_POST_EXECUTE, []).insert(
+            0, react
+        )
+
+    def compile_cell(self, source: str) -> CodeType:
+        ipy = self.ipython
+
+        lines = ipy.input_transformer_manager.transform_cell(source)
+        lines = lines.splitlines(keepends=True)
+        for i in ipy.input_transformers_post:
+            lines = i(lines)
+
+        node = ipy.compile.ast_parse("".join(lines), filename="<reactive>")
+        node = ipy.transform_ast(node)
+
+        return compile(node, filename="<reactive>", mode="exec")
+
+    def _install_timeout(self):
+        """Wraps `run_code` so code of the cells is ran in a separate process
+        while there is a time limit"""
+
+        ipy = self.ipython
+        run_code = ipy.run_code
+
+        # time limit of current cell set by `%%timeout`
+        self._cell_timeout: Optional[float] = None
+
+        # (deadline, timeout) of the cell that is running
+        self._deadline: Optional[Tuple[float, float]] = None
+
+        def pre_run_cell(*args):
+            timeout = self._cell_timeout
+            if timeout is None:
+                timeout = self.timeout
+
+            if timeout is not None:
+                self._deadline = (monotonic() + timeout, timeout)
+
+        def post_run_cell(*args):
+            self._deadline = None
+
+        async def limited_run_code(code_obj, result=None, *, async_=False):
+            # NOTE: magics and code using the shell change it, which would be
+            # lost with the process
+            if self._deadline is None or async_ or self._uses_shell(code_obj):
+                return await run_code(code_obj, result, async_=async_)
+
+            from ..timeout import EvaluationTimeout, run_forked
+
+            deadline, timeout = self._deadline
+
+            def execute():
+                # NOTE: without async_ the coroutine finishes on first send
+                try:
+                    run_code(code_obj, result).send(None)
+                except StopIteration as ex:
+                    failed = ex.value
+
+                error = value = None
+                if result is not None:
+                    error = result.error_in_exec
+                    value = result.result
+
+                if error is not None:
+                    error = f"{type(error).__name__}: {error}"
+
+                # the output was already shown, only `Out` misses it
+                try:
+                    pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+                except Exception:
+                    value = None
+
+                return failed, error, value
+
+            try:
+                failed, error, value = run_forked(
+                    execute,
+                    max(deadline - monotonic(), 0),
+                    self.user_ns,
+                    self._save_name,
+                )
+            except EvaluationTimeout:
+                # the deadline is relative to the whole cell
+                ex = EvaluationTimeout(timeout)
+                if result is not None:
+                    result.error_in_exec = ex
+
+                print(f"{type(ex).__name__}: {ex}", file=sys.stderr)
+                return True
+
+            # NOTE: the traceback was already shown by the other process
+            if error is not None and result is not None:
+                result.error_in_exec = RuntimeError(error)
+
+            if value is not None:
+                ipy.displayhook.update_user_ns(value)
+                if result is not None:
+                    result.result = value
+
+            return failed
+
+        ipy.run_code = limited_run_code
+
+        self.register_event("pre_run_cell", pre_run_cell)
+        self.register_event("post_run_cell", post_run_cell)
+
+    def _timeout_magic(self, line: str, cell: Optional[str] = None):
+        """Time limit of cells, the code is ran in a separate process which is
+        killed if it takes longer, the namespace is not changed in that case,
+        magics and code using `abacus` are not limited
+
+        %timeout            - print the limit
+        %timeout 10         - limit each cell to 10 seconds
+        %timeout off        - remove the limit
+        %%timeout 10        - limit only this cell"""
+
+        arg = line.strip().lower()
+
+        if not arg and cell is None:
+            print(f"Timeout: {'off' if self.timeout is None else self.timeout}")
+            return
+
+        try:
+            timeout = None if arg == "off" else float(arg)
+        except ValueError:
+            print(f"Unknown argument {arg!r}, see '%timeout?'")
+            return
+
+        if cell is None:
+            self.timeout = timeout
+            return
+
+        self._cell_timeout = timeout
+        try:
+            self.ipython.run_cell(cell)
+        finally:
+            self._cell_timeout = None
+
+    def _bg_magic(self, line: str, cell: Optional[str] = None):
+        """Runs the code in the background so the shell can be used meanwhile
+
+        %bg integrate(f, x)     - run a single line
+        %%bg                    - run the whole cell
+
+        The code is ran on a copy of the namespace, changes it makes and the
+        result (as `_bg<id>`) are merged into the namespace when it finishes,
+        see `%jobs`"""
+
+        source = line if cell is None else cell
+        if not source.strip():
+            print("Nothing to run, see '%bg?'")
+            return
+
+        job = self.run_background(source)
+        print(f"[{job.id}] started")
+
+        return job
+
+    def _jobs_magic(self, line: str):
+        """Lists background jobs started with `%bg`
+
+        %jobs           - list all jobs
+        %jobs 2         - show result or error of job 2
+        %jobs wait      - wait for all jobs to finish
+        %jobs wait 2    - wait for job 2 to finish"""
+
+        args = line.split()
+        jobs = self.jobs.jobs
+
+        try:
+            if args[:1] == ["wait"]:
+                if len(args) > 1:
+                    jobs[int(args[1])].wait()
+                else:
+                    for job in self.jobs.running():
+                        job.wait()
+
+                self.check_jobs()
+            elif args:
+                job = jobs[int(args[0])]
+                print(job.describe())
+
+                if job.traceback is not None:
+                    print(job.traceback, end="")
+                elif job.done():
+                    return job.result
+            else:
+                for job in jobs.values():
+                    print(job.describe())
+        except (KeyError, ValueError):
+            print(f"Unknown argument {line.strip()!r}, see '%jobs?'")
+
+    def _journal_magic(self, line: str):
+        """Journal of cells to recover the session after a crash
+
+        %journal                - show status
+        %journal on [file]      - start a new session in the journal
+        %journal off            - stop journaling
+        %journal checkpoint     - save the namespace so replay starts here
+        %journal replay [file]  - restore the last session and continue it
+
+        By default the journal is in the data directory"""
+
+        arg, _, path = line.strip().partition(" ")
+        path = path.strip() or None
+
+        if not arg:
+            journal = self.journal
+            if journal is None:
+                print("Journal: disabled")
+            else:
+                print(f"Journal: {journal.path} ({journal.index} cells)")
+        elif arg == "on":
+            journal = self.start_journal(path)
+            print(f"Journaling to {journal.path}")
+        elif arg == "off":
+            self.stop_journal()
+        elif arg == "checkpoint":
+            if self.journal is None:
+                print("Journal is disabled, see '%journal?'")
+            else:
+                self.checkpoint()
+        elif arg == "replay":
+            try:
+                ran, loaded = self.replay_journal(path)
+            except (OSError, ValueError) as ex:
+                print(f"Could not replay journal: {ex}")
+            else:
+                print(f"Replayed {ran} cells, loaded {loaded} cached results")
+        else:
+            print(f"Unknown argument {arg!r}, see '%journal?'")
+
+    def _reactive_magic(self, line: str):
+        """Reactive mode, cells that depend on a name are ran again when a
+        cell changes it
+
+        %reactive               - show tracked cells
+        %reactive on            - start tracking cells
+        %reactive off           - stop and forget tracked cells"""
+
+        arg = line.strip().lower()
+
+        if not arg:
+            if self.reactive is None:
+                print("Reactive: disabled")
+                return
+
+            for node in self.reactive.nodes.values():
+                deps = ", ".join(sorted(node.loads)) or "-"
+                print(f"[{node.id}] {node.source.strip()}  <- {deps}")
+        elif arg == "on":
+            self.enable_reactive()
+        elif arg == "off":
+            self.disable_reactive()
+        else:
+            print(f"Unknown argument {arg!r}, see '%reactive?'")
+
+    def _save_session_magic(self, line: str):
+        """Saves names defined in this session so they can be restored later
+        with `%load_session`
+
+        %save_session           - save to the default location
+        %save_session file      - save to file"""
+
+        info = self.save_session(line.strip() or None)
+        print(f"Saved {len(info.names)} names")
+
+    def _load_session_magic(self, line: str):
+        """Restores names saved with `%save_session`
+
+        %load_session           - load from the default location
+        %load_session file      - load from file"""
+
+        try:
+            info = self.load_session(line.strip() or None)
+        except (OSError, ValueError) as ex:
+            print(f"Could not load session: {ex}")
+        else:
+            print(f"Loaded {len(info.names)} names")
+
+    def _profile_magic(self, line: str):
+        """Control abacus profiler
+
+        %abacus_profile         - print recorded stages
+        %abacus_profile on/off  - enable or disable profiling
+        %abacus_profile reset   - clear recorded stages
+        %abacus_profile dict    - return recorded stages as a dict"""
+
+        arg = line.strip().lower()
+
+        if not arg:
+            self.profiler.dump()
+        elif arg == "on":
+            self.profiler.enabled = True
+        elif arg == "off":
+            self.profiler.enabled = False
+        elif arg == "reset":
+            self.profiler.reset()
+        elif arg == "dict":
+            return self.profiler.as_dict()
+        else:
+            print(f"Unknown argument {arg!r}, see '%abacus_profile?'")
+
+    def _table_magic(self, line: str):
+        """Prints table of expression evaluated for all combinations of values
+
+        %table x**2 + y, x=range(10), y=[1, 2]
+
+        Arguments are same as of `table` and are transformed like any other
+        input"""
+
+        self._run_statement(
+            1, f"abacus.print_table({line})", filename="<table>"
+        )
+
+    def _memo_magic(self, line: str):
+        """Control caching of results of expensive sympy functions
+
+        %abacus_memo            - print statistics
+        %abacus_memo on         - enable caching
+        %abacus_memo persist    - enable caching and keep results on disk
+        %abacus_memo off        - disable caching
+        %abacus_memo clear      - drop cached results"""
+
+        arg = line.strip().lower()
+
+        if not arg:
+            if self.memo is None:
+                print("Memo: disabled")
+            else:
+                for key, value in self.memo.stats().items():
+                    print(f"{key:<10} {value:>12}")
+        elif arg == "on":
+            self.enable_memo()
+        elif arg == "persist":
+            self.enable_memo(persist=True)
+        elif arg == "off":
+            self.disable_memo()
+        elif arg == "clear":
+            if self.memo is not None:
+                self.memo.clear()
+        else:
+            print(f"Unknown argument {arg!r}, see '%abacus_memo?'")
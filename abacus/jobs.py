@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Cells ran in the background on a separate thread, so the shell can be used
+while they run"""
+
+import threading
+import traceback
+
+from time import monotonic
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from . import namespace
+from .namespace import NamespaceDiff
+
+
+class Job:
+    """Code running on a separate thread with its own copy of the namespace,
+    changes it makes are merged back by `JobManager.collect`"""
+
+    def __init__(
+        self,
+        id: int,
+        source: str,
+        fn: Callable[[Dict[str, Any]], Any],
+        ns: Dict[str, Any],
+        temporary: Iterable[str] = (),
+    ):
+        self.id = id
+        self.source = source
+
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.traceback: Optional[str] = None
+
+        # names the job changed, set when it finishes
+        self.changes: Optional[NamespaceDiff] = None
+
+        # names that were not merged as they were changed in the meantime
+        self.conflicts: List[str] = []
+
+        self.started = monotonic()
+        self.finished: Optional[float] = None
+        self.collected = False
+
+        # NOTE: the copy is shallow so objects modified in place are shared
+        self._ns = dict(ns)
+        self._before = namespace.snapshot(ns)
+
+        # names that are about to be removed from the namespace, like symbols
+        # created by the transformer, are not conflicts if they are
+        self._shared = {
+            k: v for k, v in self._before.items() if k not in temporary
+        }
+        self._fn = fn
+        self._thread = threading.Thread(
+            target=self._run, name=f"abacus-job-{id}", daemon=True
+        )
+
+    def _run(self):
+        ns = self._ns
+
+        try:
+            self.result = self._fn(ns)
+        except BaseException as ex:
+            self.error = ex
+            self.traceback = traceback.format_exc()
+        finally:
+            self.changes = namespace.diff(ns, self._before)
+            self.finished = monotonic()
+
+    def start(self) -> "Job":
+        self._thread.start()
+        return self
+
+    def done(self) -> bool:
+        return self.finished is not None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Waits for the job to finish, returns if it did"""
+
+        self._thread.join(timeout)
+        return self.done()
+
+    @property
+    def status(self) -> str:
+        if self.finished is None:
+            return "running"
+
+        return "failed" if self.error is not None else "done"
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds the job has been running for or took"""
+
+        end = monotonic() if self.finished is None else self.finished
+        return end - self.started
+
+    @property
+    def name(self) -> str:
+        """Name under which the result is stored in the namespace"""
+
+        return f"_bg{self.id}"
+
+    def describe(self) -> str:
+        source = " ".join(self.source.split())
+        if len(source) > 40:
+            source = source[:37] + "..."
+
+        return f"[{self.id}] {self.status:<8} {self.elapsed:8.1f}s  {source}"
+
+    def __repr__(self) -> str:
+        return f"<Job {self.id} {self.status} after {self.elapsed:.1f}s>"
+
+
+class JobManager:
+    """Keeps track of background jobs"""
+
+    def __init__(self):
+        self.jobs: Dict[int, Job] = {}
+        self._next_id = 1
+
+    @property
+    def next_id(self) -> int:
+        return self._next_id
+
+    def submit(
+        self,
+        source: str,
+        fn: Callable[[Dict[str, Any]], Any],
+        ns: Dict[str, Any],
+        temporary: Iterable[str] = (),
+    ) -> Job:
+        """Runs `fn` with a copy of namespace `ns` on a separate thread,
+        `temporary` are names which will be removed from `ns` soon"""
+
+        job = Job(self._next_id, source, fn, ns, temporary)
+        self.jobs[job.id] = job
+        self._next_id += 1
+
+        return job.start()
+
+    def running(self) -> List[Job]:
+        return [i for i in self.jobs.values() if not i.done()]
+
+    def collect(self, ns: Dict[str, Any]) -> List[Job]:
+        """Merges changes of finished jobs into the namespace and returns the
+        jobs, each job is collected only once
+
+        Names that were changed in the namespace since the job started are not
+        merged and are put into `Job.conflicts` instead, result of a job is
+        stored as `Job.name` unless it's `None`"""
+
+        collected = []
+
+        for job in self.jobs.values():
+            if job.collected or not job.done():
+                continue
+
+            changes = job.changes
+            job.conflicts = [
+                i
+                for i in (*changes.changed, *changes.deleted)
+                if namespace.rebound(ns, job._shared, i)
+            ]
+            namespace.apply(
+                ns,
+                NamespaceDiff(
+                    {
+                        k: v
+                        for k, v in changes.changed.items()
+                        if k not in job.conflicts
+                    },
+                    [i for i in changes.deleted if i not in job.conflicts],
+                ),
+            )
+
+            if job.error is None and job.result is not None:
+                ns[job.name] = job.result
+
+            # the copy is not needed anymore
+            job._ns = None
+            job._before = None
+            job._shared = None
+            job.collected = True
+            collected.append(job)
+
+        return collected
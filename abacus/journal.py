@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Append-only journal of cells ran in a session so it can be recovered after
+a crash by running them again
+
+Records are written by a background thread in batches with a single `fsync`
+per batch so the prompt never waits for the disk, checkpoints and results of
+slow cells are saved as snapshots (see `abacus.snapshot`) so replay only has
+to run the cells after the last checkpoint that are not cached
+
+The snapshots are pickled before they are handed to the thread, as the
+namespace keeps changing while it writes"""
+
+import atexit
+import hashlib
+import marshal
+import os
+import queue
+import threading
+import time
+import traceback
+
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from . import snapshot
+from .namespace import NamespaceDiff
+from .snapshot import Pickled
+
+FORMAT = 1
+
+# longest time records wait before they are written
+FLUSH_INTERVAL = 0.2
+
+# changes made by cells that ran longer than this are cached
+RESULT_THRESHOLD = 0.1
+
+# a checkpoint is made after this many cells
+CHECKPOINT_INTERVAL = 50
+
+
+class Start(NamedTuple):
+    """Start of a new session, replay only looks at the last one"""
+
+    time: float
+
+
+class Cell(NamedTuple):
+    index: int
+
+    # raw input and the source after string transformations
+    source: str
+    transformed: Optional[str]
+
+    elapsed: float
+    time: float
+
+    # hash of sources of all cells of the session up to this one, changes
+    # cached under it are valid only after running exactly the same cells
+    key: str
+
+
+class Checkpoint(NamedTuple):
+    # number of cells ran before it
+    index: int
+
+    # snapshot file, relative to the journal
+    name: str
+
+    time: float
+
+    # key of the last cell before it
+    key: str
+
+
+Record = Union[Start, Cell, Checkpoint]
+
+_KINDS = {"start": Start, "cell": Cell, "checkpoint": Checkpoint}
+_NAMES = {v: k for k, v in _KINDS.items()}
+
+
+def chain_key(key: str, source: str) -> str:
+    digest = hashlib.sha256(key.encode())
+    digest.update(b"\0")
+    digest.update(source.encode())
+
+    return digest.hexdigest()[:32]
+
+
+def results_dir(path: Path) -> Path:
+    """Directory with cached changes of cells of journal `path`"""
+
+    return path.with_name(path.name + ".results")
+
+
+def _scan(path: Path) -> Iterator[Tuple[Record, int]]:
+    """Yields records of the journal and offset of the end of each"""
+
+    try:
+        file = open(path, "rb")
+    except FileNotFoundError:
+        return
+
+    with file:
+        try:
+            header = marshal.load(file)
+        except (EOFError, ValueError, TypeError):
+            return
+
+        if not isinstance(header, tuple) or header[:2] != ("abacus", FORMAT):
+            raise ValueError(f"{path} is not a journal")
+
+        while True:
+            try:
+                kind, *fields = marshal.load(file)
+                record = _KINDS[kind](*fields)
+            except (EOFError, ValueError, TypeError, KeyError):
+                return
+
+            yield record, file.tell()
+
+
+def read(path: Path) -> Iterator[Record]:
+    """Yields records of the journal, a partially written record at the end
+    (after a crash) is ignored"""
+
+    for record, _ in _scan(path):
+        yield record
+
+
+def last_session(path: Path) -> Tuple[Optional[Checkpoint], List[Cell]]:
+    """Returns the last checkpoint of the last session in the journal that
+    still exists and cells ran after it"""
+
+    checkpoint = None
+    cells: List[Cell] = []
+
+    for record in read(path):
+        if isinstance(record, Start):
+            checkpoint = None
+            cells.clear()
+        elif isinstance(record, Checkpoint):
+            if (path.parent / record.name).exists():
+                checkpoint = record
+                cells.clear()
+        else:
+            cells.append(record)
+
+    return checkpoint, cells
+
+
+class Journal:
+    """Appends records to the journal at `path` from a background thread
+
+    Unless `resume` is true a new session is started, otherwise cells are
+    numbered after the last session in the journal"""
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        resume=False,
+        flush_interval: float = FLUSH_INTERVAL,
+    ):
+        self.path = path
+        self.flush_interval = flush_interval
+
+        # changes made by cells slower than this are cached for the replay
+        self.result_threshold = RESULT_THRESHOLD
+
+        # cells between checkpoints, 0 disables them
+        self.checkpoint_interval = CHECKPOINT_INTERVAL
+
+        self.index = 0
+        self.key = ""
+
+        # index of the last checkpoint
+        self.checkpoint_index = 0
+
+        self._checkpoint_name: Optional[str] = None
+
+        # index of each cell with saved result by its key, a checkpoint makes
+        # only results of the cells before it obsolete
+        self._results: Dict[str, int] = {}
+
+        if resume:
+            checkpoint, cells = last_session(path)
+            if checkpoint is not None:
+                self.index = self.checkpoint_index = checkpoint.index
+                self._checkpoint_name = checkpoint.name
+                self.key = checkpoint.key
+
+            if cells:
+                self.index = cells[-1].index + 1
+                self.key = cells[-1].key
+        else:
+            # files of the previous session cannot be replayed anymore
+            for i in (
+                *path.parent.glob(f"{path.name}.checkpoint.*"),
+                *results_dir(path).glob("*"),
+            ):
+                i.unlink()
+
+        # NOTE: partially written record after a crash would hide everything
+        # appended after it
+        end = 0
+        for _, end in _scan(path):
+            pass
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "ab")
+        if end == 0:
+            self._file.truncate(0)
+            self._file.write(marshal.dumps(("abacus", FORMAT)))
+        elif self._file.tell() > end:
+            self._file.truncate(end)
+
+        self._queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._thread = threading.Thread(
+            target=self._writer, name="abacus-journal", daemon=True
+        )
+        self._thread.start()
+
+        # NOTE: the thread is a daemon so records still in the queue would be
+        # lost on exit
+        atexit.register(self.close)
+
+        if not resume:
+            self._queue.put((Start(time.time()), None))
+
+    def append(
+        self,
+        source: str,
+        transformed: Optional[str],
+        elapsed: float,
+        changes: Optional[NamespaceDiff] = None,
+    ) -> Cell:
+        """Adds the cell to the journal, `changes` it made are cached so the
+        cell does not have to be ran again on replay"""
+
+        self.key = chain_key(self.key, source)
+        cell = Cell(
+            self.index, source, transformed, elapsed, time.time(), self.key
+        )
+        self.index += 1
+
+        self._queue.put((cell, None if changes is None else _pickle(changes)))
+
+        return cell
+
+    def needs_checkpoint(self) -> bool:
+        return (
+            self.checkpoint_interval > 0
+            and self.index - self.checkpoint_index >= self.checkpoint_interval
+        )
+
+    def checkpoint(self, changes: NamespaceDiff):
+        """Saves changes of the namespace since startup, replay starts from
+        the last checkpoint"""
+
+        self.checkpoint_index = self.index
+        name = f"{self.path.name}.checkpoint.{self.index}"
+        self._queue.put(
+            (
+                Checkpoint(self.index, name, time.time(), self.key),
+                _pickle(changes),
+            )
+        )
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until everything appended so far is on disk"""
+
+        done = threading.Event()
+        self._queue.put(done)
+
+        return done.wait(timeout)
+
+    def close(self):
+        """Writes the remaining records and stops the thread"""
+
+        atexit.unregister(self.close)
+
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+        self._file.close()
+
+    def _writer(self):
+        closing = False
+        while not closing:
+            batch = [self._queue.get()]
+
+            # NOTE: records that arrive close together are written with a
+            # single fsync
+            deadline = time.monotonic() + self.flush_interval
+            while not isinstance(batch[-1], threading.Event):
+                if batch[-1] is None:
+                    closing = True
+                    break
+
+                try:
+                    batch.append(
+                        self._queue.get(
+                            timeout=max(0, deadline - time.monotonic())
+                        )
+                    )
+                except queue.Empty:
+                    break
+
+            try:
+                self._write(batch)
+            except Exception:
+                traceback.print_exc()
+
+            for i in batch:
+                if isinstance(i, threading.Event):
+                    i.set()
+
+    def _write(self, batch: List[Any]):
+        obsolete: List[Path] = []
+
+        # NOTE: besides (record, changes) pairs there are `None` to stop and
+        # events to set once everything before them is written
+        for item in batch:
+            if not isinstance(item, tuple):
+                continue
+
+            record, pickled = item
+            if isinstance(record, Cell) and pickled is not None:
+                self._save_result(record, pickled)
+            elif isinstance(record, Checkpoint):
+                if not self._save_checkpoint(record, pickled):
+                    continue
+
+                # older checkpoint and cached results are not needed anymore
+                if self._checkpoint_name is not None:
+                    obsolete.append(self.path.parent / self._checkpoint_name)
+                    obsolete.append(snapshot.buffers_path(obsolete[-1]))
+
+                for i in results_dir(self.path).glob("*"):
+                    key = i.name.split(".")[0]
+                    if self._results.get(key, -1) < record.index:
+                        obsolete.append(i)
+
+                self._results = {
+                    k: v for k, v in self._results.items() if v >= record.index
+                }
+                self._checkpoint_name = record.name
+
+            self._file.write(marshal.dumps((_NAMES[type(record)], *record)))
+
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+        for i in obsolete:
+            try:
+                i.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _save_result(self, cell: Cell, pickled: Optional[Pickled]):
+        path = results_dir(self.path) / f"{cell.key}.pickle"
+
+        # NOTE: the cell is ran again on replay if any value could not be saved
+        # as loading only part of the changes would leave the namespace wrong
+        if _save_complete(path, pickled):
+            self._results[cell.key] = cell.index
+
+    def _save_checkpoint(self, record: Checkpoint, pickled: Optional[Pickled]):
+        return _save_complete(self.path.parent / record.name, pickled)
+
+
+def _pickle(changes: NamespaceDiff) -> Optional[Pickled]:
+    try:
+        return snapshot.dumps(changes)
+    except Exception:
+        traceback.print_exc()
+        return None
+
+
+def _save_complete(path: Path, pickled: Optional[Pickled]) -> bool:
+    """Saves the snapshot only if all values could be pickled"""
+
+    # NOTE: the record is still written if saving fails
+    if pickled is not None and not pickled.info.skipped:
+        try:
+            snapshot.write(path, pickled)
+        except Exception:
+            traceback.print_exc()
+        else:
+            return True
+
+    for i in (path, snapshot.buffers_path(path)):
+        try:
+            i.unlink()
+        except FileNotFoundError:
+            pass
+
+    return False
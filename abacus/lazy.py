@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Deferred imports so startup does not have to pay for them"""
+
+import importlib
+import threading
+
+from types import ModuleType
+from typing import Any, Callable, List
+
+# NOTE: reentrant as loading may run callbacks that load other modules
+_load_lock = threading.RLock()
+
+
+class LazyModule(ModuleType):
+    """Module proxy that imports the real module on first attribute access
+
+    After loading all attributes are copied over so further access is as fast
+    as with the real module"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+
+        self.__dict__["_lazy_callbacks"] = []
+        self.__dict__["_lazy_module"] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._lazy_module is not None
+
+    def on_load(self, callback: Callable[[ModuleType], Any]):
+        """Calls `callback` with the real module once it's imported, or right
+        away if it's already imported"""
+
+        if self.loaded:
+            callback(self._lazy_module)
+        else:
+            self._lazy_callbacks.append(callback)
+
+    def load(self) -> ModuleType:
+        """Imports the real module and returns it"""
+
+        if self._lazy_module is not None:
+            return self._lazy_module
+
+        # NOTE: callbacks must run once even if used from multiple threads
+        with _load_lock:
+            if self._lazy_module is not None:
+                return self._lazy_module
+
+            module = importlib.import_module(self.__name__)
+
+            self.__dict__.update(module.__dict__)
+            self.__dict__["_lazy_module"] = module
+
+            callbacks: List[Callable] = self._lazy_callbacks
+            self.__dict__["_lazy_callbacks"] = []
+
+            for i in callbacks:
+                i(module)
+
+        return module
+
+    def __getattr__(self, name: str) -> Any:
+        # NOTE: called only for attributes that are not in __dict__
+        return getattr(self.load(), name)
+
+    def __dir__(self):
+        return dir(self.load())
+
+    def __repr__(self) -> str:
+        if self.loaded:
+            return repr(self._lazy_module)
+
+        return f"<lazy module {self.__name__!r}>"
+
+
+class LazyObject:
+    """Proxy of an object from a module that is imported on first use"""
+
+    def __init__(self, module: LazyModule, name: str):
+        self._lazy_module = module
+        self._lazy_name = name
+
+    def load(self) -> Any:
+        return getattr(self._lazy_module.load(), self._lazy_name)
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        # NOTE: prevents recursion if accessed before `__init__`, like when
+        # copying
+        if name.startswith("_lazy_"):
+            raise AttributeError(name)
+
+        return getattr(self.load(), name)
+
+    def __repr__(self) -> str:
+        if self._lazy_module.loaded:
+            return repr(self.load())
+
+        return f"<lazy {self._lazy_module.__name__}.{self._lazy_name}>"
+
+
+def is_proxy_of(value: Any, module: str) -> bool:
+    """Checks if `value` is a lazy proxy of `module` or something in it"""
+
+    if isinstance(value, LazyObject):
+        value = value._lazy_module
+
+    return isinstance(value, LazyModule) and value.__name__ == module
+
+
+def unproxy(value: Any) -> Any:
+    """Returns the real object behind a lazy proxy, importing it if needed"""
+
+    if isinstance(value, (LazyModule, LazyObject)):
+        return value.load()
+
+    return value
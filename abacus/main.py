@@ -17,17 +17,34 @@
 
 # NOTE: this is moved here so entry point could be made
 
+import importlib.util
+import sys
+
 
 def main():
-    from abacus.basic_shell import main_basic
+    # subcommands, anything else is passed to the shell
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from abacus.batch import main_batch
 
-    try:
-        from abacus.ipython_shell import main_ipython
-    except ImportError:
-        pass
+        sys.exit(main_batch(sys.argv[2:]))
+
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        from abacus.server import main_serve
+
+        sys.exit(main_serve(sys.argv[2:]))
+
+    from abacus.cli import main_cli, wants_cli
+
+    if wants_cli(sys.argv[1:]):
+        sys.exit(main_cli(sys.argv[1:]))
 
     # by default prefer IPython version
-    try:
+    # NOTE: only checks if it's installed, importing it takes a while
+    if importlib.util.find_spec("IPython") is not None:
+        from abacus.ipython_shell import main_ipython
+
         main_ipython()
-    except NameError:
+    else:
+        from abacus.basic_shell import main_basic
+
         main_basic()
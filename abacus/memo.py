@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Opt-in cache of results of expensive sympy functions"""
+
+import hashlib
+import os
+import pickle
+import threading
+
+from collections import OrderedDict
+from fractions import Fraction
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# functions that get wrapped by default, all take a while on bigger inputs
+MEMO_FUNCTIONS = ("solve", "simplify", "integrate", "factor")
+
+# returned by `Memo.get` on miss as `None` may be a valid result
+MISS = object()
+
+_PLAIN_TYPES = (type(None), bool, int, float, complex, str, Fraction)
+
+
+def _structural(value: Any) -> bool:
+    """Checks if value is fully described by its `srepr`, meaning it can be
+    used as a part of the key"""
+
+    from sympy import Basic
+    from sympy.matrices import ImmutableMatrix
+
+    if isinstance(value, (Basic, ImmutableMatrix, *_PLAIN_TYPES)):
+        return True
+    elif isinstance(value, (tuple, list, set, frozenset)):
+        return all(_structural(i) for i in value)
+    elif isinstance(value, dict):
+        return all(_structural(k) and _structural(v) for k, v in value.items())
+
+    return False
+
+
+def _copy(value: Any) -> Any:
+    """Copies the mutable parts of a result so changing what was returned
+    does not change the cached result, sympy objects are immutable"""
+
+    from sympy import Basic
+    from sympy.matrices import MatrixBase
+
+    if isinstance(value, list):
+        return [_copy(i) for i in value]
+    elif type(value) is tuple:
+        return tuple(_copy(i) for i in value)
+    elif isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    elif isinstance(value, set):
+        return set(value)
+    elif isinstance(value, MatrixBase) and not isinstance(value, Basic):
+        return value.copy()
+
+    return value
+
+
+class Memo:
+    """LRU cache of function results keyed on structure of the arguments
+
+    Size of the cache is measured in bytes of the pickled results, results
+    that cannot be pickled and calls with arguments that are not structural
+    (see `_structural`) are not cached"""
+
+    def __init__(self, maxsize: int = 64 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+        # key -> (name, result, size)
+        self._entries: "OrderedDict[str, Tuple[str, Any, int]]" = OrderedDict()
+
+        # NOTE: functions may be called from multiple threads
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(name: str, args: Tuple, kwargs: Dict[str, Any]) -> Optional[str]:
+        """Returns key of the call, `None` if it cannot be cached"""
+
+        from sympy import __version__, srepr
+
+        if not _structural(args) or not _structural(kwargs):
+            return None
+
+        # NOTE: sympy version is included as results may differ between them
+        data = srepr((__version__, name, args, sorted(kwargs.items())))
+
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISS
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        return _copy(entry[1])
+
+    def put(self, key: str, name: str, result: Any):
+        try:
+            size = len(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            return
+
+        if size > self.maxsize:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[2]
+
+            self._entries[key] = (name, result, size)
+            self.size += size
+
+            while self.size > self.maxsize:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+    def invalidate(self, name: str):
+        """Removes all results of function `name`"""
+
+        with self._lock:
+            for key in [k for k, v in self._entries.items() if v[0] == name]:
+                self.size -= self._entries.pop(key)[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def wrap(self, fn: Callable, name: Optional[str] = None) -> Callable:
+        """Returns memoized version of `fn`, the original is in `__wrapped__`"""
+
+        name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = self.key(name, args, kwargs)
+            if key is None:
+                return fn(*args, **kwargs)
+
+            result = self.get(key)
+            if result is MISS:
+                result = fn(*args, **kwargs)
+                self.put(key, name, result)
+                result = _copy(result)
+
+            return result
+
+        wrapper.memo = self  # type: ignore[attr-defined]
+
+        return wrapper
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "size": self.size,
+            "maxsize": self.maxsize,
+        }
+
+    def save(self, path: Path):
+        """Saves the entries to file `path`, replacing it atomically"""
+
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "wb") as file:
+                with self._lock:
+                    entries = list(self._entries.items())
+
+                pickle.dump(
+                    entries,
+                    file,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+
+            os.replace(tmp, path)
+        except (OSError, pickle.PicklingError):
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+
+    def load(self, path: Path):
+        """Loads entries saved by `save`, missing or broken file is ignored"""
+
+        try:
+            with open(path, "rb") as file:
+                entries = pickle.load(file)
+        except Exception:
+            return
+
+        for key, (name, result, _) in entries:
+            self.put(key, name, result)
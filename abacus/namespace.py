@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Tracking changes of a namespace, so they can be moved between processes
+or threads"""
+
+import importlib
+import pickle
+
+from types import ModuleType
+from typing import Any, Callable, Dict, List, NamedTuple
+
+# names that are never transferred
+IGNORED_NAMES = {"__builtins__"}
+
+# names bound for the code abacus generates, like pooled integers, they are
+# bound again when needed and are not transferred either
+HIDDEN_PREFIX = "_abacus_"
+
+
+class ModuleRef(NamedTuple):
+    """Modules are transferred by name and imported again"""
+
+    name: str
+
+
+class NamespaceDiff(NamedTuple):
+    # new or rebound names
+    changed: Dict[str, Any]
+
+    deleted: List[str]
+
+    # changed names whose values could not be transferred
+    skipped: List[str] = []
+
+
+# marks a name that was not in the snapshot
+_MISSING = object()
+
+
+def ignored(name: str) -> bool:
+    """Checks if the name is never transferred"""
+
+    return name in IGNORED_NAMES or name.startswith(HIDDEN_PREFIX)
+
+
+def snapshot(ns: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns copy of the namespace to compare with later
+
+    NOTE: only rebinding is detected, objects modified in place are not, the
+    values are kept alive as ids of freed objects can be reused"""
+
+    return dict(ns)
+
+
+def rebound(ns: Dict[str, Any], before: Dict[str, Any], name: str) -> bool:
+    """Returns if the name was bound, rebound or deleted since `snapshot`"""
+
+    return ns.get(name, _MISSING) is not before.get(name, _MISSING)
+
+
+def diff(ns: Dict[str, Any], before: Dict[str, Any]) -> NamespaceDiff:
+    """Returns changes of the namespace since `snapshot` was taken"""
+
+    changed = {
+        k: v
+        for k, v in ns.items()
+        if before.get(k, _MISSING) is not v and not ignored(k)
+    }
+    deleted = [k for k in before if k not in ns and not ignored(k)]
+
+    return NamespaceDiff(changed, deleted)
+
+
+def select(
+    changes: NamespaceDiff, keep: Callable[[str], bool]
+) -> NamespaceDiff:
+    """Returns diff with only the names for which `keep` is true"""
+
+    return NamespaceDiff(
+        {k: v for k, v in changes.changed.items() if keep(k)},
+        [k for k in changes.deleted if keep(k)],
+        [k for k in changes.skipped if keep(k)],
+    )
+
+
+def transferable(changes: NamespaceDiff) -> NamespaceDiff:
+    """Returns diff with only the values that can be pickled, modules are
+    replaced with `ModuleRef` and the rest are moved to `skipped`"""
+
+    changed = {}
+    skipped = list(changes.skipped)
+
+    for k, v in changes.changed.items():
+        if isinstance(v, ModuleType):
+            changed[k] = ModuleRef(v.__name__)
+            continue
+
+        try:
+            pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            skipped.append(k)
+        else:
+            changed[k] = v
+
+    return NamespaceDiff(changed, list(changes.deleted), skipped)
+
+
+def apply(ns: Dict[str, Any], changes: NamespaceDiff):
+    """Applies the changes to the namespace"""
+
+    for k, v in changes.changed.items():
+        if isinstance(v, ModuleRef):
+            v = importlib.import_module(v.name)
+
+        ns[k] = v
+
+    for k in changes.deleted:
+        ns.pop(k, None)
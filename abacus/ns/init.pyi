@@ -18,9 +18,17 @@
 # this file sets all the defaults for abacus
 # type: ignore
 
-sympy.init_printing(use_unicode=False)
+abacus.init_printing(use_unicode=False)
 
-from sympy import solve
+solve = abacus.lazy_import("sympy", "solve")
+
+from abacus.numeric import numeric
+from abacus.race import race_simplify, race_solve
+from abacus.table import table
+from abacus.timeout import call_with_timeout, time_limited
 
 # easter eggs :)
-this = cool
+# NOTE: creating the symbol would import sympy so it's done once it's imported
+abacus.when_imported(
+    "sympy", lambda sympy: abacus.push({"this": sympy.Symbol("cool")})
+)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Fast numeric evaluation of symbolic expressions"""
+
+import builtins
+import importlib.util
+
+from collections.abc import Hashable
+from functools import lru_cache, wraps
+from itertools import repeat
+from typing import Any, Callable, Tuple
+
+# NOTE: numpy is not imported until it's needed as it takes a while
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+# functions missing from math are taken from mpmath, which works with its own
+# number types so it's used only if needed
+FALLBACK_MODULES = ["math", "mpmath"]
+
+
+def _is_sequence(value: Any) -> bool:
+    return hasattr(value, "__len__") and hasattr(value, "__iter__")
+
+
+def elementwise(fn: Callable) -> Callable:
+    """Makes scalar function work on sequences, arguments that are not
+    sequences are used for each element, returns a list in that case"""
+
+    @wraps(fn)
+    def wrapper(*args):
+        if not any(_is_sequence(i) for i in args):
+            return fn(*args)
+
+        lengths = {len(i) for i in args if _is_sequence(i)}
+        if len(lengths) > 1:
+            raise ValueError(f"sequences of different lengths {lengths}")
+
+        columns = [i if _is_sequence(i) else repeat(i) for i in args]
+
+        return [fn(*row) for row in zip(*columns)]
+
+    return wrapper
+
+
+def plain(value: Any) -> Any:
+    """Converts sympy numbers, also inside lists and tuples, to python ones
+    so numeric functions can use them, abacus turns all int literals into
+    sympy integers"""
+
+    from sympy import Basic
+
+    if isinstance(value, (list, tuple)):
+        return [plain(i) for i in value]
+    elif isinstance(value, Basic) and value.is_number:
+        if value.is_Integer:
+            return int(value)
+        elif value.is_real:
+            return float(value)
+
+        return complex(value)
+
+    return value
+
+
+def _plain_arguments(fn: Callable) -> Callable:
+    @wraps(fn)
+    def wrapper(*args):
+        return fn(*(plain(i) for i in args))
+
+    return wrapper
+
+
+@lru_cache(maxsize=256)
+def _compile(expr, args: Tuple, vectorized: bool) -> Callable:
+    from sympy import lambdify
+
+    # NOTE: numpy turns sympy numbers into object arrays which ufuncs reject
+    if vectorized:
+        return _plain_arguments(lambdify(args, expr, modules="numpy"))
+
+    fn = lambdify(args, expr, modules=FALLBACK_MODULES[:1])
+    if not _resolved(fn):
+        fn = lambdify(args, expr, modules=FALLBACK_MODULES)
+
+    return _plain_arguments(elementwise(fn))
+
+
+def _resolved(fn: Callable) -> bool:
+    """Checks if all global names used by the function exist"""
+
+    return all(
+        i in fn.__globals__ or hasattr(builtins, i)
+        for i in fn.__code__.co_names
+    )
+
+
+def numeric(expr, *args, vectorized: bool = HAS_NUMPY) -> Callable:
+    """Compiles expression into a fast numeric function of `args`, if no
+    arguments are given then free symbols sorted by name are used
+
+    The function uses numpy if it's installed so it works on whole arrays at
+    once, otherwise it's ran for each element using math and mpmath
+
+    The compiled functions are cached so it's cheap to call it again
+
+    >>> f = numeric(x**2 + y, x, y)
+    >>> f([1, 2, 3], 1)
+    [2, 5, 10]"""
+
+    from sympy import Symbol, sympify
+
+    expr = sympify(expr)
+
+    if args:
+        args = tuple(Symbol(i) if isinstance(i, str) else i for i in args)
+    else:
+        args = tuple(sorted(expr.free_symbols, key=lambda x: x.name))
+
+    # NOTE: mutable matrices cannot be cached
+    if not isinstance(expr, Hashable):
+        return _compile.__wrapped__(expr, args, vectorized)
+
+    return _compile(expr, args, vectorized)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Helpers for running things in parallel"""
+
+import os
+
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Deque, Iterable, Iterator, Optional, Tuple
+
+
+def cpu_count() -> int:
+    """Returns number of CPUs usable by this process"""
+
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+
+    return os.cpu_count() or 1
+
+
+def submit_ordered(
+    executor: Executor,
+    fn: Callable,
+    items: Iterable[Tuple[Any, ...]],
+    *,
+    window: Optional[int] = None,
+) -> Iterator[Tuple[Tuple[Any, ...], Future]]:
+    """Submits `fn(*item)` for each item and yields pairs of the item and its
+    future in order of the items
+
+    Unlike `Executor.map` the items are consumed lazily, at most `window`
+    items are submitted at once so memory stays bounded for any number of
+    items"""
+
+    if window is None:
+        window = 4 * cpu_count()
+
+    pending: Deque[Tuple[Tuple[Any, ...], Future]] = deque()
+
+    for item in items:
+        pending.append((item, executor.submit(fn, *item)))
+
+        if len(pending) >= window:
+            yield pending.popleft()
+
+    while pending:
+        yield pending.popleft()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Locations of user files, following XDG base directories"""
+
+import os
+
+from pathlib import Path
+from typing import List, Optional
+
+
+def _user_dir(env: str, xdg_env: str, default: str) -> Optional[Path]:
+    # NOTE: setting the variable to empty string disables it
+    value = os.environ.get(env)
+    if value is not None:
+        return Path(value) if value else None
+
+    base = os.environ.get(xdg_env) or os.path.join(
+        os.path.expanduser("~"), default
+    )
+
+    return Path(base) / "abacus"
+
+
+def config_dir() -> Optional[Path]:
+    """Directory with user init scripts, `$ABACUS_CONFIG_DIR` or
+    `$XDG_CONFIG_HOME/abacus`"""
+
+    return _user_dir("ABACUS_CONFIG_DIR", "XDG_CONFIG_HOME", ".config")
+
+
+def cache_dir() -> Optional[Path]:
+    """Directory for cached files, `$ABACUS_CACHE_DIR` or
+    `$XDG_CACHE_HOME/abacus`"""
+
+    return _user_dir("ABACUS_CACHE_DIR", "XDG_CACHE_HOME", ".cache")
+
+
+def data_dir() -> Optional[Path]:
+    """Directory for data kept between sessions, `$ABACUS_DATA_DIR` or
+    `$XDG_DATA_HOME/abacus`"""
+
+    return _user_dir("ABACUS_DATA_DIR", "XDG_DATA_HOME", ".local/share")
+
+
+def init_files() -> List[Path]:
+    """User init scripts in order they should be ran, `init.py` and then
+    `startup/*.py` sorted by name"""
+
+    directory = config_dir()
+    if directory is None:
+        return []
+
+    files = [directory / "init.py"]
+    files.extend(sorted((directory / "startup").glob("*.py")))
+
+    return [i for i in files if i.is_file()]
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import sys
+
+from contextlib import nullcontext
+from functools import wraps
+from time import perf_counter
+from typing import Any, Callable, ContextManager, Dict, List, Optional, TextIO
+
+_NULL_CONTEXT = nullcontext()
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler: "Profiler", name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.profiler.add(self.name, perf_counter() - self.start)
+
+
+class Profiler:
+    """Registry of per stage timers and counters
+
+    It is opt-in so nothing is recorded unless `enabled` is set, stages can be
+    nested in which case the outer stage includes time of the inner one"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+
+        # name -> [count, total, min, max]
+        self._timers: Dict[str, List[float]] = {}
+        self._counters: Dict[str, int] = {}
+
+    def stage(self, name: str) -> ContextManager:
+        """Context manager that times the block as stage `name`"""
+
+        if not self.enabled:
+            return _NULL_CONTEXT
+
+        return _Stage(self, name)
+
+    def wrap(self, name: str, fn: Callable) -> Callable:
+        """Wraps `fn` so each call is timed as stage `name`"""
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return fn(*args, **kwargs)
+
+            with _Stage(self, name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    def add(self, name: str, elapsed: float):
+        """Records single run of stage `name` that took `elapsed` seconds"""
+
+        timer = self._timers.get(name)
+        if timer is None:
+            self._timers[name] = [1, elapsed, elapsed, elapsed]
+        else:
+            timer[0] += 1
+            timer[1] += elapsed
+            timer[2] = min(timer[2], elapsed)
+            timer[3] = max(timer[3], elapsed)
+
+    def count(self, name: str, amount: int = 1):
+        """Increments counter `name`"""
+
+        if self.enabled:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def reset(self):
+        """Clears all recorded data"""
+
+        self._timers.clear()
+        self._counters.clear()
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Returns recorded data as a dict, times are in seconds
+
+        {
+            "timers": { name: { count, total, mean, min, max } },
+            "counters": { name: value }
+        }"""
+
+        return {
+            "timers": {
+                name: {
+                    "count": count,
+                    "total": total,
+                    "mean": total / count,
+                    "min": min_,
+                    "max": max_,
+                }
+                for name, (count, total, min_, max_) in self._timers.items()
+            },
+            "counters": dict(self._counters),
+        }
+
+    def dump(self, file: Optional[TextIO] = None):
+        """Prints recorded data as a table, times are in milliseconds"""
+
+        if file is None:
+            file = sys.stdout
+
+        if not self._timers and not self._counters:
+            print("Profiler: nothing recorded", file=file)
+            return
+
+        if self._timers:
+            print(
+                f"{'stage':<20} {'count':>8} {'total':>10} {'mean':>10}"
+                f" {'min':>10} {'max':>10}",
+                file=file,
+            )
+
+            for name, data in self.as_dict()["timers"].items():
+                print(
+                    f"{name:<20} {data['count']:>8}"
+                    f" {data['total'] * 1e3:>10.3f}"
+                    f" {data['mean'] * 1e3:>10.3f}"
+                    f" {data['min'] * 1e3:>10.3f}"
+                    f" {data['max'] * 1e3:>10.3f}",
+                    file=file,
+                )
+
+        if self._counters:
+            if self._timers:
+                print(file=file)
+
+            print(f"{'counter':<20} {'value':>8}", file=file)
+            for name, value in self._counters.items():
+                print(f"{name:<20} {value:>8}", file=file)
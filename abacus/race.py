@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Racing different strategies of the same computation against each other,
+as which one is fast depends a lot on the expression"""
+
+import os
+import select
+
+from time import monotonic
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Union,
+)
+
+from .timeout import (
+    EvaluationTimeout,
+    alarm,
+    can_fork,
+    fork_call,
+    forked_result,
+)
+
+if TYPE_CHECKING:
+    import sympy
+
+# strategies used by `race_simplify`, names of sympy functions
+SIMPLIFY_STRATEGIES = (
+    "simplify",
+    "trigsimp",
+    "radsimp",
+    "ratsimp",
+    "nsimplify",
+)
+
+# strategies used by `race_solve`, see `_solve_strategy`
+SOLVE_STRATEGIES = ("solve", "solveset", "nsolve")
+
+Strategy = Union[str, Callable]
+
+
+class RaceResult(NamedTuple):
+    value: Any
+
+    # name of the strategy that returned the value
+    strategy: str
+
+    # seconds it took to get it
+    elapsed: float
+
+
+def race(
+    strategies: Mapping[str, Callable[[], Any]],
+    *,
+    deadline: Optional[float] = None,
+    accept: Optional[Callable[[Any], bool]] = None,
+    score: Optional[Callable[[Any], Any]] = None,
+) -> RaceResult:
+    """Runs all strategies at the same time each in its own process
+
+    The first result `accept` returns true for is returned right away,
+    otherwise once all strategies finish or `deadline` seconds pass the
+    result with lowest `score` is returned, the rest of the processes are
+    killed either way
+
+    Raises `EvaluationTimeout` if no strategy finished in time or the
+    exception of the last one if all of them failed"""
+
+    if not strategies:
+        raise ValueError("no strategies to race")
+
+    start = monotonic()
+    stop = None if deadline is None else start + deadline
+
+    results: List[RaceResult] = []
+    error: Optional[BaseException] = None
+
+    def finish(name: str, fn: Callable[[], Any]) -> Optional[RaceResult]:
+        """Adds result of the strategy, returns it if it's acceptable"""
+
+        nonlocal error
+
+        try:
+            value = fn()
+        except Exception as ex:
+            error = ex
+            return None
+
+        result = RaceResult(value, name, monotonic() - start)
+        results.append(result)
+
+        if accept is not None and accept(value):
+            return result
+
+        return None
+
+    if can_fork():
+        winner = _race_forked(strategies, stop, finish)
+    else:
+        winner = _race_sequential(strategies, stop, finish)
+
+    if winner is not None:
+        return winner
+
+    if results:
+        if score is None:
+            return results[0]
+
+        return min(results, key=lambda i: score(i.value))
+
+    if error is not None:
+        raise error
+
+    raise EvaluationTimeout(deadline)  # type: ignore[arg-type]
+
+
+def _race_forked(
+    strategies: Mapping[str, Callable[[], Any]],
+    stop: Optional[float],
+    finish: Callable[[str, Callable[[], Any]], Optional[RaceResult]],
+) -> Optional[RaceResult]:
+    calls = {}
+    chunks: Dict[int, List[bytes]] = {}
+
+    try:
+        for name, fn in strategies.items():
+            call = fork_call(fn)
+            calls[call.fd] = (name, call)
+            chunks[call.fd] = []
+
+        while calls:
+            remaining = None
+            if stop is not None:
+                remaining = stop - monotonic()
+                if remaining <= 0:
+                    return None
+
+            ready, _, _ = select.select(list(calls), [], [], remaining)
+
+            for fd in ready:
+                chunk = os.read(fd, 1 << 16)
+                if chunk:
+                    chunks[fd].append(chunk)
+                    continue
+
+                name, call = calls.pop(fd)
+                os.close(fd)
+                os.waitpid(call.pid, 0)
+
+                data = b"".join(chunks.pop(fd))
+                winner = finish(name, lambda: forked_result(data))
+                if winner is not None:
+                    return winner
+
+        return None
+    finally:
+        # NOTE: also when interrupted, so nothing keeps running
+        for name, call in calls.values():
+            call.kill()
+            os.close(call.fd)
+            os.waitpid(call.pid, 0)
+
+
+def _race_sequential(
+    strategies: Mapping[str, Callable[[], Any]],
+    stop: Optional[float],
+    finish: Callable[[str, Callable[[], Any]], Optional[RaceResult]],
+) -> Optional[RaceResult]:
+    """Used where processes cannot be forked, strategies are tried one by one
+    within the time that is left"""
+
+    for name, fn in strategies.items():
+        remaining = None
+        if stop is not None:
+            remaining = stop - monotonic()
+            if remaining <= 0:
+                return None
+
+        def limited():
+            with alarm(remaining):
+                return fn()
+
+        winner = finish(name, limited)
+        if winner is not None:
+            return winner
+
+    return None
+
+
+def _resolve(strategy: Strategy) -> Callable:
+    if callable(strategy):
+        return strategy
+
+    import sympy
+
+    return getattr(sympy, strategy)
+
+
+def _name(strategy: Strategy) -> str:
+    if callable(strategy):
+        return getattr(strategy, "__name__", repr(strategy))
+
+    return strategy
+
+
+def race_simplify(
+    expr,
+    *,
+    deadline: Optional[float] = 5.0,
+    strategies: Iterable[Strategy] = SIMPLIFY_STRATEGIES,
+    accept: Optional[Callable[[Any], bool]] = None,
+) -> "sympy.Expr":
+    """Simplifies the expression using several strategies at once and returns
+    the simplest result, measured by `count_ops`, available within `deadline`
+    seconds
+
+    If none of them finish in time the expression is returned unchanged
+
+    >>> race_simplify(sin(x)**2 + cos(x)**2)
+    1"""
+
+    import sympy
+
+    expr = sympy.sympify(expr)
+
+    # NOTE: nsimplify replaces floats with rationals, it does nothing useful
+    # otherwise
+    strategies = [
+        i for i in strategies if i != "nsimplify" or expr.has(sympy.Float)
+    ]
+
+    try:
+        return race(
+            {_name(i): _bind(_resolve(i), expr) for i in strategies},
+            deadline=deadline,
+            accept=accept,
+            score=sympy.count_ops,
+        ).value
+    except EvaluationTimeout:
+        return expr
+
+
+def race_solve(
+    eq,
+    *symbols,
+    deadline: Optional[float] = 5.0,
+    strategies: Iterable[Strategy] = SOLVE_STRATEGIES,
+) -> List:
+    """Solves the equation using several strategies at once, returns list of
+    solutions like `solve`
+
+    The first exact non empty result is returned right away, numerical
+    results from `nsolve` are used only if no exact one is found within
+    `deadline` seconds
+
+    >>> race_solve(x**2 - 4, x)
+    [-2, 2]"""
+
+    import sympy
+
+    eq = sympy.sympify(eq)
+
+    if not symbols:
+        symbols = tuple(sorted(eq.free_symbols, key=str))
+
+    # NOTE: only `solve` works with systems or multiple symbols
+    if len(symbols) != 1:
+        strategies = [i for i in strategies if i not in ("solveset", "nsolve")]
+
+    return race(
+        {_name(i): _solve_strategy(i, eq, symbols) for i in strategies},
+        deadline=deadline,
+        accept=lambda value: bool(value) and _exact(value),
+        score=lambda value: (not _exact(value), sympy.count_ops(value)),
+    ).value
+
+
+def _bind(fn: Callable, *args) -> Callable[[], Any]:
+    return lambda: fn(*args)
+
+
+def _exact(solutions: List) -> bool:
+    import sympy
+
+    return not any(sympy.sympify(i).has(sympy.Float) for i in solutions)
+
+
+def _solve_strategy(
+    strategy: Strategy, eq: "sympy.Expr", symbols: tuple
+) -> Callable[[], List]:
+    """Returns function that solves the equation with the strategy and returns
+    list of solutions"""
+
+    import sympy
+
+    if callable(strategy):
+        return _bind(strategy, eq, *symbols)
+
+    if strategy == "solve":
+        return _bind(sympy.solve, eq, *symbols)
+
+    if len(symbols) != 1:
+        raise ValueError(f"{strategy!r} works only with a single symbol")
+
+    (symbol,) = symbols
+
+    if strategy == "solveset":
+
+        def solveset() -> List:
+            result = sympy.solveset(eq, symbol)
+            if not isinstance(result, sympy.FiniteSet):
+                raise ValueError(f"infinite or unknown solutions: {result}")
+
+            return list(result)
+
+        return solveset
+
+    if strategy == "nsolve":
+
+        def nsolve() -> List:
+            expr = eq.lhs - eq.rhs if isinstance(eq, sympy.Eq) else eq
+
+            # NOTE: all roots can be found only for polynomials
+            if expr.is_polynomial(symbol):
+                return sympy.Poly(expr, symbol).nroots()
+
+            return [sympy.nsolve(expr, symbol, 0)]
+
+        return nsolve
+
+    raise ValueError(f"unknown strategy {strategy!r}")
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Dependency graph of cells built from names they load and store, so when a
+name changes only the cells that depend on it have to be ran again"""
+
+import ast
+import itertools
+
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Set, Tuple
+
+# names loaded and stored by a cell
+CellNames = Tuple[FrozenSet[str], FrozenSet[str]]
+
+
+class _Scope:
+    def __init__(self, module: bool):
+        self.module = module
+        self.loads: Set[str] = set()
+        self.stores: Set[str] = set()
+
+
+class _NameVisitor(ast.NodeVisitor):
+    """Collects global names the code loads and stores, names local to
+    functions, lambdas and comprehensions are left out
+
+    NOTE: names assigned inside functions are always treated as local, as the
+    function has to be called to assign a `global`"""
+
+    def __init__(self):
+        self.scopes = [_Scope(module=True)]
+
+    @property
+    def scope(self) -> _Scope:
+        return self.scopes[-1]
+
+    def load(self, name: str):
+        scope = self.scope
+
+        # NOTE: names the cell assigned before are not dependencies
+        if not (scope.module and name in scope.stores):
+            scope.loads.add(name)
+
+    def store(self, name: str):
+        self.scope.stores.add(name)
+
+    def names(self) -> CellNames:
+        module = self.scopes[0]
+
+        return frozenset(module.loads), frozenset(module.stores)
+
+    def _nested(self, nodes: Iterable[ast.AST], arguments=None):
+        scope = _Scope(module=False)
+        self.scopes.append(scope)
+        try:
+            if arguments is not None:
+                for i in (
+                    *getattr(arguments, "posonlyargs", ()),
+                    *arguments.args,
+                    arguments.vararg,
+                    *arguments.kwonlyargs,
+                    arguments.kwarg,
+                ):
+                    if i is not None:
+                        scope.stores.add(i.arg)
+
+            for i in nodes:
+                self.visit(i)
+        finally:
+            self.scopes.pop()
+
+        # NOTE: names the nested scope loads but does not assign are globals,
+        # it's approximate as assignments after a load are also local
+        for i in scope.loads - scope.stores:
+            self.load(i)
+
+    def visit_Name(self, node: ast.Name):
+        if isinstance(node.ctx, ast.Load):
+            self.load(node.id)
+        else:
+            self.store(node.id)
+
+    def _base_name(self, node: ast.AST):
+        while isinstance(node, (ast.Attribute, ast.Subscript)):
+            node = node.value
+
+        return node.id if isinstance(node, ast.Name) else None
+
+    def _visit_target(self, node: ast.AST):
+        # NOTE: `a` is loaded first as `a.b = 1` and `a[0] = 1` modify it
+        self.generic_visit(node)
+
+        if isinstance(node, (ast.Attribute, ast.Subscript)) and not isinstance(
+            node.ctx, ast.Load
+        ):
+            name = self._base_name(node)
+            if name is not None:
+                self.store(name)
+
+    visit_Attribute = _visit_target
+    visit_Subscript = _visit_target
+
+    # the value is evaluated before it's assigned to the targets
+
+    def visit_Assign(self, node: ast.Assign):
+        self.visit(node.value)
+        for i in node.targets:
+            self.visit(i)
+
+    def visit_AnnAssign(self, node: ast.AnnAssign):
+        if node.value is not None:
+            self.visit(node.value)
+
+        self.visit(node.annotation)
+        self.visit(node.target)
+
+    def visit_NamedExpr(self, node):
+        self.visit(node.value)
+        self.visit(node.target)
+
+    def _visit_for(self, node):
+        self.visit(node.iter)
+        self.visit(node.target)
+
+        for i in (*node.body, *node.orelse):
+            self.visit(i)
+
+    visit_For = _visit_for
+    visit_AsyncFor = _visit_for
+
+    def visit_AugAssign(self, node: ast.AugAssign):
+        self.visit(node.value)
+
+        name = self._base_name(node.target)
+        if name is not None:
+            self.load(name)
+
+        self.visit(node.target)
+
+    def visit_Import(self, node: ast.Import):
+        for i in node.names:
+            self.store(i.asname or i.name.split(".")[0])
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        for i in node.names:
+            if i.name != "*":
+                self.store(i.asname or i.name)
+
+    def _visit_function(self, node):
+        for i in node.decorator_list:
+            self.visit(i)
+
+        args = node.args
+        for i in (*args.defaults, *args.kw_defaults):
+            if i is not None:
+                self.visit(i)
+
+        self.store(node.name)
+        self._nested(node.body, args)
+
+    visit_FunctionDef = _visit_function
+    visit_AsyncFunctionDef = _visit_function
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        for i in (*node.decorator_list, *node.bases, *node.keywords):
+            self.visit(i)
+
+        self.store(node.name)
+        self._nested(node.body)
+
+    def visit_Lambda(self, node: ast.Lambda):
+        for i in (*node.args.defaults, *node.args.kw_defaults):
+            if i is not None:
+                self.visit(i)
+
+        self._nested([node.body], node.args)
+
+    def _visit_comprehension(self, node):
+        # NOTE: the first iterable is evaluated in the enclosing scope
+        self.visit(node.generators[0].iter)
+
+        elements = [i for i in ("elt", "key", "value") if hasattr(node, i)]
+
+        scope = _Scope(module=False)
+        self.scopes.append(scope)
+        try:
+            for i, generator in enumerate(node.generators):
+                if i > 0:
+                    self.visit(generator.iter)
+
+                self.visit(generator.target)
+                for j in generator.ifs:
+                    self.visit(j)
+
+            for i in elements:
+                self.visit(getattr(node, i))
+        finally:
+            self.scopes.pop()
+
+        for i in scope.loads - scope.stores:
+            self.load(i)
+
+    visit_ListComp = _visit_comprehension
+    visit_SetComp = _visit_comprehension
+    visit_DictComp = _visit_comprehension
+    visit_GeneratorExp = _visit_comprehension
+
+
+def cell_names(node: ast.AST) -> CellNames:
+    """Returns global names the code loads before assigning them and names it
+    stores, deleted and modified (`a[0] = 1`) names count as stored"""
+
+    visitor = _NameVisitor()
+    visitor.visit(node)
+
+    return visitor.names()
+
+
+class Node(NamedTuple):
+    id: int
+    source: str
+    loads: FrozenSet[str]
+    stores: FrozenSet[str]
+
+
+class DependencyGraph:
+    """Cells that were ran and the names they depend on
+
+    Each name is defined by the last cell that stored it, a cell that lost any
+    of its names to a newer cell is removed as running it again would
+    overwrite them
+
+    Cells that load a name they also store (like `a = a + 1`) are not added,
+    running them again would not give the same result, but names they store
+    still trigger the cells that depend on them"""
+
+    def __init__(self):
+        self.nodes: Dict[int, Node] = {}
+
+        # cell that defines each name
+        self.definers: Dict[str, int] = {}
+
+        # cells that load each name
+        self._readers: Dict[str, Set[int]] = {}
+
+        self._ids = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def add(
+        self, source: str, loads: FrozenSet[str], stores: FrozenSet[str]
+    ) -> Tuple[List[List[Node]], List[Node]]:
+        """Adds cell that was just ran, returns cells that depend on names it
+        stored, see `downstream`"""
+
+        for name in stores:
+            old = self.definers.get(name)
+            if old is not None:
+                self._remove(old)
+
+        node = None
+        if stores and not loads & stores:
+            node = Node(next(self._ids), source, loads, stores)
+            self.nodes[node.id] = node
+
+            for name in stores:
+                self.definers[name] = node.id
+
+            for name in loads:
+                self._readers.setdefault(name, set()).add(node.id)
+
+        return self.downstream(
+            stores, exclude=None if node is None else node.id
+        )
+
+    def _remove(self, id: int):
+        node = self.nodes.pop(id)
+
+        for name in node.stores:
+            if self.definers.get(name) == id:
+                del self.definers[name]
+
+        for name in node.loads:
+            readers = self._readers[name]
+            readers.discard(id)
+            if not readers:
+                del self._readers[name]
+
+    def downstream(
+        self, names: Iterable[str], *, exclude: int = None
+    ) -> Tuple[List[List[Node]], List[Node]]:
+        """Returns cells that depend on `names`, directly or through other
+        cells, in levels where each cell depends only on cells in levels
+        before it so cells of one level can be ran at the same time
+
+        Cells depending on each other in a cycle cannot be ordered, they are
+        returned separately"""
+
+        affected: Set[int] = set()
+        pending = list(names)
+        seen = set(pending)
+        while pending:
+            for id in self._readers.get(pending.pop(), ()):
+                if id in affected or id == exclude:
+                    continue
+
+                affected.add(id)
+                for name in self.nodes[id].stores:
+                    if name not in seen:
+                        seen.add(name)
+                        pending.append(name)
+
+        deps: Dict[int, Set[int]] = {}
+        for id in affected:
+            definers = (self.definers.get(i) for i in self.nodes[id].loads)
+            deps[id] = {i for i in definers if i in affected and i != id}
+
+        levels = []
+        while deps:
+            level = sorted(id for id, i in deps.items() if not i)
+            if not level:
+                break
+
+            for id in level:
+                del deps[id]
+
+            for i in deps.values():
+                i.difference_update(level)
+
+            levels.append([self.nodes[id] for id in level])
+
+        return levels, [self.nodes[id] for id in sorted(deps)]
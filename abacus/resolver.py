@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Static resolution of names and attributes, nothing here runs user code"""
+
+import builtins
+
+from inspect import getattr_static
+from typing import Any, Mapping
+
+# returned when the name does not exist at all
+MISSING = object()
+
+# returned when the value cannot be found without running user code
+UNRESOLVED = object()
+
+
+def resolve(ns: Mapping[str, Any], path: str) -> Any:
+    """Resolves dotted `path` like `a.b.c` against namespace `ns` and builtins
+
+    Attributes are looked up using `inspect.getattr_static` so properties,
+    `__getattr__` and other descriptors are never invoked, if resolving would
+    require them `UNRESOLVED` is returned"""
+
+    name, *attrs = path.split(".")
+
+    if name in ns:
+        value = ns[name]
+    elif hasattr(builtins, name):
+        value = getattr(builtins, name)
+    else:
+        return MISSING
+
+    for attr in attrs:
+        try:
+            value = getattr_static(value, attr)
+        except AttributeError:
+            # it may still exist through `__getattr__`
+            return UNRESOLVED
+
+        if isinstance(value, (classmethod, staticmethod)):
+            value = value.__func__
+        elif not callable(value) and hasattr(type(value), "__get__"):
+            # property or some other descriptor, its value is unknown
+            return UNRESOLVED
+
+    return value
@@ -0,0 +1,563 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Server that evaluates code for other programs using a pool of worker
+processes which are already loaded, the protocol is JSON Lines
+
+Request, only `code` is required:
+    {"id": 1, "code": "2x + 3x", "session": "name", "deadline": 5}
+
+Response:
+    {"id": 1, "result": "5*x", "error": null, "output": "", "elapsed": 0.01}
+
+Requests of the same session always go to the same worker so the namespace
+is kept between them, requests without a session use the session of the
+connection. Other requests are `{"op": "close", "session": "name"}` which
+forgets the session and `{"op": "stats"}`"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import signal
+import sys
+
+from collections import OrderedDict
+from contextlib import redirect_stdout
+from io import StringIO
+from time import monotonic
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from .parallel import cpu_count
+
+if TYPE_CHECKING:
+    from .engine import Engine, Session
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7300
+
+# sessions kept by each worker, least recently used ones are dropped
+MAX_SESSIONS = 256
+
+# requests waiting for each worker, when full clients have to wait
+QUEUE_SIZE = 64
+
+# seconds the worker has to respond after the deadline before it's restarted
+GRACE = 1.0
+
+# NOTE: results can be quite long
+LINE_LIMIT = 1 << 24
+
+_WORKER_COMMAND = "from abacus.server import main_worker; main_worker()"
+
+
+def _format_error(ex: BaseException) -> str:
+    return f"{type(ex).__name__}: {ex}"
+
+
+def _error_response(error: str) -> Dict[str, Any]:
+    return {"result": None, "error": error, "output": ""}
+
+
+def _handle(
+    engine: "Engine",
+    sessions: "OrderedDict[str, Session]",
+    request: Dict[str, Any],
+):
+    """Handles single request inside the worker, each session has its own
+    namespace in the engine of the worker"""
+
+    name = request["session"]
+
+    if request["op"] == "close":
+        sessions.pop(name, None)
+        return {}
+
+    session = sessions.get(name)
+    if session is None:
+        session = sessions[name] = engine.session()
+
+        if len(sessions) > MAX_SESSIONS:
+            sessions.popitem(last=False)
+    else:
+        sessions.move_to_end(name)
+
+    # NOTE: output of code ran with a deadline is lost as it's printed in
+    # another process
+    output = StringIO()
+    result = error = None
+    try:
+        with redirect_stdout(output):
+            value = session.run(request["code"], timeout=request["timeout"])
+
+        if value is not None:
+            result = str(value)
+    # NOTE: SIGINT is ignored in workers and they are stopped by closing
+    # stdin, so SystemExit and KeyboardInterrupt here come from the code,
+    # letting them through would lose every session of the worker
+    except BaseException as ex:
+        error = _format_error(ex)
+
+    return {"result": result, "error": error, "output": output.getvalue()}
+
+
+def main_worker():
+    """Starting point of worker processes, requests are read from stdin and
+    responses are written to stdout one per line"""
+
+    # NOTE: Ctrl-C is handled by the server, workers stop when stdin closes
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # anything else writing to stdout would break the protocol
+    out = os.fdopen(os.dup(1), "w")
+    os.dup2(2, 1)
+
+    # NOTE: the code must not read requests, and `exit()` closes sys.stdin
+    requests = os.fdopen(os.dup(0))
+    sys.stdin = open(os.devnull)
+
+    from .engine import Engine
+
+    engine = Engine(lazy=False)
+    sessions: "OrderedDict[str, Session]" = OrderedDict()
+
+    out.write('{"ready": true}\n')
+    out.flush()
+
+    for line in requests:
+        out.write(json.dumps(_handle(engine, sessions, json.loads(line))))
+        out.write("\n")
+        out.flush()
+
+
+class _Worker:
+    """Worker process and queue of requests for it"""
+
+    def __init__(self, queue_size: int):
+        # of tuples (request, deadline, future of the response)
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.process: Optional[asyncio.subprocess.Process] = None
+
+        # number of sessions assigned to it
+        self.sessions = 0
+
+        self.restarts = 0
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-c",
+            _WORKER_COMMAND,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            limit=LINE_LIMIT,
+        )
+
+        if not await self.process.stdout.readline():
+            raise RuntimeError("worker process failed to start")
+
+    async def stop(self):
+        process = self.process
+        if process is None or process.returncode is not None:
+            return
+
+        process.stdin.close()
+        try:
+            await asyncio.wait_for(process.wait(), 5)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+    async def restart(self):
+        # NOTE: the process may be gone already
+        try:
+            self.process.kill()
+        except ProcessLookupError:
+            pass
+
+        await self.process.wait()
+
+        self.restarts += 1
+        await self.start()
+
+    async def call(
+        self, request: Dict[str, Any], timeout: Optional[float]
+    ) -> Dict[str, Any]:
+        process = self.process
+        process.stdin.write(json.dumps(request).encode() + b"\n")
+        await process.stdin.drain()
+
+        line = await asyncio.wait_for(process.stdout.readline(), timeout)
+        if not line:
+            raise RuntimeError("worker process died")
+
+        return json.loads(line)
+
+    async def run(self):
+        """Handles requests from the queue one by one"""
+
+        while True:
+            request, deadline, future = await self.queue.get()
+
+            # the client is gone
+            if future.done():
+                continue
+
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - monotonic()
+                if timeout <= 0:
+                    future.set_result(
+                        _error_response(
+                            "EvaluationTimeout: deadline passed in queue"
+                        )
+                    )
+                    continue
+
+            try:
+                response = await self.call(
+                    {**request, "timeout": timeout},
+                    None if timeout is None else timeout + GRACE,
+                )
+            except (asyncio.TimeoutError, RuntimeError, OSError, ValueError):
+                # NOTE: sessions of the worker are lost
+                await self.restart()
+                response = _error_response(
+                    "WorkerError: worker had to be restarted"
+                )
+
+            if not future.done():
+                future.set_result(response)
+
+
+class Server:
+    """Pool of workers and the client handling, see `serve`
+
+    `deadline` is the default deadline of requests in seconds, the time
+    requests spend waiting in the queue counts towards it"""
+
+    def __init__(
+        self,
+        *,
+        workers: Optional[int] = None,
+        queue_size: int = QUEUE_SIZE,
+        deadline: Optional[float] = None,
+    ):
+        if workers is None:
+            workers = cpu_count()
+
+        self.workers = [_Worker(queue_size) for _ in range(workers)]
+        self.deadline = deadline
+
+        # worker of each session
+        self._affinity: "OrderedDict[str, _Worker]" = OrderedDict()
+
+        self._tasks: List[asyncio.Task] = []
+        self._connections = itertools.count(1)
+
+    async def start(self):
+        await asyncio.gather(*(i.start() for i in self.workers))
+        self._tasks = [asyncio.create_task(i.run()) for i in self.workers]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.gather(*(i.stop() for i in self.workers))
+
+    def _worker(self, session: str) -> _Worker:
+        worker = self._affinity.get(session)
+        if worker is not None:
+            self._affinity.move_to_end(session)
+            return worker
+
+        worker = min(self.workers, key=lambda i: (i.queue.qsize(), i.sessions))
+        worker.sessions += 1
+        self._affinity[session] = worker
+
+        # NOTE: the worker drops the oldest sessions by itself
+        if len(self._affinity) > MAX_SESSIONS * len(self.workers):
+            _, oldest = self._affinity.popitem(last=False)
+            oldest.sessions -= 1
+
+        return worker
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._affinity),
+            "workers": [
+                {
+                    "queued": i.queue.qsize(),
+                    "sessions": i.sessions,
+                    "restarts": i.restarts,
+                }
+                for i in self.workers
+            ],
+        }
+
+    async def enqueue(
+        self, session: str, request: Dict[str, Any]
+    ) -> "asyncio.Future[Dict[str, Any]]":
+        """Puts the request into the queue of the worker of the session and
+        returns future of the response, waits while the queue is full
+
+        Raises `ValueError` if the request is not valid"""
+
+        future = asyncio.get_running_loop().create_future()
+        op = request.get("op", "eval")
+
+        if op == "stats":
+            future.set_result(self.stats())
+            return future
+
+        if op == "close":
+            worker = self._affinity.pop(session, None)
+            if worker is None:
+                future.set_result({})
+                return future
+
+            worker.sessions -= 1
+        elif op == "eval":
+            if not isinstance(request.get("code"), str):
+                raise ValueError("'code' has to be a string")
+
+            worker = self._worker(session)
+        else:
+            raise ValueError(f"unknown op {op!r}")
+
+        deadline = request.get("deadline", self.deadline)
+        if deadline is not None:
+            deadline = monotonic() + float(deadline)
+
+        await worker.queue.put(
+            (
+                {"op": op, "session": session, "code": request.get("code")},
+                deadline,
+                future,
+            )
+        )
+
+        return future
+
+    async def submit(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Handles the request and returns the response, for use inside the
+        same event loop"""
+
+        start = monotonic()
+        session = f"s:{request.get('session', 'default')}"
+        response = await (await self.enqueue(session, request))
+
+        return {
+            "id": request.get("id"),
+            **response,
+            "elapsed": monotonic() - start,
+        }
+
+    async def handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        connection = f"c:{next(self._connections)}"
+        lock = asyncio.Lock()
+        pending: Dict[asyncio.Future, Any] = {}
+
+        async def respond(response: Dict[str, Any]):
+            async with lock:
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+
+        async def reply(future: asyncio.Future, id: Any, start: float):
+            try:
+                response = await future
+            finally:
+                pending.pop(future, None)
+
+            await respond(
+                {"id": id, **response, "elapsed": monotonic() - start}
+            )
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                start = monotonic()
+                id = None
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request has to be an object")
+
+                    id = request.get("id")
+                    session = request.get("session")
+                    session = connection if session is None else f"s:{session}"
+
+                    # NOTE: the client is not read from while the queue is
+                    # full, so it cannot send more than the server can handle
+                    future = await self.enqueue(session, request)
+                except (ValueError, TypeError) as ex:
+                    await respond(
+                        {"id": id, **_error_response(_format_error(ex))}
+                    )
+                    continue
+
+                pending[future] = asyncio.create_task(reply(future, id, start))
+
+            # NOTE: the client may close only its side once it sent everything
+            await asyncio.gather(*pending.values(), return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            # requests of the client that are still queued are skipped
+            for future in list(pending):
+                future.cancel()
+
+            if connection in self._affinity:
+                await self.enqueue(connection, {"op": "close"})
+
+            writer.close()
+
+
+async def serve(
+    *,
+    path: Optional[str] = None,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    **kwargs,
+):
+    """Runs the server on unix socket `path` or on TCP `host` and `port`
+    until cancelled, rest of the arguments are passed to `Server`"""
+
+    server = Server(**kwargs)
+    await server.start()
+
+    try:
+        if path is not None:
+            listener = await asyncio.start_unix_server(
+                server.handle_client, path, limit=LINE_LIMIT
+            )
+            address = path
+        else:
+            listener = await asyncio.start_server(
+                server.handle_client, host, port, limit=LINE_LIMIT
+            )
+            address = f"{host}:{port}"
+
+        async with listener:
+            print(f"Listening on {address}", file=sys.stderr)
+            await listener.serve_forever()
+    finally:
+        await server.close()
+
+
+class Client:
+    """Client that sends one request at a time"""
+
+    def __init__(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        self.reader = reader
+        self.writer = writer
+        self._ids = itertools.count(1)
+
+    @classmethod
+    async def connect(
+        cls,
+        path: Optional[str] = None,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+    ) -> "Client":
+        if path is not None:
+            streams = await asyncio.open_unix_connection(path, limit=LINE_LIMIT)
+        else:
+            streams = await asyncio.open_connection(
+                host, port, limit=LINE_LIMIT
+            )
+
+        return cls(*streams)
+
+    async def request(self, **request) -> Dict[str, Any]:
+        request.setdefault("id", next(self._ids))
+
+        self.writer.write(json.dumps(request).encode() + b"\n")
+        await self.writer.drain()
+
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+
+        return json.loads(line)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def main_serve(argv=None):
+    """Starting point of `abacus serve`"""
+
+    parser = argparse.ArgumentParser(
+        prog="abacus serve",
+        description="Evaluates code sent over a socket as JSON Lines using a "
+        "pool of worker processes",
+    )
+    parser.add_argument(
+        "--socket",
+        metavar="PATH",
+        help="listen on unix socket PATH instead of TCP",
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--queue",
+        type=int,
+        default=QUEUE_SIZE,
+        help=f"requests waiting for each worker (default: {QUEUE_SIZE})",
+    )
+    parser.add_argument(
+        "-t",
+        "--deadline",
+        type=float,
+        default=None,
+        help="default time limit of requests in seconds",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(
+            serve(
+                path=args.socket,
+                host=args.host,
+                port=args.port,
+                workers=args.jobs,
+                queue_size=args.queue,
+                deadline=args.deadline,
+            )
+        )
+    except KeyboardInterrupt:
+        pass
+
+    return 0
@@ -16,32 +16,58 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import ast
+import atexit
+import hashlib
+import importlib
 import importlib.resources
+import importlib.util
+import os
+import sys
+import traceback
 
 from abc import ABCMeta, abstractmethod
+from contextlib import nullcontext, redirect_stderr, redirect_stdout
 from io import StringIO, TextIOBase
-from tokenize import TokenInfo
+from pathlib import Path
+from tokenize import TokenError, TokenInfo
 from tokenize import generate_tokens as _generate_tokens
 from tokenize import untokenize as _untokenize
-from types import CodeType
+from types import CodeType, ModuleType
 from typing import (
     TYPE_CHECKING,
     Any,
     Callable,
+    ContextManager,
     Dict,
+    Iterator,
     List,
     Mapping,
+    Optional,
+    Set,
     TextIO,
+    Tuple,
     Union,
 )
 
-from . import __version__, __version_info__, ns
+from . import __version__, __version_info__, namespace, ns
+from .cache import CacheEntry, DiskCache
+from .jobs import Job, JobManager
+from .lazy import LazyModule, LazyObject, is_proxy_of, unproxy
+from .paths import cache_dir, data_dir, init_files
+from .profiler import Profiler
+from .tokenizer import split_statements
 
 if TYPE_CHECKING:
-    from pathlib import Path
+    from .journal import Journal
+    from .memo import Memo
+    from .reactive import DependencyGraph, Node
+    from .snapshot import SnapshotInfo
 
 
 class StringTransformer(metaclass=ABCMeta):
+    # if set each step of the transformation is timed
+    profiler: Optional[Profiler] = None
+
     @classmethod
     def _tokenize(cls, input: str) -> List[TokenInfo]:
         return list(_generate_tokens(StringIO(input).readline))
@@ -56,27 +82,161 @@ class StringTransformer(metaclass=ABCMeta):
     def transform_tokens(self, tokens: List[TokenInfo]) -> List[TokenInfo]:
         return []
 
+    def _stage(self, name: str) -> ContextManager:
+        if self.profiler is None:
+            return nullcontext()
+
+        return self.profiler.stage(name)
+
     def __call__(self, lines: List[str]) -> List[str]:
         lines = self.transform(lines)
 
-        tokens = self._tokenize("".join(lines))
-        tokens = self.transform_tokens(tokens)
+        with self._stage("tokenize"):
+            tokens = self._tokenize("".join(lines))
+
+        with self._stage("transform_tokens"):
+            tokens = self.transform_tokens(tokens)
 
         if not tokens:
             return lines
-        else:
+
+        with self._stage("untokenize"):
             # NOTE: the NL characters are required and it wont run properly
             # without them
             return self._untokenize(tokens).splitlines(keepends=True)
 
 
+class LineTransformer(StringTransformer):
+    """Adapter for transformers that work only on lines, like the ones IPython
+    uses, so they can be used inside `TransformerPipeline`"""
+
+    def __init__(self, fn: Callable[[List[str]], List[str]]):
+        self.fn = fn
+
+    def transform(self, lines: List[str]) -> List[str]:
+        return self.fn(lines)
+
+
+class TransformerPipeline(StringTransformer):
+    """Runs string transformers one after another tokenizing the input only
+    once
+
+    Token level transformers all work on the same tokens which are untokenized
+    only once at the end, transformers that work on lines (overriding
+    `transform` or plain callables which are wrapped in `LineTransformer`)
+    require the tokens to be untokenized before them"""
+
+    def __init__(
+        self,
+        transformers: Optional[List[Callable]] = None,
+        *,
+        profiler: Optional[Profiler] = None,
+    ):
+        self.transformers: List[Callable] = (
+            [] if transformers is None else transformers
+        )
+        self.profiler = profiler
+
+    def __call__(self, lines: List[str]) -> List[str]:
+        tokens = None
+        changed = False
+
+        for i in self.transformers:
+            if not isinstance(i, StringTransformer):
+                i = LineTransformer(i)
+
+            if type(i).transform is not StringTransformer.transform:
+                if changed:
+                    lines = self._lines(tokens)
+
+                tokens = None
+                changed = False
+
+                lines = i.transform(lines)
+
+            if type(i).transform_tokens is StringTransformer.transform_tokens:
+                continue
+
+            if tokens is None:
+                with self._stage("tokenize"):
+                    tokens = self._tokenize("".join(lines))
+
+            with self._stage("transform_tokens"):
+                result = i.transform_tokens(tokens)
+
+            # empty result means nothing was changed
+            if result:
+                tokens = result
+                changed = True
+
+        if changed:
+            lines = self._lines(tokens)
+
+        return lines
+
+    def _lines(self, tokens: List[TokenInfo]) -> List[str]:
+        with self._stage("untokenize"):
+            # NOTE: the NL characters are required and it wont run properly
+            # without them
+            return self._untokenize(tokens).splitlines(keepends=True)
+
+
+# names the code uses the shell through, `get_ipython` is used by magics
+_SHELL_NAMES = {"abacus", "get_ipython"}
+
+
 # TODO: config
 class ShellBase(metaclass=ABCMeta):
     EVENT_POST_EXECUTE = "post_execute"
 
-    def __init__(self):
+    # if user init scripts from the config directory are ran on load
+    load_user_init = True
+
+    def __init__(self, *, lazy: Optional[bool] = None):
         self.transformer = None
 
+        # sympy is imported only when it's first used, so startup is faster
+        if lazy is None:
+            lazy = os.environ.get("ABACUS_LAZY", "0") not in ("", "0")
+
+        self.lazy = lazy
+        self._lazy_modules: Dict[str, LazyModule] = {}
+
+        # opt-in timing of the stages each cell goes through
+        self.profiler = Profiler()
+
+        # all string transformers are ran through it
+        self.str_pipeline = TransformerPipeline(profiler=self.profiler)
+
+        # time limit of each cell in seconds, the cell is ran in a separate
+        # process which is killed if it takes longer
+        self.timeout: Optional[float] = None
+
+        # cells running in the background, see `run_background`
+        self.jobs = JobManager()
+
+        # opt-in cache of results of expensive functions, see `enable_memo`
+        self.memo: Optional["Memo"] = None
+        self._memo_wrappers: Dict[str, Callable] = {}
+        self._memo_path: Optional[Path] = None
+
+        # snapshot of the namespace after loading, only names changed since
+        # are saved by `save_session`
+        self._loaded_ns: Dict[str, Any] = {}
+
+        # opt-in journal of cells for crash recovery, see `start_journal`
+        self.journal: Optional["Journal"] = None
+
+        # opt-in graph of cells ran again when names they use change, see
+        # `enable_reactive`
+        self.reactive: Optional["DependencyGraph"] = None
+
+        # compiled init scripts so they are not transformed on each startup
+        directory = cache_dir()
+        self.disk_cache = (
+            DiskCache(directory / "code") if directory is not None else None
+        )
+
     @property
     @abstractmethod
     def user_ns(self) -> Dict[str, Any]:
@@ -122,20 +282,258 @@ class ShellBase(metaclass=ABCMeta):
         Triggers `self.EVENT_POST_EXECUTE`"""
         pass
 
-    def run_file(self, file: Union[str, "Path", TextIO]):
-        """Runs whole file using `self.run`"""
+    def run_file(
+        self,
+        file: Union[str, "Path", TextIO],
+        *,
+        filename: Optional[str] = None,
+    ) -> Any:
+        """Runs the file statement by statement as they are read, so output
+        shows up as it runs and the whole file is never in memory at once
+
+        Each statement is transformed and ran like a separate cell, value of
+        the last statement is displayed and returned
+
+        Exceptions are raised to the caller and stop the file"""
 
         # TODO: file should be TextIO but isinstance fails
         if not isinstance(file, TextIOBase):
+            filename = filename or str(file)
             file = open(file, "r")
+        else:
+            filename = filename or getattr(file, "name", "<file>")
 
+        last = None
         with file:
-            self.run(file.read())
+            # NOTE: one statement is read ahead so the last one is known
+            for statement in self._statements(file.readline, filename):
+                if last is not None:
+                    self._run_statement(*last, filename=filename)
+
+                last = statement
+
+        if last is None:
+            return None
+
+        value = self._run_statement(*last, filename=filename, mode="eval")
+        self.display(value)
+
+        return value
+
+    @staticmethod
+    def _statements(
+        readline: Callable[[], str], filename: str
+    ) -> Iterator[Tuple[int, str]]:
+        """Same as `split_statements` but raises `SyntaxError` on bad input"""
+
+        try:
+            yield from split_statements(readline)
+        except TokenError as ex:
+            msg, (lineno, offset) = ex.args
+            raise SyntaxError(msg, (filename, lineno, offset, None)) from None
+
+    def _run_statement(
+        self, lineno: int, source: str, *, filename: str, mode="exec"
+    ) -> Any:
+        code = self.compile_file(
+            source, filename=filename, lineno=lineno, mode=mode
+        )
+
+        try:
+            return self.evaluate(code)
+        finally:
+            self.trigger_event(self.EVENT_POST_EXECUTE)
+
+    def run_background(self, source: str) -> Job:
+        """Transforms the source and runs it on a separate thread with a copy
+        of the namespace, so the shell can be used in the meantime
+
+        Changes to the namespace and value of the last statement (as
+        `_bg<id>`) are merged into the namespace by `check_jobs`"""
+
+        filename = f"<bg{self.jobs.next_id}>"
+
+        # NOTE: transformers are not thread safe so it's compiled right away
+        statements = list(self._statements(StringIO(source).readline, filename))
+        codes = [
+            self.compile_file(
+                statement,
+                filename=filename,
+                lineno=lineno,
+                mode="eval" if i == len(statements) - 1 else "exec",
+            )
+            for i, (lineno, statement) in enumerate(statements)
+        ]
+
+        def run(ns: Dict[str, Any]) -> Any:
+            value = None
+            for code in codes:
+                value = eval(code, ns)
+
+            return value
+
+        # NOTE: symbols made while transforming are removed after the cell
+        temporary = self.transformer.symbols if self.transformer else ()
+
+        return self.jobs.submit(source, run, self.user_ns, temporary)
+
+    def check_jobs(self):
+        """Merges finished background jobs into the namespace and tells the
+        user about them"""
+
+        for job in self.jobs.collect(self.user_ns):
+            print(job.describe())
+
+            if job.error is not None:
+                print(f"    {type(job.error).__name__}: {job.error}")
+            elif job.result is not None:
+                print(f"    result stored as {job.name}")
+
+            if job.conflicts:
+                print(
+                    "    not merged as they were changed in the meantime: "
+                    + ", ".join(job.conflicts)
+                )
+
+    def run_limited(self, fn: Callable[[], Any], timeout: Optional[float]):
+        """Calls `fn` with time limit of `timeout` seconds, changes it does to
+        the namespace are kept only if it finishes in time, see
+        `abacus.timeout.run_limited`"""
+
+        from .timeout import run_limited
+
+        return run_limited(fn, timeout, self.user_ns, self._save_name)
+
+    def _uses_shell(self, *codes: Optional[CodeType]) -> bool:
+        """Checks if the code refers to the shell, such code is not ran in a
+        separate process as changes to the shell would be lost with it"""
+
+        for code in codes:
+            if code is None:
+                continue
+
+            if not _SHELL_NAMES.isdisjoint(code.co_names):
+                return True
+
+            # functions and classes defined by the code
+            if self._uses_shell(
+                *(i for i in code.co_consts if isinstance(i, CodeType))
+            ):
+                return True
+
+        return False
+
+    def display(self, value: Any):
+        """Shows the value the same way result of a cell is shown"""
+
+        sys.displayhook(value)
 
     def run_package_file(self, file: str, package: str):
-        """Run file from package `package`"""
-        fp = importlib.resources.open_text(package, file)
-        self.run_file(fp)
+        """Run init file from package `package`"""
+
+        source = importlib.resources.read_text(package, file)
+        self.run_init_file(source, filename=f"<{package}/{file}>")
+
+    def run_init_file(self, source: str, filename: str):
+        """Runs whole init script at once, the compiled code is cached on disk
+        so unchanged scripts are not transformed again on next startup
+
+        Triggers `self.EVENT_POST_EXECUTE`"""
+
+        transformer = self.transformer
+        cache = self.disk_cache if transformer is not None else None
+
+        entry = None
+        if cache is not None:
+            key = self._source_key(source)
+            entry = cache.get(filename, key, transformer.check)
+
+        if entry is not None:
+            self.profiler.count("init.cached")
+            transformer.restore(entry.symbols, entry.integers)
+            code = entry.stmt
+        else:
+            self.profiler.count("init.compiled")
+            code = self.compile_file(source, filename=filename)
+
+            if cache is not None:
+                # NOTE: whole file is a single code object
+                cache.put(
+                    filename,
+                    key,
+                    CacheEntry(
+                        deps=tuple(transformer.lookups.items()),
+                        symbols=tuple(transformer.symbols),
+                        integers=tuple(transformer.integers),
+                        stmt=code,
+                        module=None,
+                    ),
+                )
+
+        try:
+            self.execute(code)
+        finally:
+            self.trigger_event(self.EVENT_POST_EXECUTE)
+
+    def compile_file(
+        self, source: str, *, filename="<input>", lineno: int = 1, mode="exec"
+    ) -> CodeType:
+        """Transforms and compiles whole source, `lineno` is the line number
+        of its first line so errors point to the right line of the file
+
+        In `eval` mode the source is compiled as an expression if it's a single
+        expression, otherwise in `exec` mode which evaluates to `None`"""
+
+        profiler = self.profiler
+
+        with profiler.stage("str_transform"):
+            lines = self.str_pipeline(source.splitlines(keepends=True))
+
+        with profiler.stage("parse"):
+            try:
+                node = ast.parse("".join(lines), filename=filename, mode="exec")
+            except SyntaxError as ex:
+                if ex.lineno is not None:
+                    ex.lineno += lineno - 1
+
+                if getattr(ex, "end_lineno", None) is not None:
+                    ex.end_lineno += lineno - 1
+
+                raise
+
+            if lineno != 1:
+                ast.increment_lineno(node, lineno - 1)
+
+        with profiler.stage("ast_transform"):
+            for i in self.ast_transformers:
+                node = i.visit(node)
+
+        if mode == "eval":
+            if len(node.body) == 1 and isinstance(node.body[0], ast.Expr):
+                node = ast.Expression(body=node.body[0].value)
+            else:
+                mode = "exec"
+
+        with profiler.stage("compile"):
+            ast.fix_missing_locations(node)
+            return compile(node, filename=filename, mode=mode)
+
+    def _source_key(self, source: str) -> bytes:
+        """Key of compiled `source`, it changes if the source, abacus version,
+        transformers or python bytecode version change"""
+
+        digest = hashlib.sha256()
+        digest.update(importlib.util.MAGIC_NUMBER)
+        digest.update(__version__.encode())
+
+        for i in (*self.str_transformers, *self.ast_transformers):
+            module = getattr(i, "__module__", type(i).__module__)
+            name = getattr(i, "__qualname__", type(i).__qualname__)
+            digest.update(f"{module}.{name}\0".encode())
+
+        digest.update(source.encode())
+
+        return digest.digest()
 
     # TODO: bring back debug enable
 
@@ -152,9 +550,16 @@ class ShellBase(metaclass=ABCMeta):
             }
         )
 
-        # NOTE: importing sympy using execute cause transformer needs it and
-        # execute does not do any transformation
-        self.execute("import sympy")
+        # NOTE: the transformer generates code that uses `sympy`
+        if self.lazy:
+            self.push({"sympy": self.lazy_import("sympy")})
+
+            # in case it was imported some other way
+            self.register_event(
+                self.EVENT_POST_EXECUTE, self.check_lazy_imports
+            )
+        else:
+            self.execute("import sympy")
 
         from .transformer import AbacusTransformer
 
@@ -162,10 +567,434 @@ class ShellBase(metaclass=ABCMeta):
 
         self.run_package_file("init.pyi", ns.__package__)
 
-        # TODO: run the real init file somewhere on the system
+        if self.load_user_init:
+            for path in init_files():
+                # NOTE: errors in user scripts should not prevent startup
+                try:
+                    self.run_init_file(path.read_text(), filename=str(path))
+                except Exception:
+                    traceback.print_exc()
+
+        self._loaded_ns = namespace.snapshot(self.user_ns)
 
         return self
 
+    def lazy_import(self, module: str, name: Optional[str] = None) -> Any:
+        """Imports `module`, or `name` from it, in lazy mode a proxy that
+        imports it on first use is returned instead
+
+        The proxies in the namespace are replaced with the real objects once
+        the module is imported"""
+
+        if not self.lazy:
+            result = importlib.import_module(module)
+            if name is None:
+                return result
+
+            return getattr(result, name)
+
+        proxy = self._lazy_modules.get(module)
+        if proxy is None:
+            proxy = self._lazy_modules[module] = LazyModule(module)
+            proxy.on_load(self._replace_proxies)
+
+        if name is None:
+            return proxy
+        elif proxy.loaded:
+            return getattr(proxy, name)
+
+        return LazyObject(proxy, name)
+
+    def when_imported(self, module: str, callback: Callable[[ModuleType], Any]):
+        """Calls `callback` with `module` once it's imported, which is right
+        away unless in lazy mode"""
+
+        result = self.lazy_import(module)
+        if isinstance(result, LazyModule):
+            result.on_load(callback)
+        else:
+            callback(result)
+
+    def check_lazy_imports(self):
+        """Finishes loading of lazy modules that were imported some other way
+        than through the proxy, like by the transformer or `import sympy`"""
+
+        for name, proxy in list(self._lazy_modules.items()):
+            if not proxy.loaded and name in sys.modules:
+                proxy.load()
+
+    def _replace_proxies(self, module: ModuleType):
+        ns = self.user_ns
+        for key, value in list(ns.items()):
+            if is_proxy_of(value, module.__name__):
+                ns[key] = unproxy(value)
+
+    def init_printing(self, **kwargs):
+        """Sets up sympy printing, same arguments as `sympy.init_printing`
+
+        In lazy mode it's done once sympy is imported"""
+
+        self.when_imported("sympy", lambda sympy: sympy.init_printing(**kwargs))
+
+    def print_table(self, expr, /, **kwargs):
+        """Prints table of `expr` evaluated for all combinations of values,
+        see `abacus.table.table`"""
+
+        from .table import print_table
+
+        print_table(expr, **kwargs)
+
+    def enable_memo(self, *, maxsize: Optional[int] = None, persist=False):
+        """Replaces expensive sympy functions (`abacus.memo.MEMO_FUNCTIONS`)
+        in the namespace with versions that cache their results
+
+        If `persist` is true the results are saved to the cache directory on
+        exit and loaded on next start, statistics are in `abacus.memo.stats()`
+        """
+
+        from .memo import MEMO_FUNCTIONS, Memo
+
+        if self.memo is None:
+            self.memo = Memo() if maxsize is None else Memo(maxsize)
+            self.register_event(self.EVENT_POST_EXECUTE, self._check_memo)
+        elif maxsize is not None:
+            self.memo.maxsize = maxsize
+
+        directory = cache_dir()
+        if persist and directory is not None:
+            path = directory / "memo.pickle"
+            self.memo.load(path)
+
+            if self._memo_path is None:
+                atexit.register(self._save_memo)
+            self._memo_path = path
+
+        def wrap(sympy: ModuleType):
+            for name in MEMO_FUNCTIONS:
+                if name in self._memo_wrappers:
+                    continue
+
+                fn = getattr(sympy, name)
+                wrapper = self.memo.wrap(fn)
+                self._memo_wrappers[name] = wrapper
+                self.user_ns[name] = wrapper
+
+        self.when_imported("sympy", wrap)
+
+    def disable_memo(self):
+        """Puts back the original functions"""
+
+        if self.memo is None:
+            return
+
+        for name, wrapper in self._memo_wrappers.items():
+            if self.user_ns.get(name) is wrapper:
+                self.user_ns[name] = wrapper.__wrapped__
+
+        self._memo_wrappers.clear()
+        self.memo = None
+        self.unregister_event(self.EVENT_POST_EXECUTE, self._check_memo)
+
+    def _save_memo(self):
+        if self.memo is not None and self._memo_path is not None:
+            self.memo.save(self._memo_path)
+
+    def _check_memo(self):
+        """Forgets results of functions that were replaced in the namespace"""
+
+        for name, wrapper in list(self._memo_wrappers.items()):
+            if self.user_ns.get(name) is not wrapper:
+                fn = wrapper.__wrapped__
+                self.memo.invalidate(f"{fn.__module__}.{fn.__qualname__}")
+                del self._memo_wrappers[name]
+
+    def _session_path(self, path: Union[str, Path, None]) -> Path:
+        if path is not None:
+            return Path(path).expanduser()
+
+        directory = data_dir()
+        if directory is None:
+            raise ValueError("No path given and the data directory is disabled")
+
+        return directory / "session.pickle"
+
+    def _save_name(self, name: str) -> bool:
+        """Checks if `name` from the namespace belongs in a saved session"""
+
+        return not namespace.ignored(name)
+
+    def _session_changes(
+        self, before: Dict[str, Any]
+    ) -> namespace.NamespaceDiff:
+        """Changes of the namespace since `before` that belong in a saved
+        session"""
+
+        changes = namespace.diff(self.user_ns, before)
+
+        return namespace.select(changes, self._save_name)
+
+    def save_session(
+        self, path: Union[str, Path, None] = None
+    ) -> "SnapshotInfo":
+        """Saves names defined since startup to `path`, by default
+        `session.pickle` in the data directory
+
+        Values that cannot be pickled are skipped with a warning, see
+        `abacus.snapshot`"""
+
+        from . import snapshot
+
+        path = self._session_path(path)
+        changes = self._session_changes(self._loaded_ns)
+
+        info = snapshot.save(path, changes)
+        if info.skipped:
+            print(f"Could not save {', '.join(info.skipped)}", file=sys.stderr)
+
+        return info
+
+    def load_session(
+        self, path: Union[str, Path, None] = None
+    ) -> "SnapshotInfo":
+        """Restores session saved by `save_session`"""
+
+        from . import snapshot
+        from .transformer import intern_symbol
+
+        changes = snapshot.load(self._session_path(path))
+
+        # NOTE: so symbols are same objects the transformer creates
+        sympy = sys.modules.get("sympy")
+        if sympy is not None:
+            for k, v in changes.changed.items():
+                if isinstance(v, sympy.Symbol):
+                    changes.changed[k] = intern_symbol(v)
+
+        namespace.apply(self.user_ns, changes)
+
+        # unpickling imports sympy in lazy mode
+        self.check_lazy_imports()
+        self.trigger_event(self.EVENT_POST_EXECUTE)
+
+        return snapshot.SnapshotInfo(list(changes.changed), [])
+
+    def _journal_path(self, path: Union[str, Path, None]) -> Path:
+        if path is not None:
+            return Path(path).expanduser()
+
+        directory = data_dir()
+        if directory is None:
+            raise ValueError("No path given and the data directory is disabled")
+
+        return directory / "journal"
+
+    def start_journal(
+        self, path: Union[str, Path, None] = None, *, resume=False
+    ) -> "Journal":
+        """Appends each cell ran from now on to the journal at `path`, by
+        default `journal` in the data directory, see `replay_journal`
+
+        Unless `resume` is true it's a new session in the journal"""
+
+        from .journal import Journal
+
+        self.stop_journal()
+        self.journal = Journal(self._journal_path(path), resume=resume)
+
+        return self.journal
+
+    def stop_journal(self):
+        """Stops journaling after everything was written"""
+
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def checkpoint(self):
+        """Saves the namespace so replay of the journal does not have to run
+        the cells before"""
+
+        if self.journal is not None:
+            self.journal.checkpoint(self._session_changes(self._loaded_ns))
+
+    def _journal_cell(
+        self,
+        source: str,
+        transformed: Optional[str],
+        elapsed: float,
+        before: Dict[str, Any],
+    ):
+        """Appends the cell to the journal, `before` is snapshot of the
+        namespace before the cell was ran"""
+
+        journal = self.journal
+
+        # NOTE: cheap cells are faster to run again than to load
+        changes = None
+        if elapsed >= journal.result_threshold:
+            changes = self._session_changes(before)
+            if not changes.changed and not changes.deleted:
+                changes = None
+
+        journal.append(source, transformed, elapsed, changes)
+
+        if journal.needs_checkpoint():
+            self.checkpoint()
+
+    def replay_journal(
+        self, path: Union[str, Path, None] = None
+    ) -> Tuple[int, int]:
+        """Restores the last session of the journal by loading its last
+        checkpoint and running cells after it, cells with cached changes are
+        loaded instead, then continues journaling the session
+
+        Output of the cells is discarded, returns number of cells that were ran
+        and loaded
+
+        NOTE: changes are found by comparing what names are bound to, so
+        cached cells that also modified objects in place are not replayed
+        exactly"""
+
+        from . import journal, snapshot
+
+        path = self._journal_path(path)
+        checkpoint, cells = journal.last_session(path)
+
+        self.stop_journal()
+
+        if checkpoint is not None:
+            self.load_session(path.parent / checkpoint.name)
+
+        ran = loaded = 0
+        results = journal.results_dir(path)
+        for cell in cells:
+            result = results / f"{cell.key}.pickle"
+
+            # NOTE: any error while loading means the cell is ran instead
+            try:
+                changes = snapshot.load(result)
+            except Exception:
+                changes = None
+
+            if changes is not None:
+                namespace.apply(self.user_ns, changes)
+                loaded += 1
+                continue
+
+            with redirect_stdout(StringIO()), redirect_stderr(StringIO()):
+                try:
+                    self.run(cell.source)
+                except Exception:
+                    pass
+
+            ran += 1
+
+        self.check_lazy_imports()
+        self.start_journal(path, resume=True)
+
+        return ran, loaded
+
+    def enable_reactive(self):
+        """Each cell that changes a name runs again cells that depend on it,
+        directly or through other cells, like a spreadsheet
+
+        Only cells ran from now on are tracked, cells that only evaluate an
+        expression are not tracked as running them again would have no effect
+        """
+
+        from .reactive import DependencyGraph
+
+        if self.reactive is None:
+            self.reactive = DependencyGraph()
+
+    def disable_reactive(self):
+        self.reactive = None
+
+    def compile_cell(self, source: str) -> CodeType:
+        """Transforms and compiles a cell the same way it would be when ran"""
+
+        return self.compile_file(source, filename="<reactive>")
+
+    def _react(self, source: str, transformed: Optional[str]):
+        """Adds the cell that was just ran to the dependency graph and runs
+        the cells that depend on names it stored"""
+
+        from .reactive import cell_names
+
+        names = self.transformer.names if self.transformer else None
+        if names is None:
+            # NOTE: cells compiled before reactive mode was enabled
+            try:
+                names = cell_names(ast.parse(transformed or source))
+            except SyntaxError:
+                return
+
+        levels, cyclic = self.reactive.add(source, *names)
+        if cyclic:
+            ids = ", ".join(str(i.id) for i in cyclic)
+            print(f"Cells {ids} depend on each other", file=sys.stderr)
+
+        if levels:
+            self.recompute(levels)
+
+    def recompute(self, levels: List[List["Node"]]):
+        """Runs the cells level by level, cells of a level are independent so
+        they are ran in parallel if there are multiple CPUs
+
+        Cells depending on a cell that failed are skipped"""
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        from .parallel import cpu_count
+
+        ns = self.user_ns
+        failed: Set[str] = set()
+
+        def run(code: CodeType) -> Optional[Exception]:
+            try:
+                exec(code, ns)
+            except Exception as ex:
+                return ex
+
+            return None
+
+        pool = None
+        try:
+            for level in levels:
+                # NOTE: transformed one by one as transformation creates symbols
+                # in the namespace, but only after previous levels were ran
+                cells = []
+                for node in level:
+                    if node.loads & failed:
+                        failed.update(node.stores)
+                        continue
+
+                    try:
+                        cells.append((node, self.compile_cell(node.source)))
+                    except SyntaxError:
+                        failed.update(node.stores)
+
+                codes = [code for _, code in cells]
+                if len(cells) < 2 or cpu_count() < 2:
+                    errors = list(map(run, codes))
+                else:
+                    if pool is None:
+                        pool = ThreadPoolExecutor(cpu_count())
+
+                    errors = list(pool.map(run, codes))
+
+                for (node, _), error in zip(cells, errors):
+                    if error is not None:
+                        failed.update(node.stores)
+                        print(
+                            f"Error in cell {node.id} ({node.source.strip()}): "
+                            f"{type(error).__name__}: {error}",
+                            file=sys.stderr,
+                        )
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
     def push(self, _locals: Mapping[str, Any]) -> "ShellBase":
         """Set locals in the user namespace"""
 
@@ -173,6 +1002,13 @@ class ShellBase(metaclass=ABCMeta):
 
         return self
 
+    def push_hidden(self, name: str, value: Any):
+        """Binds name used by generated code, it should start with
+        `abacus.namespace.HIDDEN_PREFIX` so it's not transferred, shells
+        that list the namespace leave it out"""
+
+        self.user_ns[name] = value
+
     def execute(
         self, code: Union[str, ast.Module, CodeType], *, filename="<input>"
     ):
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Saving namespace of a session to disk so it can be restored later without
+running all of the cells again
+
+Sympy expressions are rebuilt without being evaluated again, which is what
+makes loading them slow, and large out-of-band buffers of pickle protocol 5
+(like numpy arrays) are written to a side file which is memory mapped on load"""
+
+import io
+import mmap
+import os
+import pickle
+
+from contextlib import contextmanager
+from pathlib import Path
+from types import ModuleType
+from typing import Any, BinaryIO, Iterator, List, NamedTuple, Optional, Tuple
+
+from . import __version__, namespace
+from .namespace import NamespaceDiff
+
+FORMAT = 1
+
+# buffers at least this big are written to the side file
+LARGE_BUFFER = 64 * 1024
+
+# offsets of buffers in the side file are aligned to this
+_ALIGNMENT = 64
+
+
+class SnapshotInfo(NamedTuple):
+    # names that were saved or loaded
+    names: List[str]
+
+    # names that could not be saved
+    skipped: List[str]
+
+
+def buffers_path(path: Path) -> Path:
+    """Side file with large buffers of snapshot `path`"""
+
+    return path.with_name(path.name + ".buffers")
+
+
+def _from_args(cls, args: Tuple, is_commutative: Optional[bool]):
+    return cls._from_args(args, is_commutative)
+
+
+def _unevaluated(cls, args: Tuple):
+    # NOTE: the global `evaluate(False)` clears the cache each time it changes
+    return cls(*args, evaluate=False)
+
+
+def _basic(cls, args: Tuple):
+    # NOTE: constructors of functions check the number of arguments which is
+    # slow, they were already checked when the function was created
+    from sympy import Basic
+
+    return Basic.__new__(cls, *args)
+
+
+class _Pickler(pickle.Pickler):
+    """Pickles sympy expressions so they are rebuilt from their arguments
+    without being evaluated again"""
+
+    def __init__(self, file, buffer_callback=None):
+        super().__init__(file, protocol=5, buffer_callback=buffer_callback)
+
+        from sympy import Add, Mul, Pow
+        from sympy.core.function import Application, AppliedUndef
+
+        self._assoc = (Add, Mul)
+        self._pow = Pow
+        self._application = Application
+        self._undefined = AppliedUndef
+
+    def reducer_override(self, obj):
+        cls = type(obj)
+
+        # NOTE: exact types only, subclasses may need more than the arguments
+        if cls in self._assoc:
+            return _from_args, (cls, obj.args, obj.is_commutative)
+
+        if cls is self._pow:
+            return _unevaluated, (cls, obj.args)
+
+        # functions defined by the user may have their own constructor
+        if isinstance(obj, self._application) and (
+            isinstance(obj, self._undefined)
+            or (cls.__module__ or "").startswith("sympy.")
+        ):
+            return _basic, (cls, obj.args)
+
+        return NotImplemented
+
+
+def _dumps(value: Any, buffer_callback=None) -> bytes:
+    file = io.BytesIO()
+    _Pickler(file, buffer_callback).dump(value)
+
+    return file.getvalue()
+
+
+def _picklable(value: Any) -> bool:
+    try:
+        _dumps(value, lambda buffer: False)
+    except Exception:
+        return False
+
+    return True
+
+
+class Pickled(NamedTuple):
+    """Changes pickled by `dumps` which are not affected by changes to the
+    values made after"""
+
+    data: bytes
+
+    # large buffers that go to the side file
+    buffers: List[bytes]
+
+    info: SnapshotInfo
+
+
+def dumps(
+    changes: NamespaceDiff, *, large_buffer: int = LARGE_BUFFER
+) -> Pickled:
+    """Pickles the changes of a namespace so they can be written by `write`,
+    values that cannot be pickled are skipped"""
+
+    changed = {}
+    skipped = list(changes.skipped)
+    for k, v in changes.changed.items():
+        if isinstance(v, ModuleType):
+            v = namespace.ModuleRef(v.__name__)
+
+        changed[k] = v
+
+    state = (changed, list(changes.deleted))
+    buffers: List[pickle.PickleBuffer] = []
+
+    def buffer_callback(buffer: pickle.PickleBuffer) -> bool:
+        if buffer.raw().nbytes < large_buffer:
+            return True
+
+        buffers.append(buffer)
+        return False
+
+    try:
+        data = _dumps(state, buffer_callback)
+    except Exception:
+        # NOTE: checking each value is slow so it's done only if needed
+        for k in [k for k, v in changed.items() if not _picklable(v)]:
+            del changed[k]
+            skipped.append(k)
+
+        buffers.clear()
+        data = _dumps(state, buffer_callback)
+
+    return Pickled(
+        data,
+        [bytes(i.raw()) for i in buffers],
+        SnapshotInfo(list(changed), skipped),
+    )
+
+
+def write(path: Path, pickled: Pickled):
+    """Writes changes pickled by `dumps` to `path`, the files are replaced
+    atomically"""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    side = buffers_path(path)
+    offsets = []
+    if pickled.buffers:
+        with _atomic(side) as file:
+            for buffer in pickled.buffers:
+                file.write(b"\0" * (-file.tell() % _ALIGNMENT))
+                offsets.append((file.tell(), len(buffer)))
+                file.write(buffer)
+    else:
+        try:
+            side.unlink()
+        except FileNotFoundError:
+            pass
+
+    header = {"format": FORMAT, "version": __version__, "buffers": offsets}
+
+    with _atomic(path) as file:
+        pickle.dump(header, file, protocol=pickle.HIGHEST_PROTOCOL)
+        file.write(pickled.data)
+
+
+def save(
+    path: Path, changes: NamespaceDiff, *, large_buffer: int = LARGE_BUFFER
+) -> SnapshotInfo:
+    """Saves the changes of a namespace to `path`, values that cannot be
+    pickled are skipped
+
+    The files are replaced atomically"""
+
+    pickled = dumps(changes, large_buffer=large_buffer)
+    write(path, pickled)
+
+    return pickled.info
+
+
+def load(path: Path) -> NamespaceDiff:
+    """Loads changes saved by `save`, raises `ValueError` if the file is not
+    compatible"""
+
+    with open(path, "rb") as file:
+        header = pickle.load(file)
+        if not isinstance(header, dict) or header.get("format") != FORMAT:
+            raise ValueError(f"{path} is not a session snapshot")
+
+        data = file.read()
+
+    buffers = []
+    if header["buffers"]:
+        with open(buffers_path(path), "rb") as file:
+            # NOTE: copy on write so loaded arrays can still be modified
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+
+        view = memoryview(mapped)
+        buffers = [view[i : i + size] for i, size in header["buffers"]]
+
+    changed, deleted = pickle.loads(data, buffers=buffers)
+
+    return NamespaceDiff(changed, deleted)
+
+
+@contextmanager
+def _atomic(path: Path) -> Iterator[BinaryIO]:
+    """Writes to a temporary file which replaces `path` once done"""
+
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+    try:
+        with open(tmp, "wb") as file:
+            yield file
+
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+
+        raise
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Evaluation of expressions over a grid of values"""
+
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, product
+from math import ceil, prod
+from typing import Any, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from .numeric import HAS_NUMPY, numeric, plain
+from .parallel import cpu_count, submit_ordered
+
+
+def _evaluate(expr, args: Tuple, columns: Sequence[Sequence]) -> List[Any]:
+    """Evaluates expression for each row of `columns`"""
+
+    size = len(columns[0]) if columns else 1
+
+    try:
+        fn = numeric(expr, *args)
+    except Exception:
+        # NOTE: not everything can be lambdified, slow but it always works
+        return [expr.subs(dict(zip(args, row))) for row in zip(*columns)]
+
+    if HAS_NUMPY:
+        import numpy
+
+        columns = [numpy.asarray(i) for i in columns]
+
+    result = fn(*columns)
+
+    if hasattr(result, "tolist"):
+        result = result.tolist()
+
+    # constant expressions are not broadcast
+    if not isinstance(result, list):
+        result = [result] * size
+
+    return result
+
+
+def table(
+    expr,
+    /,
+    *,
+    chunksize: int = 10000,
+    workers: Optional[int] = None,
+    **axes,
+) -> Iterator[Tuple[Any, ...]]:
+    """Evaluates `expr` for every combination of values of `axes`, which map
+    symbol names to iterables of values, yields rows of the values followed
+    by the result
+
+    Rows are generated lazily and evaluated in chunks of `chunksize` using
+    `numeric`, grids with more than one chunk are evaluated in parallel by
+    `workers` processes (default: number of CPUs)
+
+    >>> list(table(x * y, x=range(2), y=[1, 2]))
+    [(0, 1, 0), (0, 2, 0), (1, 1, 1), (1, 2, 2)]"""
+
+    from sympy import Symbol, sympify
+
+    expr = sympify(expr)
+
+    # NOTE: matched by name so symbols with assumptions work too
+    free = {i.name: i for i in expr.free_symbols}
+    args = tuple(free.get(i, Symbol(i)) for i in axes)
+
+    missing = set(free) - set(axes)
+    if missing:
+        raise ValueError(f"no values given for {', '.join(sorted(missing))}")
+
+    values = [[plain(j) for j in i] for i in axes.values()]
+
+    rows = product(*values)
+    chunks = iter(lambda: list(islice(rows, chunksize)), [])
+
+    total = prod(len(i) for i in values)
+    if workers is None:
+        workers = cpu_count()
+
+    workers = min(workers, ceil(total / chunksize))
+
+    if workers <= 1:
+        for chunk in chunks:
+            result = _evaluate(expr, args, list(zip(*chunk)))
+            for row, value in zip(chunk, result):
+                yield (*row, value)
+
+        return
+
+    items = ((expr, args, list(zip(*chunk))) for chunk in chunks)
+    with ProcessPoolExecutor(workers) as executor:
+        for (_, _, columns), future in submit_ordered(
+            executor, _evaluate, items, window=2 * workers
+        ):
+            for row, value in zip(zip(*columns), future.result()):
+                yield (*row, value)
+
+
+def _format(value: Any) -> str:
+    if isinstance(value, float):
+        return format(value, ".10g")
+
+    return str(value)
+
+
+def print_table(expr, /, *, file: Optional[TextIO] = None, **kwargs):
+    """Prints `table` with a header, rows are printed as they are evaluated"""
+
+    file = file or sys.stdout
+
+    names = [i for i in kwargs if i not in ("chunksize", "workers")]
+    header = [*names, str(expr)]
+    widths = [max(12, len(i)) for i in header]
+
+    print(" ".join(f"{i:>{w}}" for i, w in zip(header, widths)), file=file)
+
+    for row in table(expr, **kwargs):
+        print(
+            " ".join(f"{_format(i):>{w}}" for i, w in zip(row, widths)),
+            file=file,
+        )
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _isolated_user_dirs(tmp_path, monkeypatch):
+    """Keeps tests from reading user init scripts or writing to user cache and data"""
+
+    monkeypatch.setenv("ABACUS_CONFIG_DIR", "")
+    monkeypatch.setenv("ABACUS_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("ABACUS_DATA_DIR", str(tmp_path / "data"))
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import signal
+
+from io import StringIO
+
+import pytest
+
+from ..batch import evaluate_batch, evaluate_file
+
+
+def test_evaluate_batch():
+    """Tests if results are returned in order with errors per unit"""
+
+    UNITS = [(i + 1, f"{i} * x") for i in range(20)]
+    UNITS.insert(5, (100, "1 +"))
+
+    results = list(evaluate_batch(UNITS, workers=2))
+
+    assert [i.lineno for i in results] == [i for i, _ in UNITS]
+    assert results[5].error is not None
+    assert [str(i.value) for i in results[6:8]] == ["5*x", "6*x"]
+
+
+def test_evaluate_file_syntax_error():
+    results = list(evaluate_file(StringIO("1+1\nf(\n2+2\n"), workers=1))
+
+    assert [i.lineno for i in results] == [1, 2, 3]
+    assert "SyntaxError" in results[1].error
+    assert [results[0].value, results[2].value] == [2, 4]
+
+
+@pytest.mark.skipif(
+    not hasattr(signal, "setitimer"), reason="timeouts need POSIX"
+)
+def test_evaluate_file_timeout():
+    FILE = "1 + 1\nwhile True:\n    pass\n2 + 2\n"
+
+    results = list(evaluate_file(StringIO(FILE), workers=1, timeout=0.5))
+
+    assert [i.lineno for i in results] == [1, 2, 4]
+    assert results[1].error is not None and "Timeout" in results[1].error
+    assert [results[0].value, results[2].value] == [2, 4]
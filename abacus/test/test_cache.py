@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from ..basic_shell.basic_shell import BasicShell
+from ..cache import CacheEntry, CodeCache
+
+
+def _entry(deps=()) -> CacheEntry:
+    return CacheEntry(
+        deps=deps, symbols=(), integers=(), stmt=None, module=None
+    )
+
+
+def test_code_cache_lru():
+    cache = CodeCache(maxsize=2)
+
+    cache.put("a", _entry())
+    cache.put("b", _entry())
+    assert cache.get("a", lambda deps: True) is not None
+
+    # "b" is least recently used so it gets evicted
+    cache.put("c", _entry())
+    assert len(cache) == 2
+    assert cache.get("b", lambda deps: True) is None
+    assert cache.get("c", lambda deps: True) is not None
+
+    # invalid entries are not returned
+    assert cache.get("a", lambda deps: False) is None
+
+    assert cache.stats() == {"hits": 2, "misses": 2, "size": 2, "maxsize": 2}
+
+
+def test_shell_cache_invalidation(capsys):
+    """Tests if cached cell is recompiled when a name it calls changes from
+    callable to non-callable"""
+
+    shell = BasicShell()
+    shell.code_cache.clear()
+
+    shell.run("f(x + 1)")
+    shell.run("f(x + 1)")
+    assert shell.code_cache.hits == 1
+
+    shell.run("f = lambda t: 2 * t")
+    shell.run("f(x + 1)")
+    assert shell.code_cache.hits == 1
+
+    shell.run("f(x + 1)")
+    assert shell.code_cache.hits == 2
+
+    output = capsys.readouterr().out.splitlines()
+    assert output == ["f*(x + 1)", "f*(x + 1)", "2*x + 2", "2*x + 2"]
+
+    # auto created symbols are cleaned up even when the cell was cached
+    assert "x" not in shell.user_ns
+
+
+def test_disk_cache(tmp_path, monkeypatch, capsys):
+    config = tmp_path / "config"
+    (config / "startup").mkdir(parents=True)
+    (config / "init.py").write_text("a = 2x\n")
+    (config / "startup" / "10-b.py").write_text("b = a + 1\n")
+    monkeypatch.setenv("ABACUS_CONFIG_DIR", str(config))
+
+    shell = BasicShell()
+    assert shell.disk_cache.misses == 3
+    assert shell.disk_cache.hits == 0
+
+    # everything is loaded from the cache on next startup
+    shell = BasicShell()
+    assert shell.disk_cache.misses == 0
+    assert shell.disk_cache.hits == 3
+
+    shell.run("b")
+    assert capsys.readouterr().out == "2*x + 1\n"
+    assert "x" not in shell.user_ns
+
+    # changed script is compiled again
+    (config / "init.py").write_text("a = 3x\n")
+    shell = BasicShell()
+    assert shell.disk_cache.misses == 1
+    assert shell.disk_cache.hits == 2
+
+    shell.run("b")
+    assert capsys.readouterr().out == "3*x + 1\n"
+
+    # broken cache file is just a miss
+    path = shell.disk_cache.path(str(config / "init.py"))
+    path.write_bytes(b"garbage")
+    shell = BasicShell()
+    assert shell.disk_cache.misses == 1
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import json
+
+from io import StringIO
+
+from ..cli import main_cli, wants_cli
+
+
+class _Stdin(StringIO):
+    def __init__(self, value="", tty=False):
+        super().__init__(value)
+        self.tty = tty
+
+    def isatty(self):
+        return self.tty
+
+
+def test_wants_cli():
+    assert wants_cli(["-e", "1"])
+    assert wants_cli(["--file=x.txt"])
+    assert not wants_cli(["--no-banner"])
+    assert wants_cli(["-u"])
+    assert wants_cli(["--unbuffered"])
+
+    # piped input
+    assert wants_cli([], _Stdin())
+    assert not wants_cli([], _Stdin(tty=True))
+
+
+def test_cli_stdin(tmp_path):
+    stdin = _Stdin("a = 2\n2a\n\n# comment\nf(x)\n{}[1]\na**10\n")
+    stdout = StringIO()
+
+    assert main_cli([], stdin=stdin, stdout=stdout) == 1
+    assert stdout.getvalue().splitlines() == [
+        "",
+        "4",
+        "f*x",
+        "Error (line 6): KeyError: 1",
+        "1024",
+    ]
+
+    # inputs are evaluated in the order they are given
+    path = tmp_path / "input.txt"
+    path.write_text("b = a + 1\n")
+    stdout = StringIO()
+
+    argv = ["-e", "a = 1", "-f", str(path), "--eval", "b"]
+    assert main_cli(argv, stdin=_Stdin(), stdout=stdout) == 0
+    assert stdout.getvalue() == "\n\n2\n"
+
+
+def test_cli_syntax_error():
+    """Unclosed bracket is an error of its line only"""
+
+    stdout = StringIO()
+
+    assert main_cli([], stdin=_Stdin("1+1\nf(\n2+2\n3+3\n"), stdout=stdout) == 1
+    assert stdout.getvalue().splitlines() == [
+        "2",
+        "Error (line 2): SyntaxError: EOF in multi-line statement",
+        "4",
+        "6",
+    ]
+
+
+def test_cli_json():
+    stdout = StringIO()
+
+    assert main_cli(["--json", "-e", "x + x"], stdout=stdout) == 0
+
+    result = json.loads(stdout.getvalue())
+    assert result == {
+        "line": 1,
+        "input": "x + x",
+        "result": "2*x",
+        "error": None,
+    }
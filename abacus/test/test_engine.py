@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import sys
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import sympy
+
+from ..engine import Engine
+
+
+def test_engine_values(capsys):
+    hook = sys.displayhook
+
+    engine = Engine()
+    assert sys.displayhook is hook, "Engine changed the displayhook"
+
+    x = sympy.Symbol("x")
+
+    assert engine.run("2x + 3x") == 5 * x
+    assert engine.run("a = 2") is None
+    assert engine.run("b = a + 1\nb**2") == 9
+    assert engine.evaluate_many(["a", "b"]) == [2, 3]
+
+    # nothing is printed
+    assert capsys.readouterr().out == ""
+
+    # auto symbols are not left in the namespace
+    assert "x" not in engine.user_ns
+
+
+def test_engine_errors():
+    engine = Engine()
+
+    with pytest.raises(KeyError):
+        engine.run('{}["key"]')
+
+    results = engine.evaluate_many(['{}["key"]', "1"], return_exceptions=True)
+    assert isinstance(results[0], KeyError)
+    assert results[1] == 1
+
+
+def test_engine_sessions():
+    engine = Engine()
+    engine.run("a = 1")
+
+    first = engine.session()
+    second = engine.session()
+
+    first.run("a = 10")
+    second.run("f = 2x")
+    assert first.run("a + 1") == 11
+    assert second.run("a + 1") == 2
+    assert engine.run("a") == 1
+
+    assert "f" not in first.user_ns
+    assert "f" not in engine.user_ns
+
+    # auto symbols are removed from the namespace of the session
+    assert "x" not in second.user_ns
+
+
+def test_engine_sessions_threads():
+    engine = Engine()
+    x = sympy.Symbol("x")
+
+    def work(i: int):
+        session = engine.session()
+        session.run(f"n = {i}")
+
+        return [session.run("n x + y - y") for _ in range(50)]
+
+    with ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(work, range(8)))
+
+    for i, values in enumerate(results):
+        assert values == [i * x] * 50
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import pytest
+
+from .. import journal
+from ..timeout import can_fork
+from ..transformer import integer_name
+
+pytest.importorskip("IPython")
+
+needs_fork = pytest.mark.skipif(not can_fork(), reason="requires fork")
+
+
+@pytest.fixture
+def shell(tmp_path, monkeypatch):
+    from IPython.terminal.interactiveshell import TerminalInteractiveShell
+    from traitlets.config import Config
+
+    from ..ipython_shell.ipython_shell import IPythonShell
+
+    monkeypatch.setenv("IPYTHONDIR", str(tmp_path / "ipython"))
+
+    config = Config()
+    config.HistoryManager.hist_file = ":memory:"
+
+    ipy = TerminalInteractiveShell.instance(config=config)
+    try:
+        yield IPythonShell(ipy)
+    finally:
+        TerminalInteractiveShell.clear_instance()
+
+
+@needs_fork
+def test_timeout(shell, capsys):
+    ipy = shell.ipython
+    ipy.run_cell("f = lambda: 1")
+
+    ipy.run_cell("%timeout 5")
+    assert shell.timeout == 5
+
+    # magics change the shell so they are not ran in another process
+    ipy.run_cell("%abacus_memo on")
+    assert shell.memo is not None
+
+    result = ipy.run_cell("a = 2x\na + 1", store_history=True)
+    assert str(result.result) == "2*x + 1"
+    assert ipy.user_ns["Out"][result.execution_count] is result.result
+    assert ipy.user_ns[f"_{result.execution_count}"] is result.result
+    assert str(ipy.user_ns["a"]) == "2*x"
+
+    # names of the history are not sent back, the function is not picklable
+    ipy.run_cell("f", store_history=True)
+    ipy.run_cell("a", store_history=True)
+    assert "Warning" not in capsys.readouterr().err
+
+    ipy.run_cell("%%timeout 0.2\nimport time\ntime.sleep(10)")
+    assert "EvaluationTimeout" in capsys.readouterr().err
+
+    ipy.run_cell("%timeout off")
+    assert shell.timeout is None
+
+
+def test_jobs(shell, capsys):
+    ipy = shell.ipython
+
+    ipy.run_cell("%bg b = 3x")
+    ipy.run_cell("%jobs wait")
+    assert str(ipy.user_ns["b"]) == "3*x"
+
+    ipy.run_cell("%bg 2 + 3")
+    ipy.run_cell("%jobs wait 2")
+    assert ipy.user_ns["_bg2"] == 5
+    assert ipy.run_cell("%jobs 2").result == 5
+
+    # finished jobs are merged before the next cell
+    job = ipy.run_cell("%bg c = 7").result
+    job.wait()
+    ipy.run_cell("d = c + 1")
+    assert ipy.user_ns["d"] == 8
+
+    capsys.readouterr()
+    ipy.run_cell("%jobs")
+    assert capsys.readouterr().out.count("done") == 3
+
+    ipy.run_cell("%jobs 9")
+    assert "Unknown argument" in capsys.readouterr().out
+
+
+def test_journal(shell, tmp_path, capsys):
+    ipy = shell.ipython
+    path = tmp_path / "journal"
+
+    ipy.run_cell(f"%journal on {path}")
+    ipy.run_cell("j = 7")
+    ipy.run_cell("k = j + 2x")
+
+    capsys.readouterr()
+    ipy.run_cell("%journal")
+    assert "(2 cells)" in capsys.readouterr().out
+
+    ipy.run_cell("%journal checkpoint")
+    ipy.run_cell("%journal off")
+    assert shell.journal is None
+
+    # cells are journaled with their transformed source
+    checkpoint, cells = journal.last_session(path)
+    assert checkpoint.index == 3
+    assert [i.source for i in journal.read(path) if hasattr(i, "source")] == [
+        "j = 7",
+        "k = j + 2x",
+        "%journal",
+        "%journal checkpoint",
+    ]
+    assert list(journal.read(path))[2].transformed == "k = j + 2 *x\n"
+
+    ipy.run_cell("del j, k")
+    ipy.run_cell(f"%journal replay {path}")
+    # only the cell after the checkpoint is ran
+    assert "Replayed 1 cells" in capsys.readouterr().out
+    assert str(ipy.user_ns["k"]) == "2*x + 7"
+
+    # journaling continues after the replay
+    assert shell.journal is not None
+    shell.stop_journal()
+
+
+def test_reactive(shell, capsys):
+    ipy = shell.ipython
+
+    ipy.run_cell("%reactive on")
+    ipy.run_cell("a = 1")
+    ipy.run_cell("t = a + 1")
+    ipy.run_cell("u = 2t")
+
+    # cells using the changed names are ran again after the cell
+    ipy.run_cell("a = 5")
+    assert ipy.user_ns["t"] == 6
+    assert ipy.user_ns["u"] == 12
+
+    capsys.readouterr()
+    ipy.run_cell("%reactive")
+    assert "t = a + 1  <- a" in capsys.readouterr().out
+
+    ipy.run_cell("%reactive off")
+    assert shell.reactive is None
+
+    ipy.run_cell("a = 10")
+    assert ipy.user_ns["t"] == 6
+
+
+def test_profile(shell, capsys):
+    ipy = shell.ipython
+
+    ipy.run_cell("%abacus_profile on")
+    ipy.run_cell("2x + 1")
+    stats = ipy.run_cell("%abacus_profile dict").result
+
+    # stages of IPython are timed and the whole cell using its events
+    timers = stats["timers"]
+    for stage in ("run_cell", "transform_cell", "parse", "ast_transform"):
+        assert timers[stage]["count"] >= 1, stage
+
+    assert timers["display"]["count"] == 1
+    assert stats["counters"]["cells"] == 2
+
+    capsys.readouterr()
+    ipy.run_cell("%abacus_profile")
+    assert "run_cell" in capsys.readouterr().out
+
+    ipy.run_cell("%abacus_profile off")
+    ipy.run_cell("%abacus_profile reset")
+    ipy.run_cell("2x + 1")
+    assert ipy.run_cell("%abacus_profile dict").result == {
+        "timers": {},
+        "counters": {},
+    }
+
+
+def test_hidden_names(shell, capsys):
+    ipy = shell.ipython
+
+    ipy.run_cell("n = 2x")
+    assert integer_name(2) in ipy.user_ns_hidden
+
+    capsys.readouterr()
+    ipy.run_cell("%who")
+    names = capsys.readouterr().out.split()
+    assert "n" in names
+    assert integer_name(2) not in names
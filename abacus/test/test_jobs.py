@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import threading
+
+from ..basic_shell.basic_shell import BasicShell
+
+
+def test_background_job(capsys):
+    shell = BasicShell()
+    shell.run("a = 1\nb = 2")
+
+    started = threading.Event()
+    shell.push({"started": started, "release": threading.Event()})
+
+    job = shell.run_background(
+        "started.set()\nrelease.wait()\na = 5\nb = 7\ny = 2x\ny**2"
+    )
+    started.wait()
+    assert job.status == "running"
+    assert shell.jobs.running() == [job]
+
+    # nothing is merged until the job is done
+    shell.check_jobs()
+    assert shell.user_ns["a"] == 1
+
+    shell.run("b = 3")
+    shell.user_ns["release"].set()
+    assert job.wait(5)
+
+    shell.check_jobs()
+    ns = shell.user_ns
+    assert ns["a"] == 5
+    assert str(ns["y"]) == "2*x"
+    assert str(ns[job.name]) == "4*x**2"
+
+    # changed by the shell while the job was running
+    assert ns["b"] == 3
+    assert job.conflicts == ["b"]
+
+    out = capsys.readouterr().out
+    assert "[1] done" in out
+    assert "not merged" in out
+
+    # each job is merged only once
+    shell.run("a = 10")
+    shell.check_jobs()
+    assert ns["a"] == 10
+
+
+def test_background_job_error(capsys):
+    shell = BasicShell()
+
+    job = shell.run_background('c = 1\n{}["missing"]')
+    job.wait(5)
+    shell.check_jobs()
+
+    assert job.status == "failed"
+    assert isinstance(job.error, KeyError)
+    assert "KeyError" in capsys.readouterr().out
+
+    # changes made before the error are kept
+    assert shell.user_ns["c"] == 1
+    assert job.name not in shell.user_ns
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from .. import journal, snapshot
+from ..basic_shell.basic_shell import BasicShell
+from ..namespace import NamespaceDiff
+
+
+def test_journal_replay(tmp_path):
+    path = tmp_path / "journal"
+
+    shell = BasicShell()
+    shell.start_journal(path)
+    shell.journal.result_threshold = 0
+    shell.journal.checkpoint_interval = 2
+
+    shell.run("a = 2x")
+    shell.run("b = a + 1")
+    shell.run("c = [b]")
+    shell.run("fn = lambda: c")
+    shell.run("d = b**2")
+    shell.stop_journal()
+
+    records = list(journal.read(path))
+    assert isinstance(records[0], journal.Start)
+    assert records[1].transformed == "a = 2 *x"
+    assert [type(i).__name__ for i in records[1:]] == [
+        "Cell",
+        "Cell",
+        "Checkpoint",
+        "Cell",
+        "Cell",
+        "Cell",
+    ]
+
+    # checkpoint after the lambda could not be saved so cells after the first
+    # checkpoint are replayed, only the lambda is ran again
+    restored = BasicShell()
+    assert restored.replay_journal(path) == (1, 2)
+    assert restored.user_ns["d"] == shell.user_ns["d"]
+    assert restored.user_ns["fn"]() == [shell.user_ns["b"]]
+
+    # journaling continues the same session
+    restored.run("e = d")
+    restored.stop_journal()
+
+    checkpoint, cells = journal.last_session(path)
+    assert checkpoint.index == 2
+    assert [i.index for i in cells] == [2, 3, 4, 5]
+
+
+def test_journal_truncated(tmp_path):
+    path = tmp_path / "journal"
+
+    shell = BasicShell()
+    shell.start_journal(path)
+    shell.run("a = 1")
+    shell.run("b = 2")
+    shell.journal.flush()
+
+    # crash in the middle of writing a record
+    with open(path, "ab") as file:
+        file.write(b"\xa9\x03")
+
+    shell.stop_journal()
+
+    assert [i.source for i in journal.last_session(path)[1]] == [
+        "a = 1",
+        "b = 2",
+    ]
+
+    # new session does not replay the old one
+    shell.start_journal(path)
+    shell.stop_journal()
+    assert journal.last_session(path) == (None, [])
+
+
+def test_journal_checkpoint_copy(tmp_path):
+    path = tmp_path / "journal"
+
+    # NOTE: the writer waits for more records, so the list is changed before
+    # the checkpoint is written
+    log = journal.Journal(path, flush_interval=10)
+    values = [1]
+    log.checkpoint(NamespaceDiff({"values": values}, []))
+    values.append(2)
+    log.close()
+
+    checkpoint, _ = journal.last_session(path)
+    saved = snapshot.load(path.parent / checkpoint.name)
+    assert saved.changed == {"values": [1]}
+
+
+def test_journal_checkpoint_results(tmp_path):
+    path = tmp_path / "journal"
+
+    # all records are written in a single batch
+    log = journal.Journal(path, flush_interval=10)
+    log.append("a = 1", None, 1, NamespaceDiff({"a": 1}, []))
+    log.checkpoint(NamespaceDiff({"a": 1}, []))
+    log.append("b = 2", None, 1, NamespaceDiff({"b": 2}, []))
+    log.close()
+
+    # only the result of the cell before the checkpoint is obsolete
+    _, cells = journal.last_session(path)
+    assert [i.source for i in cells] == ["b = 2"]
+    assert [i.name for i in journal.results_dir(path).iterdir()] == [
+        f"{cells[0].key}.pickle"
+    ]
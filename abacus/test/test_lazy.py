@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import fractions
+import subprocess
+import sys
+
+import sympy
+
+from ..basic_shell.basic_shell import BasicShell
+from ..lazy import LazyModule, LazyObject, unproxy
+
+
+def test_lazy_module():
+    loaded = []
+
+    module = LazyModule("fractions")
+    module.on_load(loaded.append)
+    obj = LazyObject(module, "Fraction")
+
+    assert not module.loaded
+    assert repr(obj) == "<lazy fractions.Fraction>"
+
+    assert obj(1, 2) == fractions.Fraction(1, 2)
+    assert module.loaded
+    assert loaded == [fractions]
+    assert module.Fraction is fractions.Fraction
+    assert unproxy(obj) is fractions.Fraction
+
+    # called right away once loaded
+    module.on_load(loaded.append)
+    assert loaded == [fractions, fractions]
+
+
+def test_lazy_shell():
+    shell = BasicShell(lazy=True)
+    shell.run("y = 2x")
+
+    # proxies are replaced once sympy is imported
+    assert shell.user_ns["sympy"] is sympy
+    assert shell.user_ns["solve"] is sympy.solve
+    assert shell.user_ns["this"] == sympy.Symbol("cool")
+    assert shell.user_ns["y"] == 2 * sympy.Symbol("x")
+
+
+def test_lazy_startup():
+    # NOTE: ran in another process as sympy is already imported here
+    code = (
+        "import sys\n"
+        "from abacus.basic_shell.basic_shell import BasicShell\n"
+        "shell = BasicShell(lazy=True)\n"
+        "shell.run('a = 1.5')\n"
+        "assert 'sympy' not in sys.modules\n"
+        "shell.run('b = 2a')\n"
+        "assert 'sympy' in sys.modules\n"
+    )
+
+    subprocess.run([sys.executable, "-c", code], check=True)
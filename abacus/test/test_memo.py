@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import atexit
+
+import sympy
+
+from ..basic_shell.basic_shell import BasicShell
+from ..memo import Memo
+from ..paths import cache_dir
+
+
+def test_memo_lru():
+    memo = Memo(maxsize=1000)
+    calls = []
+
+    def fn(expr):
+        calls.append(expr)
+        return [expr]
+
+    wrapped = memo.wrap(fn)
+    x = sympy.Symbol("x")
+
+    assert wrapped(x) == [x]
+    assert wrapped(sympy.Symbol("x")) == [x]
+    assert calls == [x]
+    assert memo.stats()["hits"] == 1
+
+    # symbols with different assumptions are different keys
+    wrapped(sympy.Symbol("x", positive=True))
+    assert len(calls) == 2
+
+    # arguments without structural repr are not cached
+    wrapped(object())
+    wrapped(object())
+    assert len(calls) == 4
+    assert len(memo) == 2
+
+    # oldest entries are evicted once the size is over the limit
+    for i in range(100):
+        wrapped(sympy.Integer(i))
+
+    assert memo.size <= memo.maxsize
+    assert len(memo) < 100
+
+    assert wrapped(x) == [x]
+    assert calls[-1] == x
+
+
+def test_memo_shell(tmp_path):
+    shell = BasicShell()
+    shell.enable_memo()
+
+    shell.run("r = solve(x**2 - 4, x)")
+    shell.run("r = solve(x**2 - 4, x)")
+    assert shell.user_ns["r"] == [-2, 2]
+    assert shell.memo.stats()["hits"] == 1
+
+    # changing the result does not change the cached one
+    shell.run("r.append(3)")
+    shell.run("r = solve(x**2 - 4, x)")
+    assert shell.user_ns["r"] == [-2, 2]
+
+    # replacing the function forgets its results
+    shell.run("solve = lambda *args: 'mine'")
+    assert shell.memo.stats()["entries"] == 0
+
+    shell.run("r = simplify(sympy.sin(x)**2 + sympy.cos(x)**2)")
+    assert shell.user_ns["r"] == 1
+
+    shell.disable_memo()
+    assert shell.user_ns["simplify"] is sympy.simplify
+    assert shell.user_ns["solve"]() == "mine"
+
+
+def test_memo_persist(tmp_path, monkeypatch):
+    path = tmp_path / "memo.pickle"
+
+    memo = Memo()
+    key = memo.key("f", (sympy.Symbol("x"),), {})
+    memo.put(key, "f", sympy.Symbol("y"))
+    memo.save(path)
+
+    memo = Memo()
+    memo.load(path)
+    assert memo.get(key) == sympy.Symbol("y")
+
+    shell = BasicShell()
+    handlers = []
+    monkeypatch.setattr(atexit, "register", handlers.append)
+
+    shell.enable_memo(persist=True)
+    shell.disable_memo()
+    shell.enable_memo(persist=True)
+    assert len(handlers) == 1
+
+    shell.run("r = solve(x**2 - 4, x)")
+    handlers[0]()
+
+    memo = Memo()
+    memo.load(cache_dir() / "memo.pickle")
+    assert len(memo) == 1
+
+    # broken file is ignored
+    path.write_bytes(b"garbage")
+    Memo().load(path)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import math
+
+import pytest
+import sympy
+
+from ..engine import Engine
+from ..numeric import elementwise, numeric
+
+
+def test_numeric_fallback():
+    x, y = sympy.symbols("x y")
+
+    f = numeric(x**2 + y, x, y, vectorized=False)
+    assert f(2, 3) == 7
+    assert f([1, 2, 3], 1) == [2, 5, 10]
+
+    # memoized per expression and argument order
+    assert numeric(x**2 + y, x, y, vectorized=False) is f
+    assert numeric(x**2 + y, y, x, vectorized=False) is not f
+
+    # free symbols sorted by name by default
+    g = numeric(y - x, vectorized=False)
+    assert g(1, 3) == 2
+
+    # mpmath is used only when needed
+    assert isinstance(numeric(x / 2, vectorized=False)(1), float)
+
+    # function missing from math is taken from mpmath
+    h = numeric(sympy.besselj(0, x), vectorized=False)
+    assert float(h(0)) == pytest.approx(1.0)
+
+    with pytest.raises(ValueError):
+        elementwise(lambda a, b: a + b)([1, 2], [1, 2, 3])
+
+
+def test_numeric_numpy():
+    numpy = pytest.importorskip("numpy")
+
+    x = sympy.Symbol("x")
+    f = numeric(sympy.sin(x) * x, vectorized=True)
+
+    points = numpy.linspace(0, 1, 11)
+    assert numpy.allclose(f(points), numpy.sin(points) * points)
+
+
+def test_numeric_namespace():
+    engine = Engine()
+
+    engine.run("f = numeric(x**2 + 1, 'x', vectorized=False)")
+    assert engine.run("f([1, 2])") == [2, 5]
+
+    # int literals are sympy integers, numpy is used if it's installed
+    engine.run("g = numeric(sympy.sin(x))")
+    assert list(engine.run("g([0, 1])")) == pytest.approx([0, math.sin(1)])
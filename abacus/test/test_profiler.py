@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from io import StringIO
+
+from ..profiler import Profiler
+
+
+def test_profiler_disabled():
+    """Tests if disabled profiler does not record anything"""
+
+    profiler = Profiler()
+
+    with profiler.stage("x"):
+        pass
+
+    profiler.count("y")
+    profiler.wrap("z", lambda: None)()
+
+    assert profiler.as_dict() == {"timers": {}, "counters": {}}
+
+
+def test_profiler_stages():
+    profiler = Profiler(enabled=True)
+
+    for _ in range(3):
+        with profiler.stage("x"):
+            pass
+
+    fn = profiler.wrap("y", lambda a: a * 2)
+    assert fn(2) == 4, "Wrapped function result changed"
+
+    profiler.count("z")
+    profiler.count("z", 2)
+
+    data = profiler.as_dict()
+    assert data["timers"]["x"]["count"] == 3
+    assert data["timers"]["y"]["count"] == 1
+    assert data["timers"]["x"]["min"] <= data["timers"]["x"]["max"]
+    assert data["counters"] == {"z": 3}
+
+    output = StringIO()
+    profiler.dump(output)
+    assert "x" in output.getvalue() and "z" in output.getvalue()
+
+    profiler.reset()
+    assert profiler.as_dict() == {"timers": {}, "counters": {}}
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import time
+
+import pytest
+import sympy
+
+from ..race import race, race_simplify, race_solve
+from ..timeout import EvaluationTimeout, can_fork
+
+pytestmark = pytest.mark.skipif(not can_fork(), reason="requires fork")
+
+x, y = sympy.symbols("x y")
+
+
+def test_race():
+    # the first acceptable result is used and the rest is not waited for
+    start = time.monotonic()
+    result = race(
+        {"slow": lambda: time.sleep(10), "fast": lambda: 1},
+        accept=lambda value: value == 1,
+    )
+    assert result.value == 1
+    assert result.strategy == "fast"
+    assert time.monotonic() - start < 5
+
+    # otherwise the best one is picked
+    result = race({"a": lambda: 3, "b": lambda: 2, "c": lambda: 5}, score=abs)
+    assert result == (2, "b", result.elapsed)
+
+    # failing strategies are ignored
+    result = race({"bad": lambda: 1 / 0, "good": lambda: 7})
+    assert result.value == 7
+
+    with pytest.raises(ZeroDivisionError):
+        race({"bad": lambda: 1 / 0})
+
+    with pytest.raises(EvaluationTimeout):
+        race({"slow": lambda: time.sleep(10)}, deadline=0.2)
+
+
+def test_race_simplify():
+    assert race_simplify(sympy.sin(x) ** 2 + sympy.cos(x) ** 2) == 1
+
+    result = race_simplify((x**2 - 1) / (x - 1))
+    assert result == x + 1
+
+    # nothing finished in time
+    expr = sympy.sin(x) ** 2 + sympy.cos(x) ** 2
+    slow = lambda expr: time.sleep(10)  # noqa: E731
+    assert race_simplify(expr, deadline=0.2, strategies=[slow]) is expr
+
+
+def test_race_solve():
+    assert sorted(race_solve(x**2 - 4, x)) == [-2, 2]
+    assert race_solve(sympy.Eq(x + y, 3), x) == [3 - y]
+
+    # exact result is preferred over numerical one
+    result = race_solve(x**3 - 2, x, strategies=["nsolve", "solve"])
+    assert not any(i.has(sympy.Float) for i in result)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import ast
+
+import sympy
+
+from ..basic_shell.basic_shell import BasicShell
+from ..reactive import DependencyGraph, cell_names
+
+
+def _names(source: str):
+    loads, stores = cell_names(ast.parse(source))
+
+    return sorted(loads), sorted(stores)
+
+
+def test_cell_names():
+    assert _names("b = a + 1") == (["a"], ["b"])
+    assert _names("a[0] = c") == (["a", "c"], ["a"])
+    assert _names("x += 1") == (["x"], ["x"])
+    assert _names("f = lambda t: t*a") == (["a"], ["f"])
+    assert _names("r = [i*w for i in range(n)]") == (["n", "range", "w"], ["r"])
+    assert _names("import os.path as p, sys\ndel z") == ([], ["p", "sys", "z"])
+
+    # names assigned before they are used are not dependencies
+    assert _names("t = a*2; u = t + 1") == (["a"], ["t", "u"])
+    assert _names("a = a + 1") == (["a"], ["a"])
+    assert _names("s = 0\nfor i in range(n):\n    s += i") == (
+        ["n", "range"],
+        ["i", "s"],
+    )
+
+    # names assigned in functions are local
+    assert _names("def g(u):\n    v = u*k\n    return v") == (["k"], ["g"])
+
+
+def test_graph_levels():
+    graph = DependencyGraph()
+
+    def add(source: str):
+        levels, cyclic = graph.add(source, *cell_names(ast.parse(source)))
+        return [[i.source for i in level] for level in levels], cyclic
+
+    add("a = 1")
+    add("b = a + 1")
+    add("c = a*2")
+    add("d = b + c")
+    add("e = 5")
+
+    assert add("a = 3") == ([["b = a + 1", "c = a*2"], ["d = b + c"]], [])
+
+    # `b` is now defined by the new cell
+    assert add("b = a + 2") == ([["d = b + c"]], [])
+    assert len(graph) == 5
+
+    # cells that modify what they load are not ran again
+    assert add("c += 1") == ([["d = b + c"]], [])
+    assert add("a = 4") == ([["b = a + 2"], ["d = b + c"]], [])
+
+
+def test_reactive_shell(capsys):
+    x, y = sympy.symbols("x y")
+
+    shell = BasicShell()
+    shell.enable_reactive()
+
+    for i in ["a = 2", "b = a*x + 1", "c = a**2", "d = b + c", "d", "a = 3"]:
+        shell.run(i)
+
+    assert shell.user_ns["d"] == 3 * x + 10
+    assert "x" not in shell.user_ns
+
+    # cells depending on a cell that failed are skipped
+    shell.run("b = a + {}['missing']")
+    shell.run("a = 4")
+    assert "KeyError" in capsys.readouterr().err
+    assert shell.user_ns["c"] == 16
+    assert shell.user_ns["d"] == 3 * x + 10
+
+    shell.run("b = a + y")
+    shell.run("a = 5")
+    assert shell.user_ns["d"] == y + 30
+
+    # cells with multiple statements and loops
+    shell.run("t = a*2; u = t + 1")
+    shell.run("s = 0\nfor i in range(a):\n    s += i")
+    shell.run("a = 10")
+    assert shell.user_ns["u"] == 21
+    assert shell.user_ns["s"] == 45
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import asyncio
+import socket
+
+from collections import OrderedDict
+
+import pytest
+
+from ..engine import Engine
+from ..server import Client, Server, _handle, serve
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="requires unix sockets"
+)
+
+
+def run_server(path: str, fn, **kwargs):
+    async def main():
+        server = asyncio.create_task(serve(path=str(path), **kwargs))
+        while not path.exists():
+            await asyncio.sleep(0.05)
+
+        try:
+            return await fn(str(path))
+        finally:
+            server.cancel()
+            try:
+                await server
+            except asyncio.CancelledError:
+                pass
+
+    return asyncio.run(main())
+
+
+def test_serve(tmp_path):
+    async def requests(path):
+        first = await Client.connect(path)
+        second = await Client.connect(path)
+
+        responses = [
+            await first.request(code="a = 2x"),
+            await first.request(code="print(1)\na + 3x"),
+            # each connection has its own namespace
+            await second.request(code="a"),
+            # unless a session is used
+            await first.request(code="b = 7", session="shared"),
+            await second.request(code="b", session="shared"),
+            await first.request(code="{}[1]"),
+            await first.request(
+                code="import time\ntime.sleep(10)", deadline=0.2
+            ),
+            await first.request(code="a"),
+            await first.request(op="unknown"),
+        ]
+
+        await first.close()
+        await second.close()
+
+        return responses
+
+    responses = run_server(tmp_path / "socket", requests, workers=2)
+    results = [(i["result"], i["error"]) for i in responses]
+
+    assert results[:6] == [
+        (None, None),
+        ("5*x", None),
+        ("a", None),
+        (None, None),
+        ("7", None),
+        (None, "KeyError: 1"),
+    ]
+    assert responses[1]["output"] == "1\n"
+
+    # the session survives the timeout
+    assert responses[6]["error"].startswith("EvaluationTimeout")
+    assert responses[7]["result"] == "2*x"
+
+    assert responses[8]["error"] == "ValueError: unknown op 'unknown'"
+    assert [i["id"] for i in responses] == [1, 2, 1, 3, 2, 4, 5, 6, 7]
+
+
+def test_affinity():
+    async def main():
+        server = Server(workers=2)
+        await server.start()
+
+        try:
+            for i in range(4):
+                await server.submit({"code": f"n = {i}", "session": i})
+
+            stats = server.stats()
+            assert stats["sessions"] == 4
+            assert [i["sessions"] for i in stats["workers"]] == [2, 2]
+
+            response = await server.submit({"code": "n + 1", "session": 3})
+            assert response["result"] == "4"
+
+            await server.submit({"op": "close", "session": 3})
+            response = await server.submit({"code": "n", "session": 3})
+            assert response["result"] == "n"
+
+            # worker that dies is replaced
+            response = await server.submit(
+                {"code": "import os\nos._exit(1)", "session": 3}
+            )
+            assert response["error"].startswith("WorkerError")
+            assert sum(i["restarts"] for i in server.stats()["workers"]) == 1
+
+            response = await server.submit({"code": "2 + 2", "session": 3})
+            assert response["result"] == "4"
+
+            # exiting from the code keeps the worker and its sessions
+            for code in [
+                "exit()",
+                "raise SystemExit(3)",
+                "raise KeyboardInterrupt",
+            ]:
+                response = await server.submit({"code": code, "session": 2})
+                assert response["error"].split(":")[0] in [
+                    "SystemExit",
+                    "KeyboardInterrupt",
+                ]
+
+            response = await server.submit({"code": "n", "session": 2})
+            assert response["result"] == "2"
+            assert sum(i["restarts"] for i in server.stats()["workers"]) == 1
+        finally:
+            await server.close()
+
+    asyncio.run(main())
+
+
+def test_handle():
+    engine = Engine()
+    sessions = OrderedDict()
+
+    def request(session, code):
+        return _handle(
+            engine,
+            sessions,
+            {"op": "eval", "session": session, "code": code, "timeout": None},
+        )
+
+    assert request("a", "n = 2x")["error"] is None
+    assert request("b", "n")["result"] == "n"
+    assert request("a", "n + 1")["result"] == "2*x + 1"
+
+    # sessions are namespaces of the same engine
+    assert all(i.engine is engine for i in sessions.values())
+    assert "n" not in engine.user_ns
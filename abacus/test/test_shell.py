@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import traceback
+
+from io import StringIO
+
+import pytest
+
+from ..basic_shell.basic_shell import BasicShell
+
+SCRIPT = """\
+f = lambda t: t + 1
+
+# comment between statements
+print(f(2))
+
+def g(a):
+    return 2a
+
+g(x)
+"""
+
+
+def test_run_file(capsys):
+    shell = BasicShell()
+
+    # NOTE: statements are ran one by one so `f` is known to be callable
+    value = shell.run_file(StringIO(SCRIPT))
+    assert str(value) == "2*x"
+    assert capsys.readouterr().out == "3\n2*x\n"
+
+    assert "x" not in shell.user_ns
+
+
+def test_run_file_streaming():
+    shell = BasicShell()
+    lines = iter(["a = 1\n", "b = a + 1\n", "c = b + 1\n"])
+    seen = []
+
+    class Reader(StringIO):
+        def readline(self, *args):
+            seen.append(dict(shell.user_ns).get("a"))
+            return next(lines, "")
+
+    shell.run_file(Reader())
+
+    # first statement was ran before whole file was read
+    assert 1 in seen
+    assert shell.user_ns["c"] == 3
+
+
+def test_run_file_line_numbers(tmp_path):
+    path = tmp_path / "script.py"
+    path.write_text("a = 1\n\n\nb = 2\n{}['key']\n")
+
+    shell = BasicShell()
+    with pytest.raises(KeyError) as info:
+        shell.run_file(path)
+
+    frame = traceback.extract_tb(info.value.__traceback__)[-1]
+    assert frame.filename == str(path)
+    assert frame.lineno == 5
+    assert shell.user_ns["b"] == 2
+
+    path.write_text("a = 1\n\nb = (\n")
+    with pytest.raises(SyntaxError):
+        shell.run_file(path)
+
+    path.write_text("a = 1\n\nb = 2 +\n")
+    with pytest.raises(SyntaxError) as info:
+        shell.run_file(path)
+
+    assert info.value.lineno == 3
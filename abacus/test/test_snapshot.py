@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import pickle
+
+from io import StringIO
+
+import pytest
+import sympy
+
+from .. import snapshot
+from ..cli import main_cli
+from ..engine import Engine
+from ..namespace import NamespaceDiff
+
+
+class Blob:
+    """Exposes its data as an out-of-band buffer like numpy arrays do"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def __reduce_ex__(self, protocol):
+        return type(self), (pickle.PickleBuffer(self.data),)
+
+
+def test_session_roundtrip(capsys):
+    engine = Engine()
+    engine.run("f = sympy.Function('f')")
+    engine.run("a = f(x)**2 + sympy.Integral(sympy.sin(x), x) + x*y")
+    engine.run("fn = lambda t: t")
+    engine.run("import os")
+    engine.run("del solve")
+
+    info = engine.save_session()
+    assert set(info.names) == {"f", "a", "os"}
+    assert info.skipped == ["fn"]
+    assert "fn" in capsys.readouterr().err
+
+    restored = Engine()
+    restored.load_session()
+
+    x, y = sympy.symbols("x y")
+    assert restored.run("a") == engine.run("a")
+    assert restored.run("a.diff(x)") == engine.run("a.diff(x)")
+    assert restored.run("f(2)") == sympy.Function("f")(2)
+    assert restored.run("os.sep") == engine.run("os.sep")
+    assert "solve" not in restored.user_ns and "fn" not in restored.user_ns
+
+    # evaluation still works on the restored expressions
+    assert restored.run("(a - f(x)**2).doit()") == -sympy.cos(x) + x * y
+
+
+def test_snapshot_buffers(tmp_path):
+    path = tmp_path / "session.pickle"
+    large = bytearray(b"a" * 1000)
+    changes = NamespaceDiff({"small": Blob(b"b"), "large": Blob(large)}, [])
+
+    snapshot.save(path, changes, large_buffer=100)
+    assert snapshot.buffers_path(path).stat().st_size >= 1000
+
+    restored = snapshot.load(path)
+    assert bytes(restored.changed["large"].data) == bytes(large)
+    assert bytes(restored.changed["small"].data) == b"b"
+
+    # side file is removed once it's not needed
+    snapshot.save(path, NamespaceDiff({"a": 1}, []))
+    assert not snapshot.buffers_path(path).exists()
+
+    path.write_bytes(pickle.dumps([1, 2]))
+    with pytest.raises(ValueError):
+        snapshot.load(path)
+
+
+def test_cli_session(tmp_path):
+    path = str(tmp_path / "session.pickle")
+
+    argv = ["--session", path, "-e", "a = 2x"]
+    assert main_cli(argv, stdout=StringIO()) == 0
+
+    stdout = StringIO()
+    assert main_cli(["--session", path, "-e", "a**2"], stdout=stdout) == 0
+    assert stdout.getvalue() == "4*x**2\n"
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from io import StringIO
+
+import pytest
+import sympy
+
+from ..engine import Engine
+from ..table import print_table, table
+
+
+def test_table():
+    x, y = sympy.symbols("x y")
+
+    expected = [(0, 1, 0), (0, 2, 0), (1, 1, 1), (1, 2, 2), (2, 1, 2)]
+    assert list(table(x * y, x=range(3), y=[1, 2]))[:5] == expected
+
+    # chunks evaluated in parallel are still in order
+    rows = list(table(x * y, x=range(3), y=[1, 2], chunksize=2, workers=2))
+    assert rows[:5] == expected
+    assert len(rows) == 6
+
+    # constants are repeated for each row
+    assert list(table(sympy.Integer(3), x=[1, 2])) == [(1, 3), (2, 3)]
+
+    with pytest.raises(ValueError):
+        next(table(x * y, x=[1]))
+
+
+def test_table_namespace():
+    engine = Engine()
+
+    # NOTE: int literals are sympy integers in the namespace
+    rows = engine.run("list(table(2x + y, x=range(3), y=[10]))")
+    assert rows == [(0, 10, 10), (1, 10, 12), (2, 10, 14)]
+
+
+def test_print_table():
+    file = StringIO()
+    print_table(sympy.Symbol("x") / 2, x=[1, 2], file=file)
+
+    lines = [i.split() for i in file.getvalue().splitlines()]
+    assert lines == [["x", "x/2"], ["1", "0.5"], ["2", "1"]]
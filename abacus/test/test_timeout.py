@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import time
+
+import pytest
+
+from .. import namespace
+from ..basic_shell.basic_shell import BasicShell
+from ..engine import Engine
+from ..timeout import (
+    EvaluationTimeout,
+    alarm,
+    call_with_timeout,
+    can_fork,
+    time_limited,
+)
+
+needs_fork = pytest.mark.skipif(not can_fork(), reason="requires fork")
+
+
+@needs_fork
+def test_call_with_timeout():
+    assert call_with_timeout(5, pow, 2, 10) == 1024
+
+    # the call is made in another process
+    assert call_with_timeout(5, os.getpid) != os.getpid()
+
+    with pytest.raises(ZeroDivisionError):
+        call_with_timeout(5, lambda: 1 / 0)
+
+    slow = time_limited(time.sleep, 0.2)
+    start = time.monotonic()
+    with pytest.raises(EvaluationTimeout):
+        slow(10)
+
+    assert time.monotonic() - start < 5
+
+
+@needs_fork
+def test_engine_timeout():
+    engine = Engine()
+    engine.run("a = 1")
+
+    assert engine.run("a = 2\nb = 3a", timeout=5) is None
+    assert engine.user_ns["b"] == 6
+
+    with pytest.raises(EvaluationTimeout):
+        engine.run("a = 10\nimport time\ntime.sleep(10)", timeout=0.2)
+
+    # namespace is as it was before the cell
+    assert engine.user_ns["a"] == 2
+
+    engine.timeout = 5
+    assert engine.run("import math\nmath.pi") > 3
+    assert engine.run("math.e") > 2
+
+
+@needs_fork
+def test_basic_shell_timeout(capsys):
+    shell = BasicShell()
+    shell.timeout = 0.2
+
+    shell.run("import time\ntime.sleep(10)")
+    assert "EvaluationTimeout" in capsys.readouterr().err
+
+    shell.run("c = 2x", timeout=5)
+    assert str(shell.user_ns["c"]) == "2*x"
+
+    # changes to the shell are not lost with the process
+    shell.timeout = 5
+    shell.run("abacus.timeout = None")
+    assert shell.timeout is None
+
+    # changes to the shell are not lost with the process
+    shell.timeout = 5
+    shell.run("abacus.timeout = None")
+    assert shell.timeout is None
+
+
+def test_namespace_diff():
+    ns = {"a": [1]}
+    before = namespace.snapshot(ns)
+
+    # the new list usually gets the id of the freed one
+    del ns["a"]
+    ns["a"] = [2]
+
+    assert namespace.diff(ns, before).changed == {"a": [2]}
+
+
+def test_alarm():
+    with pytest.raises(EvaluationTimeout):
+        with alarm(0.1):
+            time.sleep(10)
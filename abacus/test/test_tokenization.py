@@ -15,12 +15,21 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import time
 import tokenize
 
+from io import StringIO
 from tokenize import TokenInfo
 
-from ..shell import StringTransformer
-from ..tokenizer import insert_token, shift_tokens
+from ..profiler import Profiler
+from ..shell import StringTransformer, TransformerPipeline
+from ..tokenizer import (
+    insert_between,
+    insert_token,
+    recover_statements,
+    shift_tokens,
+    split_statements,
+)
 
 
 def test_tokenize_untokenize():
@@ -73,3 +82,144 @@ def test_shift_tokens():
     shift_tokens(TOKENS_INPUT, INDEX, INCR)
 
     assert TOKENS_INPUT == TOKENS_OUTPUT, "Tokens arent shifted properly"
+
+
+def _is_name_pair(prev: TokenInfo, cur: TokenInfo) -> bool:
+    return prev.type == tokenize.NAME and cur.type == tokenize.NAME
+
+
+def test_insert_between():
+    """Tests if single pass insertion places tokens same as `insert_token`"""
+
+    STAR = TokenInfo(tokenize.OP, "*", None, None, None)
+
+    for INPUT in [
+        "a b c",
+        "a  b   c\nd e\n",
+        "def x():\n    a b\n",
+        "'''a\nb''' c d",
+        "a \\\n b",
+    ]:
+        tokens = StringTransformer._tokenize(INPUT)
+
+        expected = list(tokens)
+        i = 1
+        while i < len(expected):
+            if _is_name_pair(expected[i - 1], expected[i]):
+                insert_token(expected, i, STAR)
+                i += 1
+            i += 1
+
+        result = insert_between(tokens, _is_name_pair, STAR)
+
+        assert result == expected, f"Tokens differ for {INPUT!r}"
+
+
+def test_insert_between_scaling():
+    """Tests if insertion time grows linearly with the number of tokens"""
+
+    STAR = TokenInfo(tokenize.OP, "*", None, None, None)
+
+    def measure(n: int) -> float:
+        tokens = StringTransformer._tokenize(" + ".join(["a b"] * n))
+
+        best = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            insert_between(tokens, _is_name_pair, STAR)
+            best = min(best, time.perf_counter() - start)
+
+        return best
+
+    # quadratic growth would be ~100x so this leaves plenty of room for noise
+    ratio = measure(10_000) / measure(1_000)
+    assert ratio < 30, f"Insertion does not scale linearly ({ratio:.1f}x)"
+
+
+def test_transformer_pipeline():
+    """Tests if the pipeline gives same result as calling transformers one by
+    one while tokenizing only when needed"""
+
+    STAR = TokenInfo(tokenize.OP, "*", None, None, None)
+
+    class Multiply(StringTransformer):
+        def transform_tokens(self, tokens):
+            return insert_between(tokens, _is_name_pair, STAR)
+
+    class Nothing(StringTransformer):
+        def transform_tokens(self, tokens):
+            return []
+
+    def legacy(lines):
+        return [i.replace("c", "c d") for i in lines]
+
+    INPUT = ["a b\n", "c\n"]
+
+    for transformers, tokenized in [
+        ([Multiply(), Nothing(), Multiply()], 1),
+        ([Multiply(), legacy, Multiply()], 2),
+        ([legacy], 0),
+    ]:
+        expected = INPUT
+        for i in transformers:
+            expected = i(expected)
+
+        profiler = Profiler(enabled=True)
+        pipeline = TransformerPipeline(transformers, profiler=profiler)
+
+        assert pipeline(INPUT) == expected
+
+        timers = profiler.as_dict()["timers"]
+        assert timers.get("tokenize", {}).get("count", 0) == tokenized
+
+
+def test_split_statements():
+    INPUT = """# comment
+x = 1
+
+@decorator
+def f(
+    a,
+):
+    return a
+
+if x:
+    pass
+else:
+    y = '''
+'''
+2x \\
+    + 1
+"""
+
+    EXPECTED = [
+        (2, "x = 1\n"),
+        (4, "@decorator\ndef f(\n    a,\n):\n    return a\n"),
+        (10, "if x:\n    pass\nelse:\n    y = '''\n'''\n"),
+        (15, "2x \\\n    + 1\n"),
+    ]
+
+    assert list(split_statements(StringIO(INPUT).readline)) == EXPECTED
+
+
+def test_recover_statements():
+    INPUT = "a = (1,\n 2)\n# comment\nf(\n\n[2,\n3]\n"
+
+    assert list(recover_statements(StringIO(INPUT).readline)) == [
+        (1, "a = (1,\n 2)\n", None),
+        (4, "f(\n", "SyntaxError: EOF in multi-line statement"),
+        (6, "[2,\n3]\n", None),
+    ]
+
+
+def test_split_statements_eager():
+    """Simple statements are yielded without reading the next line"""
+
+    lines = iter(["x = 1\n", "if x: pass\n", "y = 2\n"])
+    statements = split_statements(lambda: next(lines))
+
+    assert next(statements) == (1, "x = 1\n")
+
+    # compound statement has to wait for the next line
+    assert next(statements) == (2, "if x: pass\n")
+    assert next(lines, None) is None
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import sympy
+
+from .. import namespace
+from ..basic_shell.basic_shell import BasicShell
+from ..resolver import MISSING, UNRESOLVED, resolve
+from ..transformer import integer, integer_name, symbol
+
+
+def test_auto_symbols(capsys):
+    """Tests if undefined names are made into interned symbols only for the
+    duration of the cell"""
+
+    shell = BasicShell()
+
+    shell.run("sym = x")
+    assert shell.user_ns["sym"] is symbol("x")
+    assert "x" not in shell.user_ns
+
+    # names assigned by the cell itself are not deleted
+    shell.run("y + 1\ny = 2")
+    assert shell.user_ns["y"] == 2
+
+    shell.run("z")
+    assert capsys.readouterr().out == "z\n"
+
+
+def test_resolve():
+    class A:
+        value = 1
+
+        @property
+        def prop(self):
+            raise AssertionError("property was evaluated")
+
+        @classmethod
+        def method(cls):
+            pass
+
+    ns = {"A": A, "a": A()}
+
+    assert resolve(ns, "missing") is MISSING
+    assert resolve(ns, "print") is print
+    assert resolve(ns, "A.value") == 1
+    assert callable(resolve(ns, "A.method"))
+    assert callable(resolve(ns, "a.method"))
+    assert resolve(ns, "a.prop") is UNRESOLVED
+    assert resolve(ns, "a.missing") is UNRESOLVED
+
+
+def test_implicit_call_multiplication(capsys):
+    """Tests if calls of non-callables are turned into multiplication without
+    evaluating the callee"""
+
+    shell = BasicShell()
+
+    calls = []
+
+    class A:
+        @property
+        def prop(self):
+            calls.append(1)
+            return lambda v: v
+
+    shell.push({"A": A(), "n": 2})
+
+    shell.run("A.prop(x)")
+    shell.run("n(x + 1)")
+    shell.run("3(x)")
+    shell.run("sympy.sin(x)")
+
+    assert calls == [1], "Callee was evaluated during transformation"
+    assert capsys.readouterr().out.splitlines() == [
+        "x",
+        "2*x + 2",
+        "3*x",
+        "sin(x)",
+    ]
+
+
+def test_integer_pool():
+    """Tests if int literals are bound as pooled `sympy.Integer`"""
+
+    shell = BasicShell()
+    before = namespace.snapshot(shell.user_ns)
+
+    shell.run("r = [2 * k for k in range(3)]")
+    assert shell.user_ns["r"] == [0, 2, 4]
+
+    # the pooled names are not changes of the namespace
+    assert list(namespace.diff(shell.user_ns, before).changed) == ["r"]
+    assert all(isinstance(i, sympy.Integer) for i in shell.user_ns["r"])
+    assert shell.user_ns[integer_name(2)] is integer(2)
+
+    # names are bound again even if the cell was cached
+    del shell.user_ns[integer_name(2)]
+    shell.run("r = [2 * k for k in range(3)]")
+    assert shell.user_ns["r"] == [0, 2, 4]
+
+
+def test_prescan_skip(capsys):
+    """Tests if passes are skipped for code that needs no transformation and
+    that they are not skipped when the namespace changes"""
+
+    shell = BasicShell()
+    shell.profiler.enabled = True
+
+    def counters():
+        return shell.profiler.as_dict()["counters"]
+
+    shell.run("import math")
+    shell.run("def f(): pass")
+    shell.run("f")
+    assert counters()["tokens.skipped"] == 3
+    assert counters()["ast.skipped"] == 3
+    assert "ast.ran" not in counters()
+
+    # `f` is now undefined so it has to become a symbol
+    shell.run("del f")
+    shell.run("f")
+    assert counters()["ast.ran"] == 1
+
+    shell.run("2f")
+    assert counters()["tokens.ran"] == 1
+    assert counters()["ast.ran"] == 2
+
+    assert capsys.readouterr().out.splitlines()[-2:] == ["f", "2*f"]
+
+
+def test_prescan_counts():
+    """Tests if the passes are counted when not profiling"""
+
+    shell = BasicShell()
+    counts = dict(shell.transformer.counts)
+
+    shell.run("import math")
+    shell.run("2f")
+
+    assert {k: v - counts[k] for k, v in shell.transformer.counts.items()} == {
+        "tokens.ran": 1,
+        "tokens.skipped": 1,
+        "ast.ran": 1,
+        "ast.skipped": 1,
+    }
+    assert shell.profiler.as_dict()["counters"] == {}
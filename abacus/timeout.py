@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# abacus
+#
+# Copyright (C) 2022 Aleksandar Radivojevic
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Time limits for evaluation, the work is done in a forked process which
+can be killed without affecting the session"""
+
+import os
+import pickle
+import select
+import signal
+import sys
+import threading
+
+from contextlib import contextmanager
+from functools import wraps
+from time import monotonic
+from typing import Any, Callable, Dict, Iterator, NamedTuple, Optional
+
+from . import namespace
+
+
+class EvaluationTimeout(TimeoutError):
+    def __init__(self, timeout: float):
+        super().__init__(f"evaluation took longer than {timeout:g}s")
+        self.timeout = timeout
+
+
+def can_fork() -> bool:
+    return hasattr(os, "fork")
+
+
+def _send(fd: int, data: bytes):
+    with os.fdopen(fd, "wb") as file:
+        file.write(data)
+
+
+def _receive(fd: int, pid: int, timeout: Optional[float]) -> bytes:
+    """Reads everything the child sends, kills it if it takes too long"""
+
+    deadline = None if timeout is None else monotonic() + timeout
+    chunks = []
+
+    try:
+        while True:
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    raise EvaluationTimeout(timeout)  # type: ignore[arg-type]
+
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+
+            chunk = os.read(fd, 1 << 16)
+            if not chunk:
+                break
+
+            chunks.append(chunk)
+    except BaseException:
+        # NOTE: includes KeyboardInterrupt so Ctrl-C cancels the evaluation
+        os.kill(pid, signal.SIGKILL)
+        raise
+    finally:
+        os.close(fd)
+        os.waitpid(pid, 0)
+
+    return b"".join(chunks)
+
+
+class ForkedCall(NamedTuple):
+    """Call running in a forked process, see `fork_call`"""
+
+    pid: int
+
+    # read end of the pipe the result is sent through
+    fd: int
+
+    def kill(self):
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+def fork_call(
+    fn: Callable[[], Any],
+    ns: Optional[Dict[str, Any]] = None,
+    keep: Optional[Callable[[str], bool]] = None,
+) -> ForkedCall:
+    """Calls `fn` in a forked process which sends the result back through a
+    pipe, the data read from it is turned into the result by `forked_result`
+
+    If `ns` is given changes the call did to it are sent as well, only of the
+    names for which `keep` is true if it's given"""
+
+    before = None if ns is None else namespace.snapshot(ns)
+
+    # NOTE: buffered output would be printed by both processes
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+
+    if pid == 0:
+        os.close(read_fd)
+
+        try:
+            try:
+                payload = (True, fn())
+            except BaseException as ex:
+                payload = (False, ex)
+
+            changes = None
+            if ns is not None:
+                changes = namespace.diff(ns, before)
+                if keep is not None:
+                    changes = namespace.select(changes, keep)
+
+            try:
+                data = pickle.dumps((payload, changes), pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                if changes is not None:
+                    changes = namespace.transferable(changes)
+
+                try:
+                    pickle.dumps(payload, pickle.HIGHEST_PROTOCOL)
+                except Exception as ex:
+                    payload = (False, RuntimeError(f"unpicklable result: {ex}"))
+
+                data = pickle.dumps((payload, changes), pickle.HIGHEST_PROTOCOL)
+
+            sys.stdout.flush()
+            sys.stderr.flush()
+
+            _send(write_fd, data)
+        finally:
+            # NOTE: skips atexit handlers and cleanup of the parent state
+            os._exit(0)
+
+    os.close(write_fd)
+
+    return ForkedCall(pid, read_fd)
+
+
+def forked_result(data: bytes, ns: Optional[Dict[str, Any]] = None) -> Any:
+    """Returns result of a forked call from the data it sent, its exception is
+    raised instead if it failed
+
+    Changes to the namespace are applied to `ns`, values that could not be
+    pickled are skipped with a warning"""
+
+    if not data:
+        raise RuntimeError("evaluation process died unexpectedly")
+
+    (ok, value), changes = pickle.loads(data)
+
+    if changes is not None and ns is not None:
+        namespace.apply(ns, changes)
+
+        if changes.skipped:
+            print(
+                "Warning: could not keep values of",
+                ", ".join(changes.skipped),
+                file=sys.stderr,
+            )
+
+    if not ok:
+        raise value
+
+    return value
+
+
+def run_forked(
+    fn: Callable[[], Any],
+    timeout: Optional[float],
+    ns: Optional[Dict[str, Any]] = None,
+    keep: Optional[Callable[[str], bool]] = None,
+) -> Any:
+    """Calls `fn` in a forked process and returns its result, exceptions are
+    raised in this process
+
+    If `ns` is given changes the call did to it are applied to it here, values
+    that cannot be pickled are skipped with a warning, names for which `keep`
+    is false are left alone
+
+    Raises `EvaluationTimeout` if it takes more than `timeout` seconds in
+    which case the process is killed and nothing is changed"""
+
+    call = fork_call(fn, ns, keep)
+    data = _receive(call.fd, call.pid, timeout)
+
+    return forked_result(data, ns)
+
+
+@contextmanager
+def alarm(timeout: Optional[float]) -> Iterator[None]:
+    """Raises `EvaluationTimeout` inside the block if it takes more than
+    `timeout` seconds, works only on POSIX in the main thread otherwise
+    there is no limit"""
+
+    if (
+        timeout is None
+        or not hasattr(signal, "setitimer")
+        or threading.current_thread() is not threading.main_thread()
+    ):
+        yield
+        return
+
+    def handler(*args):
+        raise EvaluationTimeout(timeout)  # type: ignore[arg-type]
+
+    previous = signal.signal(signal.SIGALRM, handler)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def run_limited(
+    fn: Callable[[], Any],
+    timeout: Optional[float],
+    ns: Optional[Dict[str, Any]] = None,
+    keep: Optional[Callable[[str], bool]] = None,
+) -> Any:
+    """Same as `run_forked` if forking is supported, otherwise `fn` is called
+    in this process with `alarm`"""
+
+    if timeout is None:
+        return fn()
+
+    if can_fork():
+        return run_forked(fn, timeout, ns, keep)
+
+    with alarm(timeout):
+        return fn()
+
+
+def call_with_timeout(timeout: Optional[float], fn: Callable, *args, **kwargs):
+    """Calls `fn(*args, **kwargs)` and raises `EvaluationTimeout` if it takes
+    more than `timeout` seconds, the result must be picklable"""
+
+    return run_limited(lambda: fn(*args, **kwargs), timeout)
+
+
+def time_limited(fn: Callable, timeout: float) -> Callable:
+    """Returns version of `fn` that raises `EvaluationTimeout` if a call
+    takes more than `timeout` seconds
+
+    >>> slow_solve = time_limited(solve, 10)"""
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        return call_with_timeout(timeout, fn, *args, **kwargs)
+
+    return wrapper
@@ -15,8 +15,10 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from tokenize import TokenInfo
-from typing import List
+import token
+
+from tokenize import TokenError, TokenInfo, generate_tokens
+from typing import Callable, Iterator, List, Optional, Tuple
 
 
 def shift_tokens(tokens: List[TokenInfo], index: int, amount: int):
@@ -117,3 +119,233 @@ def insert_token(
 
     shift_tokens(tokens, index, token_length)
     tokens.insert(index, token)
+
+
+def insert_between(
+    tokens: List[TokenInfo],
+    predicate: Callable[[TokenInfo, TokenInfo], bool],
+    token: TokenInfo,
+    *,
+    padding=True,
+) -> List[TokenInfo]:
+    """Returns new list of tokens with `token` inserted between each pair of
+    consecutive tokens for which `predicate(prev, cur)` is true
+
+    Positions are fixed up in a single pass so the result can be untokenized,
+    the placement is the same as calling `insert_token` for each pair but
+    runs in linear time
+
+    Only `token.type` and `token.string` are used, position and line are
+    taken from the previous token
+
+    TODO: multi line tokens are not supported"""
+
+    length = len(token.string)
+    if padding:
+        length += 2
+
+    result: List[TokenInfo] = []
+
+    # columns are shifted only on the line where the insertion happened, same
+    # as `shift_tokens`
+    line = 0
+    amount = 0
+
+    prev = None
+    for tok in tokens:
+        if prev is not None and predicate(prev, tok):
+            last = result[-1]
+            row, col = last.end
+
+            if padding:
+                start, end = (row, col + 1), (row, col + length)
+            else:
+                start, end = (row, col), (row, col + length)
+
+            result.append(token._replace(start=start, end=end, line=last.line))
+
+            if tok.start[0] != line:
+                line = tok.start[0]
+                amount = 0
+
+            amount += length
+
+        prev = tok
+
+        if tok.start[0] != line:
+            # new line so nothing to shift yet
+            line = tok.start[0]
+            amount = 0
+        elif amount:
+            end = tok.end
+            if end[0] == line:
+                end = (end[0], end[1] + amount)
+
+            tok = tok._replace(
+                start=(tok.start[0], tok.start[1] + amount), end=end
+            )
+
+        if tok.end[0] != line:
+            # multi line token, tokens after it are not on the shifted line
+            line = tok.end[0]
+            amount = 0
+
+        result.append(tok)
+
+    return result
+
+
+# keywords that continue compound statement after its body
+_CONTINUATION_KEYWORDS = {"elif", "else", "except", "finally"}
+
+# statements starting with these may continue after the first line, `match` is
+# a soft keyword so it may be a false positive which only delays the statement
+_COMPOUND_KEYWORDS = {
+    "async",
+    "class",
+    "def",
+    "for",
+    "if",
+    "match",
+    "try",
+    "while",
+    "with",
+    *_CONTINUATION_KEYWORDS,
+}
+
+
+def split_statements(readline: Callable[[], str]) -> Iterator[Tuple[int, str]]:
+    """Splits code into complete top level statements, lines are read using
+    `readline` only as needed so it can be used on files of any size
+
+    Comments and blank lines between statements are dropped, simple statements
+    are yielded as soon as their last line is read
+
+    Yields line number of the first line and source of each statement"""
+
+    lines: List[str] = []
+    offset = 1  # line number of lines[0]
+
+    def _readline() -> str:
+        line = readline()
+        lines.append(line)
+        return line
+
+    def _statement(start: int, end: int) -> str:
+        nonlocal lines, offset
+
+        source = "".join(lines[start - offset : end - offset + 1])
+
+        # drop lines that are not needed anymore
+        lines = lines[end - offset + 1 :]
+        offset = end + 1
+
+        return source
+
+    start = None
+    end = 0
+    depth = 0
+    pending = False
+    decorator = False
+    compound = False
+    line_start = True
+
+    for tok in generate_tokens(_readline):
+        if tok.type == token.INDENT:
+            depth += 1
+            pending = False
+            continue
+        elif tok.type == token.DEDENT:
+            depth -= 1
+            pending = depth == 0
+            continue
+        elif tok.type in (token.NL, token.COMMENT):
+            continue
+        elif tok.type == token.NEWLINE:
+            end = tok.start[0]
+            line_start = True
+
+            # decorators are part of the statement after them
+            pending = depth == 0 and not decorator
+
+            # NOTE: nothing can follow simple statement so there is no need to
+            # wait for the next line, which matters when reading from a pipe
+            if pending and not compound:
+                pending = False
+                yield start, _statement(start, end)
+                start = None
+
+            continue
+        elif tok.type == token.ENDMARKER:
+            break
+
+        if line_start:
+            line_start = False
+
+            if depth == 0:
+                decorator = tok.string == "@"
+                compound = tok.string in _COMPOUND_KEYWORDS
+
+                if pending and tok.string in _CONTINUATION_KEYWORDS:
+                    pending = False
+
+        if pending:
+            pending = False
+            yield start, _statement(start, end)
+            start = None
+
+        if start is None:
+            start = tok.start[0]
+
+    if start is not None:
+        yield start, _statement(start, end)
+
+
+def recover_statements(
+    readline: Callable[[], str],
+) -> Iterator[Tuple[int, str, Optional[str]]]:
+    """Same as `split_statements` but yields also an error message, which is
+    `None` for valid statements
+
+    Statement that cannot be tokenized, like one with an unclosed bracket,
+    is yielded as its first line with the error and splitting continues from
+    the line after it"""
+
+    offset = 0  # lines before the current run of `split_statements`
+    replay: List[str] = []  # lines read ahead by a run that failed
+
+    while True:
+        # lines of the run after the last statement, `base` is line before
+        read: List[str] = []
+        base = 0
+
+        def _readline() -> str:
+            line = replay.pop(0) if replay else readline()
+            read.append(line)
+            return line
+
+        try:
+            for lineno, source in split_statements(_readline):
+                yield offset + lineno, source, None
+
+                end = lineno + len(source.splitlines()) - 1
+                del read[: end - base]
+                base = end
+
+            return
+        except TokenError as ex:
+            error = f"SyntaxError: {ex.args[0]}"
+        except IndentationError as ex:
+            error = f"{type(ex).__name__}: {ex.msg}"
+
+        # first line that is not blank or a comment is where it failed
+        for i, line in enumerate(read):
+            if line.strip() and not line.lstrip().startswith("#"):
+                break
+        else:
+            return
+
+        yield offset + base + i + 1, line, error
+
+        replay = read[i + 1 :] + replay
+        offset += base + i + 1
@@ -16,17 +16,97 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import ast
+import builtins
+import sys
 import token
 import traceback
 
 from keyword import iskeyword
 from tokenize import TokenInfo
-from typing import List
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from . import namespace
+from .context import current_context
+from .reactive import CellNames, cell_names
+from .resolver import MISSING, UNRESOLVED, resolve
+from .shell import ShellBase, StringTransformer
+from .tokenizer import insert_between
 
-import sympy
+# NOTE: sympy is imported only once a symbol or an integer is needed so it does
+# not slow down startup
+if TYPE_CHECKING:
+    import sympy
 
-from .shell import ShellBase, StringTransformer
-from .tokenizer import insert_token
+_MUL = TokenInfo(token.OP, "*", None, None, None)
+
+# process wide pool of auto created symbols so same names reuse same objects
+_symbols: Dict[str, "sympy.Symbol"] = {}
+
+
+def symbol(name: str) -> "sympy.Symbol":
+    """Returns interned symbol with name `name`"""
+
+    sym = _symbols.get(name)
+    if sym is None:
+        from sympy import Symbol
+
+        # NOTE: setdefault so all threads get the same object
+        sym = _symbols.setdefault(name, Symbol(name))
+
+    return sym
+
+
+def intern_symbol(sym: "sympy.Symbol") -> "sympy.Symbol":
+    """Returns pooled symbol equal to `sym`, or `sym` itself if the
+    transformer would create a different one"""
+
+    pooled = symbol(sym.name)
+
+    return pooled if type(sym) is type(pooled) and sym == pooled else sym
+
+
+# int literals are replaced by prebuilt `sympy.Integer` bound into the user
+# namespace, so running the code does not call `sympy.Integer` each time
+INTEGER_POOL_SIZE = 1024
+_integers: Dict[int, "sympy.Integer"] = {}
+
+
+def integer(value: int) -> Optional["sympy.Integer"]:
+    """Returns pooled `sympy.Integer` of `value`, or `None` if the pool is
+    full"""
+
+    result = _integers.get(value)
+    if result is None:
+        if len(_integers) >= INTEGER_POOL_SIZE:
+            return None
+
+        from sympy import Integer
+
+        result = _integers.setdefault(value, Integer(value))
+
+    return result
+
+
+def integer_name(value: int) -> str:
+    """Returns the name pooled integer `value` is bound to"""
+
+    return f"{namespace.HIDDEN_PREFIX}int_{value}"
+
+
+def _is_sympy_symbol(value: Any) -> bool:
+    # NOTE: there cannot be any symbols if sympy was not imported yet
+    sympy = sys.modules.get("sympy")
+
+    return sympy is not None and isinstance(value, sympy.Symbol)
 
 
 def _token_good(tok: TokenInfo):
@@ -38,14 +118,123 @@ def _token_good(tok: TokenInfo):
     return False
 
 
-def _insert_mul(tokens: List[TokenInfo], index: int):
-    insert_token(tokens, index, TokenInfo(token.OP, "*", None, None, None))
+def _is_implicit_mul(prev: TokenInfo, cur: TokenInfo) -> bool:
+    """Checks if there should be a multiplication between the two tokens"""
+    return (
+        _token_good(cur)
+        and (_token_good(prev) or prev.exact_type == token.RPAR)
+    ) or (prev.exact_type == token.RPAR and cur.exact_type == token.LPAR)
+
+
+def _is_int(tok: TokenInfo) -> bool:
+    """Checks if number token is an int literal"""
+
+    string = tok.string.lower()
+    if string[:2] in ("0x", "0o", "0b"):
+        return True
+
+    return not any(c in string for c in ".ej")
+
+
+def _is_fstring(tok: TokenInfo) -> bool:
+    """Checks if string token is a f-string, those contain expressions"""
+
+    # NOTE: the prefix ends where the quotes start
+    prefix = tok.string[: tok.string.index(tok.string[-1])]
+
+    return "f" in prefix.lower()
+
+
+# names right after these keywords are never loaded
+_STORE_KEYWORDS = {
+    "as",
+    "class",
+    "def",
+    "for",
+    "from",
+    "global",
+    "import",
+    "lambda",
+    "nonlocal",
+}
+
+
+def _dotted_path(node: ast.AST) -> Optional[str]:
+    """Returns dotted path of chain of `ast.Attribute` ending with `ast.Name`,
+    or `None` if it's anything else"""
+
+    attrs = []
+    while isinstance(node, ast.Attribute):
+        attrs.append(node.attr)
+        node = node.value
+
+    if not isinstance(node, ast.Name):
+        return None
+
+    attrs.append(node.id)
+
+    return ".".join(reversed(attrs))
+
+
+class CellState:
+    """State of the transformer for the cell that is being transformed"""
+
+    def __init__(self):
+        # symbols and integers that were bound into the namespace
+        self.symbols: List[str] = []
+        self.integers: Set[int] = set()
+
+        # namespace lookups done during the transformation, used to check if
+        # a cached transformation is still valid
+        self.lookups: Dict[str, Optional[str]] = {}
+
+        # callee paths that were already resolved in current cell
+        self.callables: Dict[str, Optional[bool]] = {}
+
+        # set by the token prescan if the AST pass can be skipped
+        self.skip_ast = False
+
+        # global names loaded and stored by the cell, only in reactive mode
+        self.names: Optional[CellNames] = None
+
+
+class _StateAttribute:
+    """Attribute of the transformer that is stored in its current
+    `CellState`"""
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+
+        return getattr(instance.state, self.name)
+
+    def __set__(self, instance, value):
+        setattr(instance.state, self.name, value)
 
 
 class AbacusTransformer(ast.NodeTransformer, StringTransformer):
+    symbols = _StateAttribute()
+    integers = _StateAttribute()
+    lookups = _StateAttribute()
+    callables = _StateAttribute()
+    skip_ast = _StateAttribute()
+    names = _StateAttribute()
+
     def __init__(self, shell: ShellBase):
         self.shell = shell
-        self.symbols = []
+        self.profiler = shell.profiler
+
+        # state used when there is no execution context
+        self._state = CellState()
+
+        # how often each pass ran or was skipped, counted even when not
+        # profiling as it's cheap
+        self.counts: Dict[str, int] = dict.fromkeys(
+            ("tokens.ran", "tokens.skipped", "ast.ran", "ast.skipped"), 0
+        )
 
         self.shell.str_transformers.append(self)
         self.shell.ast_transformers.append(self)
@@ -53,49 +242,240 @@ class AbacusTransformer(ast.NodeTransformer, StringTransformer):
             ShellBase.EVENT_POST_EXECUTE, self.post_execute
         )
 
+    @property
+    def state(self) -> CellState:
+        """State of the current cell, each execution context has its own so
+        sessions can be transformed at the same time"""
+
+        context = current_context(self.shell)
+        if context is None:
+            return self._state
+
+        state = context.state.get(self)
+        if state is None:
+            state = context.state[self] = CellState()
+
+        return state
+
     # impl multi #
 
     def transform_tokens(self, tokens: List[TokenInfo]) -> List[TokenInfo]:
-        # i am doing this with recursion, is it the best solution? probably not
-        def do(tokens):
-            prev = tokens[0]
-            for i in range(1, len(tokens)):
-                cur = tokens[i]
-                if (
-                    _token_good(cur)
-                    and (_token_good(prev) or prev.exact_type == token.RPAR)
-                ) or (
-                    prev.exact_type == token.RPAR
-                    and cur.exact_type == token.LPAR
-                ):
-                    _insert_mul(tokens, i)
-                    do(tokens)
+        implicit_mul, needs_ast = self._prescan(tokens)
+
+        self.skip_ast = not needs_ast
+
+        if not implicit_mul:
+            self._count("tokens.skipped")
+
+            # nothing changed
+            return []
+
+        self._count("tokens.ran")
+
+        # NOTE: done in a single pass so long generated expressions are
+        # transformed in linear time
+        return insert_between(tokens, _is_implicit_mul, _MUL)
+
+    def _prescan(self, tokens: List[TokenInfo]) -> Tuple[bool, bool]:
+        """Cheap scan that checks if the code needs any transformation
+
+        Returns if there is implicit multiplication and if the AST pass is
+        needed, which is conservative so it's only `False` if there are no int
+        literals, undefined names, comparisons or calls of non-callables
+
+        The names checked are recorded in `lookups` so cached result is
+        invalidated if any of them changes"""
+
+        implicit_mul = False
+        needs_ast = False
+
+        prev = None
+        path = None
+        for tok in tokens:
+            if prev is not None and not implicit_mul:
+                implicit_mul = _is_implicit_mul(prev, tok)
+
+            if needs_ast:
+                if implicit_mul:
                     break
+            elif tok.type == token.NUMBER:
+                needs_ast = _is_int(tok)
+            elif tok.type == token.NAME and not iskeyword(tok.string):
+                after_dot = prev is not None and prev.string == "."
+                if after_dot and path is not None:
+                    path += "." + tok.string
+                elif after_dot or (
+                    prev is not None and prev.string in _STORE_KEYWORDS
+                ):
+                    path = None
+                else:
+                    path = tok.string
+
+                    self._record(path)
+                    needs_ast = self.lookups[path] is None
+            elif tok.exact_type in (token.EQEQUAL, token.NOTEQUAL):
+                needs_ast = True
+            elif tok.exact_type == token.LPAR and prev is not None:
+                if prev.type == token.NAME and not iskeyword(prev.string):
+                    # calls of callables are left as they are
+                    if path is not None:
+                        self._record(path)
+                        needs_ast = self.lookups[path] != "callable"
+                elif prev.exact_type in (token.RPAR, token.RSQB):
+                    needs_ast = True
+            elif tok.type == token.STRING:
+                needs_ast = _is_fstring(tok)
+            elif tok.type not in (
+                token.NAME,
+                token.OP,
+                token.NEWLINE,
+                token.NL,
+                token.COMMENT,
+                token.INDENT,
+                token.DEDENT,
+                token.ENDMARKER,
+                token.ENCODING,
+            ):
+                # NOTE: unknown token types (like f-string tokens in newer
+                # versions) could contain anything
+                needs_ast = True
+
+            if tok.type != token.NAME and tok.string != ".":
+                path = None
+
+            prev = tok
+
+        return implicit_mul, needs_ast
+
+    # namespace lookups #
+
+    def _lookup(self, path: str) -> Optional[str]:
+        """Returns kind of value at dotted `path` in the user namespace, it is
+        resolved statically so no user code is ran
+
+        `None` if it does not exist, `unknown` if it cannot be resolved
+        statically, otherwise one of `callable`, `symbol` or `value`"""
+
+        value = resolve(self.shell.user_ns, path)
+
+        if value is MISSING:
+            return None
+        elif value is UNRESOLVED:
+            return "unknown"
+        elif callable(value):
+            return "callable"
+        elif _is_sympy_symbol(value):
+            return "symbol"
+
+        return "value"
+
+    def _count(self, name: str):
+        self.counts[name] += 1
+        self.profiler.count(name)
+
+    def _record(self, path: str):
+        """Records kind of `path` as it was before the transformation"""
+
+        if path not in self.lookups:
+            self.lookups[path] = self._lookup(path)
+
+    def check(self, lookups: Iterable[Tuple[str, Any]]) -> bool:
+        """Checks if the namespace still looks the same as when `lookups` were
+        recorded, meaning the transformation would be the same"""
+
+        return all(self._lookup(path) == kind for path, kind in lookups)
+
+    def restore(
+        self,
+        symbols: Iterable[str],
+        integers: Iterable[int] = (),
+        names: Optional[CellNames] = None,
+    ):
+        """Creates symbols and binds integers the same way the transformation
+        would"""
+
+        self.names = names
+
+        for i in symbols:
+            self._create_symbol(i)
+
+        for j in integers:
+            self._bind_integer(j)
+
+        self.shell.check_lazy_imports()
+
+    def _is_callable(self, path: str) -> Optional[bool]:
+        """Checks if value at `path` is callable, `None` if it's unknown
+
+        Result is remembered until the end of the cell"""
+
+        try:
+            return self.callables[path]
+        except KeyError:
+            pass
+
+        kind = self._lookup(path)
+        if kind == "unknown":
+            result = None
+        else:
+            result = kind == "callable"
+
+        self.callables[path] = result
 
-                prev = cur
+        return result
 
-        do(tokens)
+    def visit(self, node: ast.AST):
+        if isinstance(node, ast.Module):
+            # NOTE: done before any transformation, which only adds names that
+            # are not dependencies
+            if self.shell.reactive is not None:
+                self.names = cell_names(node)
+
+            # the prescan applies only to the cell it was ran on
+            skip = self.skip_ast
+            self.skip_ast = False
+
+            if skip:
+                self._count("ast.skipped")
+                return node
 
-        return tokens
+            self._count("ast.ran")
+
+            node = super().visit(node)
+
+            # creating symbols and integers imports sympy, so finish loading
+            # it before the code is ran
+            self.shell.check_lazy_imports()
+
+            return node
+
+        return super().visit(node)
 
     def visit_Call(self, node: ast.Call):
+        # the result depends on what is being called, so it's recorded before
+        # symbols are made
+        path = _dotted_path(node.func)
+        if path is not None:
+            self._record(path)
+
+        # NOTE: literals are wrapped by `visit_Constant` so check before
+        is_literal = isinstance(node.func, ast.Constant)
+
         # run on children so that symbols are made
         self.generic_visit(node)
 
         # turns calls into multiplication if name called is not callable
         try:
-            result = None
-            try:
-                result = self.shell.evaluate(ast.Expression(body=node.func))
-            except NameError:
-                # it does not exist
-                pass
-            except Exception as ex:
-                # something else is wrong so just let it be
+            # skip empty function call or with just keywords
+            if len(node.args) == 0:
                 return node
 
-            # skip if it's callable, empty function call or with just keywords
-            if callable(result) or len(node.args) == 0:
+            if path is not None:
+                # skip if it's callable or it's not known
+                if self._is_callable(path) is not False:
+                    return node
+            elif not is_literal:
+                # anything else cannot be checked without evaluating it
                 return node
 
             # treat multi argument calls of non callable name as a tuple
@@ -117,18 +497,26 @@ class AbacusTransformer(ast.NodeTransformer, StringTransformer):
 
     def post_execute(self):
         """Deletes symbols created during parsing"""
+        ns = self.shell.user_ns
         for i in self.symbols:
-            # TODO: FIXME: execute AST not raw code!
-            self.shell.execute(f"del {i}")
+            # skip the names that were assigned something else by the cell
+            if ns.get(i) is _symbols[i]:
+                del ns[i]
 
         # remove old symbols
         self.symbols = []
+        self.integers = set()
+
+        self.lookups = {}
+        self.callables = {}
+        self.skip_ast = False
+        self.names = None
 
     def _is_symbol(self, expr: ast.Expr):
         """Checks if expr is a defined symbol in user namespace, used after
         all undefined names are defined as symbols"""
         if isinstance(expr, ast.Name):
-            return isinstance(self.shell.user_ns.get(expr.id), sympy.Symbol)
+            return _is_sympy_symbol(self.shell.user_ns.get(expr.id))
 
         return False
 
@@ -153,6 +541,13 @@ class AbacusTransformer(ast.NodeTransformer, StringTransformer):
 
         # NOTE: for some reason bool is also an int?
         if isinstance(node.value, int) and not isinstance(node.value, bool):
+            if self._bind_integer(node.value):
+                return ast.copy_location(
+                    ast.Name(id=integer_name(node.value), ctx=ast.Load()),
+                    node,
+                )
+
+            # the pool is full so fallback to creating it each time
             return ast.Call(
                 func=ast.Attribute(
                     value=ast.Name(id="sympy", ctx=ast.Load()),
@@ -165,24 +560,40 @@ class AbacusTransformer(ast.NodeTransformer, StringTransformer):
 
         return node
 
+    def _bind_integer(self, value: int) -> bool:
+        """Binds pooled integer into the namespace, returns `False` if the
+        pool is full"""
+
+        result = integer(value)
+        if result is None:
+            return False
+
+        self.shell.push_hidden(integer_name(value), result)
+        self.integers.add(value)
+
+        return True
+
     def visit_Name(self, node: ast.Name):
         # there is no need to modify assignments or deletion
         if not isinstance(node.ctx, ast.Load):
             return node
 
+        self._record(node.id)
+
         # create names as symbols if not already created
         if (
             node.id not in self.shell.user_ns
             and node.id not in self.symbols
-            and node.id not in __builtins__
+            and not hasattr(builtins, node.id)
         ):
-            self.symbols.append(node.id)
-
-            # TODO: FIXME: execute AST not raw code!
-            self.shell.execute(f'{node.id} = sympy.Symbol("{node.id}")')
+            self._create_symbol(node.id)
 
         return node
 
+    def _create_symbol(self, name: str):
+        self.symbols.append(name)
+        self.shell.user_ns[name] = symbol(name)
+
     def visit_Compare(self, node: ast.Compare):
         # run on children so symbols are made
         self.generic_visit(node)